@@ -0,0 +1,192 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Header of the real MachineLearningRating file, in file order
+COLUMNS = [
+    'UnderwrittenCoverID', 'PolicyID', 'TransactionMonth', 'IsVATRegistered', 'Citizenship', 'LegalType',
+    'Title', 'Language', 'Bank', 'AccountType', 'MaritalStatus', 'Gender', 'Country', 'Province',
+    'PostalCode', 'MainCrestaZone', 'SubCrestaZone', 'ItemType', 'mmcode', 'VehicleType',
+    'RegistrationYear', 'make', 'Model', 'Cylinders', 'cubiccapacity', 'kilowatts', 'bodytype',
+    'NumberOfDoors', 'VehicleIntroDate', 'CustomValueEstimate', 'AlarmImmobiliser', 'TrackingDevice',
+    'CapitalOutstanding', 'NewVehicle', 'WrittenOff', 'Rebuilt', 'Converted', 'CrossBorder',
+    'NumberOfVehiclesInFleet', 'SumInsured', 'TermFrequency', 'CalculatedPremiumPerTerm', 'ExcessSelected',
+    'CoverCategory', 'CoverType', 'CoverGroup', 'Section', 'Product', 'StatutoryClass', 'StatutoryRiskType',
+    'TotalPremium', 'TotalClaims',
+]
+
+SIZES = {'100k': 100_000, '1m': 1_000_000, '10m': 10_000_000}
+CHUNK_ROWS = 250_000
+
+# Province shares and relative claim frequency (roughly those of the real book)
+PROVINCES = {
+    'Gauteng': (0.393, 1.25), 'Western Cape': (0.171, 0.95), 'KwaZulu-Natal': (0.170, 1.10),
+    'North West': (0.143, 0.85), 'Mpumalanga': (0.052, 0.90), 'Eastern Cape': (0.031, 0.80),
+    'Limpopo': (0.025, 0.75), 'Free State': (0.008, 0.70), 'Northern Cape': (0.006, 0.60),
+}
+N_POSTAL_CODES = 888
+MONTHS = pd.date_range('2013-10-01', '2015-08-01', freq='MS')
+
+VEHICLE_TYPES = {'Passenger Vehicle': (0.94, 1.0), 'Medium Commercial': (0.05, 1.4),
+                 'Heavy Commercial': (0.006, 2.0), 'Light Commercial': (0.003, 1.2), 'Bus': (0.001, 1.6)}
+MAKES = ['TOYOTA', 'MERCEDES-BENZ', 'VOLKSWAGEN', 'NISSAN', 'FORD', 'HYUNDAI', 'ISUZU', 'AUDI', 'BMW', 'KIA']
+BODY_TYPES = ['S/D', 'H/B', 'B/S', 'D/C', 'S/C', 'P/V', 'MPV', 'SUV']
+COVER_TYPES = ['Own Damage', 'Windscreen', 'Third Party', 'Passenger Liability', 'Signage and Vehicle Wraps',
+               'Accidental Death', 'Emergency Charges', 'Cleaning and Removal of Accident Debris',
+               'Keys and Alarms', 'Income Protector', 'Basic Excess Waiver', 'Fire and Theft']
+CLAIM_PROBABILITY = 0.0028
+
+
+def postal_codes(seed: int = 0) -> pd.DataFrame:
+    """
+    The fixed zip universe: each code belongs to one province (in proportion to
+    its share) and gets a Zipf-like weight, so a few urban codes hold most policies.
+    """
+    rng = np.random.default_rng(seed)
+    names = list(PROVINCES)
+    shares = np.array([share for share, _ in PROVINCES.values()])
+    province = rng.choice(len(names), N_POSTAL_CODES, p=shares / shares.sum())
+    codes = np.sort(rng.choice(np.arange(1, 10_000), N_POSTAL_CODES, replace=False))
+    weight = 1.0 / np.arange(1, N_POSTAL_CODES + 1) ** 1.1
+    rng.shuffle(weight)
+    # Renormalise within each province so the province shares are kept
+    weight = weight / pd.Series(weight).groupby(province).transform('sum').to_numpy() * shares[province]
+    return pd.DataFrame({'PostalCode': codes, 'Province': np.array(names)[province],
+                         'weight': weight / weight.sum(), 'risk': rng.lognormal(0.0, 0.35, N_POSTAL_CODES)})
+
+
+def _pick(rng, values, n, p=None):
+    values = np.asarray(values, dtype=object)
+    return values[rng.choice(len(values), n, p=p)]
+
+
+def generate_chunk(n: int, start_id: int, rng: np.random.Generator, zips: pd.DataFrame) -> pd.DataFrame:
+    """n policy-month rows in the real file's layout; IDs start at start_id."""
+    df = {}
+    df['UnderwrittenCoverID'] = np.arange(start_id, start_id + n)
+    df['PolicyID'] = rng.integers(1, max(2, (start_id + n) // 40), n)
+
+    # Volume grows over the period, as in the real book
+    month_weight = np.linspace(0.3, 1.0, len(MONTHS))
+    df['TransactionMonth'] = _pick(rng, MONTHS.strftime('%Y-%m-%d 00:00:00'), n, month_weight / month_weight.sum())
+
+    df['IsVATRegistered'] = _pick(rng, ['False', 'True'], n, [0.993, 0.007])
+    df['Citizenship'] = _pick(rng, ['  ', 'ZA', 'AF', 'ZW'], n, [0.89, 0.10, 0.005, 0.005])
+    df['LegalType'] = _pick(rng, ['Individual', 'Close Corporation', 'Private company', 'Partnership'], n,
+                            [0.90, 0.05, 0.04, 0.01])
+    df['Title'] = _pick(rng, ['Mr', 'Mrs', 'Ms', 'Miss', 'Dr'], n, [0.93, 0.03, 0.025, 0.01, 0.005])
+    df['Language'] = 'English'
+    df['Bank'] = _pick(rng, ['First National Bank', 'ABSA Bank', 'Standard Bank', 'Nedbank', 'Capitec Bank', ''],
+                       n, [0.26, 0.15, 0.13, 0.08, 0.03, 0.35])
+    df['AccountType'] = _pick(rng, ['Current account', 'Savings account', 'Transmission account', ''], n,
+                              [0.60, 0.20, 0.16, 0.04])
+    df['MaritalStatus'] = _pick(rng, ['Not specified', 'Single', 'Married', ''], n, [0.99, 0.006, 0.003, 0.001])
+    df['Gender'] = _pick(rng, ['Not specified', 'Male', 'Female', ''], n, [0.94, 0.042, 0.008, 0.01])
+    df['Country'] = 'South Africa'
+
+    zip_index = rng.choice(len(zips), n, p=zips['weight'].to_numpy())
+    df['Province'] = zips['Province'].to_numpy()[zip_index]
+    df['PostalCode'] = zips['PostalCode'].to_numpy()[zip_index]
+    df['MainCrestaZone'] = np.char.add('Zone ', (df['PostalCode'] // 1000).astype(str))
+    df['SubCrestaZone'] = np.char.add('Sub ', (df['PostalCode'] // 100).astype(str))
+    df['ItemType'] = 'Mobility - Motor'
+
+    vehicle_index = rng.choice(len(VEHICLE_TYPES), n, p=[p for p, _ in VEHICLE_TYPES.values()])
+    df['mmcode'] = np.where(rng.random(n) < 0.001, np.nan, rng.integers(4_000_000, 65_000_000, n).astype(float))
+    df['VehicleType'] = np.array(list(VEHICLE_TYPES), dtype=object)[vehicle_index]
+    df['RegistrationYear'] = np.clip(2015 - rng.geometric(0.18, n) + 1, 1987, 2015)
+    df['make'] = _pick(rng, MAKES, n)
+    df['Model'] = np.char.add(df['make'].astype(str), np.char.add(' ', rng.integers(1, 60, n).astype(str)))
+    df['Cylinders'] = _pick(rng, [4, 6, 8], n, [0.92, 0.06, 0.02]).astype(float)
+    df['cubiccapacity'] = np.round(rng.lognormal(7.7, 0.3, n))
+    df['kilowatts'] = np.round(df['cubiccapacity'] / 20 + rng.normal(0, 10, n)).clip(40, 400)
+    df['bodytype'] = _pick(rng, BODY_TYPES, n)
+    df['NumberOfDoors'] = _pick(rng, [4, 2, 5, 3], n, [0.87, 0.08, 0.03, 0.02]).astype(float)
+    df['VehicleIntroDate'] = np.char.add(rng.integers(1, 13, n).astype(str),
+                                         np.char.add('/1/', (df['RegistrationYear'] - 1).astype(str)))
+    df['CustomValueEstimate'] = np.where(rng.random(n) < 0.78, np.nan, np.round(rng.lognormal(12.0, 0.6, n)))
+    df['AlarmImmobiliser'] = _pick(rng, ['Yes', 'No'], n, [0.99, 0.01])
+    df['TrackingDevice'] = _pick(rng, ['No', 'Yes'], n, [0.72, 0.28])
+    df['CapitalOutstanding'] = np.where(rng.random(n) < 0.5, 0.0, np.round(rng.lognormal(11.5, 0.8, n)))
+    df['NewVehicle'] = _pick(rng, ['More than 6 months', 'Less than 6 months', ''], n, [0.84, 0.01, 0.15])
+    df['WrittenOff'] = _pick(rng, ['No', 'Yes', ''], n, [0.35, 0.01, 0.64])
+    df['Rebuilt'] = _pick(rng, ['No', 'Yes', ''], n, [0.35, 0.01, 0.64])
+    df['Converted'] = _pick(rng, ['No', 'Yes', ''], n, [0.35, 0.01, 0.64])
+    df['CrossBorder'] = _pick(rng, ['No', 'Yes'], n, [0.999, 0.001])
+    df['NumberOfVehiclesInFleet'] = np.full(n, np.nan)
+
+    # Mostly cover-line rows with small sums insured, plus full vehicle values
+    full_value = rng.random(n) < 0.35
+    df['SumInsured'] = np.round(np.where(full_value, rng.lognormal(12.2, 0.7, n), rng.lognormal(8.5, 1.5, n)), 2)
+    df['TermFrequency'] = _pick(rng, ['Monthly', 'Annual'], n, [0.994, 0.006])
+    df['CalculatedPremiumPerTerm'] = np.round(rng.gamma(1.1, 110.0, n) * np.where(full_value, 3.0, 0.5), 2)
+    df['ExcessSelected'] = _pick(rng, ['Mobility - Windscreen', 'No excess', 'Mobility - Metered Taxis - R2000',
+                                       'Mobility - Taxi with value more than R100 000'], n, [0.55, 0.25, 0.15, 0.05])
+    df['CoverCategory'] = _pick(rng, COVER_TYPES, n)
+    df['CoverType'] = df['CoverCategory']
+    df['CoverGroup'] = _pick(rng, ['Comprehensive - Taxi', 'Comprehensive - Retail', 'Motor Comprehensive'], n,
+                             [0.05, 0.01, 0.94])
+    df['Section'] = _pick(rng, ['Motor Comprehensive', 'Optional Extended Covers', 'Taxi'], n, [0.94, 0.01, 0.05])
+    df['Product'] = _pick(rng, ['Mobility Commercial Cover: Monthly', 'Mobility Metered Taxis: Monthly'], n,
+                          [0.94, 0.06])
+    df['StatutoryClass'] = 'Commercial'
+    df['StatutoryRiskType'] = 'IFRS Constant'
+
+    # Premium for the month: zero for a large share of rows, otherwise the term premium (ex VAT)
+    premium = np.where(rng.random(n) < 0.38, 0.0, df['CalculatedPremiumPerTerm'] / 1.15)
+    df['TotalPremium'] = np.round(premium, 6)
+
+    # Zero-inflated, heavy-tailed claims: frequency depends on zip, province and vehicle type;
+    # amounts are lognormal with a Pareto tail for the largest losses
+    province_risk = pd.Series({name: risk for name, (_, risk) in PROVINCES.items()})
+    vehicle_risk = np.array([risk for _, risk in VEHICLE_TYPES.values()])
+    frequency = (CLAIM_PROBABILITY * zips['risk'].to_numpy()[zip_index]
+                 * province_risk.reindex(df['Province']).to_numpy() * vehicle_risk[vehicle_index])
+    has_claim = rng.random(n) < frequency
+    severity = rng.lognormal(9.2, 1.3, n) * np.where(rng.random(n) < 0.05, rng.pareto(1.5, n) + 1.0, 1.0)
+    df['TotalClaims'] = np.where(has_claim, np.round(severity, 6), 0.0)
+
+    return pd.DataFrame(df, columns=COLUMNS)
+
+
+def generate(path: str, rows: int, seed: int = 42, chunk_rows: int = CHUNK_ROWS) -> str:
+    """
+    Writes `rows` synthetic rows to `path` as pipe-delimited text, chunk by chunk
+    (memory stays at one chunk). The same rows and seed always give the same file.
+    """
+    start = time.perf_counter()
+    zips = postal_codes(seed)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', newline='') as f:
+        for i, offset in enumerate(range(0, rows, chunk_rows)):
+            chunk = generate_chunk(min(chunk_rows, rows - offset), offset + 1,
+                                   np.random.default_rng([seed, i]), zips)
+            chunk.to_csv(f, sep='|', index=False, header=(i == 0))
+    os.replace(tmp_path, path)
+    print(f"Wrote {rows:,} rows to {path} ({os.path.getsize(path) / 2**20:,.0f} MB) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return path
+
+
+def dataset_path(rows: int, data_dir: str = 'benchmarks/data', seed: int = 42) -> str:
+    return os.path.join(data_dir, f"synthetic_{rows}_s{seed}.txt")
+
+
+def parse_rows(value: str) -> int:
+    """'100k', '1m', '10m' or a plain row count."""
+    return SIZES.get(value.lower()) or int(value)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Synthetic claims data with the real file's schema.")
+    parser.add_argument('--rows', nargs='+', default=list(SIZES), help="sizes: 100k, 1m, 10m or row counts")
+    parser.add_argument('--out-dir', default='benchmarks/data')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for size in args.rows:
+        rows = parse_rows(size)
+        generate(dataset_path(rows, args.out_dir, args.seed), rows, args.seed)
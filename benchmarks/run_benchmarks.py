@@ -0,0 +1,221 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from benchmarks.generate_data import SIZES, dataset_path, generate, parse_rows
+from src.utils import get_logger, track_stage
+
+logger = get_logger('Benchmarks')
+
+STAGES = ['load_cold', 'load_cached', 'clean', 'hypothesis', 'modeling', 'evidence']
+RESULTS_DIR = 'benchmarks/results'
+# Each case runs with this as its working directory, so the Parquet cache, SHAP
+# cache, figures and logs it writes never touch the project's own
+WORK_DIR = 'benchmarks/work'
+# Relative slowdown (wall time or peak RSS) reported as a regression by --compare
+REGRESSION_THRESHOLD = 0.10
+
+
+# --- Cases: setup (untimed) -> timed call ---
+
+def _cached_frame(data_path, columns=None):
+    from src.loader import DataLoader
+    return DataLoader(data_path, workers=-1).load_data(columns=columns)
+
+
+def case_load_cold(data_path, workers):
+    from src.cache import ColumnarCache
+    from src.loader import DataLoader
+    for path in glob.glob(os.path.join(os.path.dirname(ColumnarCache(data_path).path), '*.parquet')):
+        os.remove(path)
+    loader = DataLoader(data_path, workers=workers)
+    return lambda: loader.load_data()
+
+
+def case_load_cached(data_path, workers):
+    from src.loader import DataLoader
+    _cached_frame(data_path)
+    loader = DataLoader(data_path, workers=workers)
+    return lambda: loader.load_data()
+
+
+def case_clean(data_path, workers):
+    from src.cleaning import handle_missing_values
+    df = _cached_frame(data_path)
+    return lambda: handle_missing_values(df)
+
+
+def case_hypothesis(data_path, workers):
+    from src.hypothesis_testing import HYPOTHESIS_COLUMNS, perform_hypothesis_testing
+    df = _cached_frame(data_path, HYPOTHESIS_COLUMNS)
+    return lambda: perform_hypothesis_testing(df)
+
+
+def case_modeling(data_path, workers):
+    from src.modeling import load_data, train_models
+    df = load_data(data_path)
+    # A SHAP cache hit from an earlier run would hide the explanation cost
+    shutil.rmtree('data/cache/shap', ignore_errors=True)
+    return lambda: train_models(df, n_jobs=workers, model_path=None)
+
+
+def case_evidence(data_path, workers):
+    from src.generate_evidence import EVIDENCE_COLUMNS, generate_plots
+    df = _cached_frame(data_path, EVIDENCE_COLUMNS)
+    for col in ['TotalPremium', 'TotalClaims']:
+        df[col] = df[col].fillna(0)
+    return lambda: generate_plots(df)
+
+
+CASES = {name: globals()[f'case_{name}'] for name in STAGES}
+
+
+def _run_case(stage, data_path, rows, workers, trace_memory, metrics_file, log_path):
+    """Child process: prepares one case, then measures only the call under test."""
+    import matplotlib
+    matplotlib.use('Agg')
+
+    os.makedirs(WORK_DIR, exist_ok=True)
+    os.chdir(WORK_DIR)
+    try:
+        with open(log_path, 'w') as log, redirect_stdout(log):
+            call = CASES[stage](data_path, workers)
+            # rows/sec is over the dataset size for every stage, so sizes compare on one scale
+            with track_stage(f'bench.{stage}', rows=rows, trace_memory=trace_memory, metrics_file=metrics_file):
+                call()
+    finally:
+        # Idle joblib workers would otherwise keep this process alive (as in pipeline._run_stage)
+        from joblib.externals.loky import get_reusable_executor
+        get_reusable_executor().shutdown(wait=True)
+
+
+def _read_last(path):
+    with open(path) as f:
+        return json.loads(f.read().splitlines()[-1])
+
+
+def run_case(stage, data_path, rows, workers=-1, trace_memory=False) -> dict:
+    """
+    Runs one case in a freshly spawned process, so its peak RSS is not inflated by
+    what earlier cases (or this process) left behind, and every platform measures
+    the same way. Returns the track_stage record.
+    """
+    work_dir = os.path.abspath(WORK_DIR)
+    os.makedirs(os.path.join(work_dir, 'logs'), exist_ok=True)
+    name = os.path.splitext(os.path.basename(data_path))[0]
+    metrics_file = os.path.join(work_dir, 'logs', f'{name}-{stage}.json')
+    log_path = os.path.join(work_dir, 'logs', f'{name}-{stage}.log')
+    if os.path.exists(metrics_file):
+        os.remove(metrics_file)
+
+    process = multiprocessing.get_context('spawn').Process(
+        target=_run_case,
+        args=(stage, os.path.abspath(data_path), rows, workers, trace_memory, metrics_file, log_path))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        raise RuntimeError(f"{stage} on {data_path} failed (exit code {process.exitcode}); see {log_path}")
+    return _read_last(metrics_file)
+
+
+# --- Results ---
+
+def git_revision() -> dict:
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+    return {'commit': git('rev-parse', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no'))}
+
+
+def run_benchmarks(sizes: list, stages: list = STAGES, workers: int = -1, seed: int = 42,
+                   data_dir: str = 'benchmarks/data', trace_memory: bool = False) -> dict:
+    """Generates any missing dataset, then runs every stage at every size."""
+    report = {
+        **git_revision(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': workers,
+        'seed': seed,
+        'results': [],
+    }
+    for rows in sizes:
+        data_path = dataset_path(rows, data_dir, seed)
+        if not os.path.exists(data_path):
+            generate(data_path, rows, seed)
+        for stage in stages:
+            record = run_case(stage, data_path, rows, workers, trace_memory)
+            record.update({'size': rows, 'stage': stage})
+            report['results'].append(record)
+            logger.info(f"{rows:>12,} rows  {stage:<12} {record['wall_s']:>9.2f}s  "
+                        f"peak RSS {record['rss_peak_mb']:>8,.0f} MB")
+    return report
+
+
+def save_report(report: dict, results_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(results_dir, exist_ok=True)
+    commit = (report.get('commit') or 'nogit')[:10] + ('-dirty' if report.get('dirty') else '')
+    path = os.path.join(results_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{commit}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Benchmark results saved to {path}")
+    return path
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD, out=sys.stdout) -> list:
+    """
+    Prints wall time and peak RSS of each (size, stage) against a baseline report
+    and returns the cases that got slower or bigger by more than `threshold`.
+    """
+    before = {(r['size'], r['stage']): r for r in baseline['results']}
+    regressions = []
+    print(f"Baseline {str(baseline.get('commit'))[:10]} ({baseline.get('created_at')}) vs "
+          f"{str(current.get('commit'))[:10]} ({current.get('created_at')})", file=out)
+    print(f"{'rows':>12}  {'stage':<12}{'wall (s)':>20}{'change':>9}{'peak RSS (MB)':>22}{'change':>9}", file=out)
+    for record in current['results']:
+        old = before.get((record['size'], record['stage']))
+        if old is None:
+            continue
+        wall_change = record['wall_s'] / old['wall_s'] - 1 if old['wall_s'] else 0.0
+        rss_change = record['rss_peak_mb'] / old['rss_peak_mb'] - 1 if old['rss_peak_mb'] else 0.0
+        flag = '  <-- regression' if max(wall_change, rss_change) > threshold else ''
+        if flag:
+            regressions.append((record['size'], record['stage']))
+        print(f"{record['size']:>12,}  {record['stage']:<12}"
+              f"{old['wall_s']:>9.2f} -> {record['wall_s']:>7.2f}{wall_change:>+9.0%}"
+              f"{old['rss_peak_mb']:>10,.0f} -> {record['rss_peak_mb']:>8,.0f}{rss_change:>+9.0%}{flag}", file=out)
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time and memory-profile the analysis stages on synthetic data.")
+    parser.add_argument('--sizes', nargs='+', default=list(SIZES), help="100k, 1m, 10m or row counts")
+    parser.add_argument('--stages', nargs='+', default=STAGES, choices=STAGES)
+    parser.add_argument('--workers', type=int, default=-1, help="processes for parsing / CPUs for modeling")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--data-dir', default='benchmarks/data')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="also record the tracemalloc peak (slows the stages down)")
+    parser.add_argument('--compare', metavar='BASELINE_JSON', help="compare against an earlier results file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD)
+    args = parser.parse_args()
+
+    report = run_benchmarks([parse_rows(size) for size in args.sizes], args.stages, args.workers,
+                            args.seed, args.data_dir, args.tracemalloc)
+    save_report(report)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            raise SystemExit(1)
@@ -1,25 +1,114 @@
+import argparse
+from contextlib import redirect_stdout
+from src.cache import data_fingerprint
 from src.loader import DataLoader
-from src.eda import EDAStrategy
+from src.pipeline import PipelineRunner, Stage, print_plan
 from src.utils import get_logger
 
 logger = get_logger('MainPipeline')
 
+DATA_PATH = 'data/insurance_claims.csv'
+
+# Stage functions import their module lazily, so a cached stage costs nothing
+
+
+def load_stage(inputs, data_path=DATA_PATH):
+    return DataLoader(data_path, workers=-1).load_data()
+
+
+def validate_stage(inputs, data_path=DATA_PATH):
+    from src.validation import validate_file
+    # Reads the raw file itself (the loaded frame has already dropped rejected rows)
+    validate_file(data_path, workers=-1)
+
+
+def clean_stage(inputs):
+    from src.cleaning import handle_missing_values
+    return handle_missing_values(inputs['load'].copy())
+
+
+def eda_stage(inputs):
+    from src.eda import EDAStrategy
+    # Univariate + Multivariate (Correlation, Premium vs Claims), saved headless to results/figures
+    EDAStrategy(inputs['clean']).render_all()
+
+
+def hypothesis_stage(inputs, output_path='results/hypothesis_tests.txt'):
+    from src.hypothesis_testing import HYPOTHESIS_COLUMNS, perform_hypothesis_testing
+    df = inputs['load']
+    with open(output_path, 'w') as report, redirect_stdout(report):
+        perform_hypothesis_testing(df[[col for col in HYPOTHESIS_COLUMNS if col in df.columns]])
+
+
+def modeling_stage(inputs, data_path=DATA_PATH, feature_path='sparse', search_budget=None):
+    from src.modeling import MODEL_COLUMNS, train_models
+    df = inputs['load']
+    df = df[[col for col in MODEL_COLUMNS if col in df.columns]].copy()
+    # Same gaps filled as modeling.load_data
+    for col in ['TotalClaims', 'CalculatedPremiumPerTerm', 'SumInsured']:
+        if col in df.columns:
+            df[col] = df[col].fillna(0)
+    train_models(df, feature_path=feature_path, data_hash=data_fingerprint(data_path),
+                 search_budget=search_budget)
+
+
+def evidence_stage(inputs):
+    from src.generate_evidence import EVIDENCE_COLUMNS, generate_plots
+    df = inputs['load']
+    df = df[[col for col in EVIDENCE_COLUMNS if col in df.columns]].copy()
+    for col in ['TotalPremium', 'TotalClaims']:
+        df[col] = df[col].fillna(0)
+    generate_plots(df)
+
+
+def reprice_stage(inputs, data_path=DATA_PATH):
+    from src.repricing import reprice, save_tables
+    # Streams the raw file with the model the modeling stage saved
+    save_tables(reprice(data_path))
+
+
+def build_stages(data_path=DATA_PATH, search_budget=None):
+    return [
+        Stage('load', load_stage, params={'data_path': data_path}, in_process=True),
+        Stage('validate', validate_stage, params={'data_path': data_path},
+              outputs=['results/data_quality/summary.json', 'results/data_quality/rejected_rows.csv']),
+        Stage('clean', clean_stage, inputs=['load'], in_process=True),
+        Stage('eda', eda_stage, inputs=['clean'],
+              outputs=['results/figures/distributions.png', 'results/figures/correlation_matrix.png',
+                       'results/figures/premium_vs_claims_density.png']),
+        Stage('hypothesis', hypothesis_stage, inputs=['load'],
+              outputs=['results/hypothesis_tests.txt']),
+        Stage('modeling', modeling_stage, inputs=['load'],
+              params={'data_path': data_path, 'search_budget': search_budget},
+              outputs=['models/best_model.joblib', 'results/figures/shap_summary.png']),
+        Stage('evidence', evidence_stage, inputs=['load'],
+              outputs=['results/figures/loss_ratio_province.png', 'results/figures/temporal_trends.png',
+                       'results/figures/margin_zipcode.png']),
+        Stage('reprice', reprice_stage, inputs=['modeling'], params={'data_path': data_path},
+              files=['models/frequency_model.joblib'],
+              outputs=['results/repricing/scenarios.csv', 'results/repricing/province.csv',
+                       'results/repricing/postal_code.csv']),
+    ]
+
+
 if __name__ == "__main__":
-    logger.info("Starting AlphaCare Analysis Pipeline...")
+    parser = argparse.ArgumentParser(description="AlphaCare analysis pipeline (cached stage DAG).")
+    parser.add_argument('stages', nargs='*', help="stages to bring up to date (default: all)")
+    parser.add_argument('--data', default=DATA_PATH)
+    parser.add_argument('--force', action='store_true', help="rerun the named stages even if cached")
+    parser.add_argument('--workers', type=int, default=-1, help="stages run concurrently (-1 = all cores)")
+    parser.add_argument('--search-budget', type=float, default=None,
+                        help="seconds for the modeling stage's hyperparameter search")
+    parser.add_argument('--plan', action='store_true', help="show what would run and exit")
+    args = parser.parse_args()
 
-    # 1. Load Data
-    loader = DataLoader('data/insurance_claims.csv')
-    df = loader.load_data()
-
-    # 2. Run EDA
-    if df is not None:
-        eda = EDAStrategy(df)
-        
-        # Univariate
-        eda.plot_distributions()
-        
-        # Multivariate (Correlation) - Fills the gap in feedback
-        eda.plot_correlations()
-        eda.plot_scatter_premium_vs_claims()
-        
-    logger.info("Pipeline completed successfully.")
\ No newline at end of file
+    logger.info("Starting AlphaCare Analysis Pipeline...")
+    runner = PipelineRunner(build_stages(args.data, args.search_budget), data_fingerprint(args.data),
+                            workers=args.workers)
+    if args.plan:
+        print_plan(runner, args.stages)
+    else:
+        status = runner.run(args.stages, force=args.force)
+        if 'failed' in status.values():
+            raise SystemExit(1)
+        logger.info("Pipeline completed successfully.")
@@ -0,0 +1,101 @@
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from src.cache import ColumnarCache
+from src.loader import CHUNK_BYTES, DataLoader, csv_options, parse_byte_range, select_usecols
+from src.utils import get_logger
+
+logger = get_logger('Aggregation')
+
+# Additive per-group measures: partials from any split of the rows sum to the full-data values
+MEASURES = ['n', 'claim_count', 'premium', 'claims', 'margin', 'margin_sq']
+UNKNOWN_MONTH = 'unknown'
+
+
+def measure_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-row additive measures (built once per chunk, shared by every grouping)."""
+    premium = df['TotalPremium'].fillna(0).astype('float64')
+    claims = df['TotalClaims'].fillna(0).astype('float64')
+    margin = premium - claims
+    return pd.DataFrame({
+        'n': 1,
+        'claim_count': (claims > 0).astype('int64'),
+        'premium': premium,
+        'claims': claims,
+        'margin': margin,
+        'margin_sq': margin * margin,
+    }, index=df.index)
+
+
+def month_keys(df: pd.DataFrame) -> pd.Series:
+    """'YYYY-MM' partition key per row ('unknown' when TransactionMonth is missing)."""
+    months = df['TransactionMonth']
+    if not pd.api.types.is_datetime64_any_dtype(months):
+        months = pd.to_datetime(months, errors='coerce')
+    return months.dt.strftime('%Y-%m').fillna(UNKNOWN_MONTH)
+
+
+def group_stats(df: pd.DataFrame, by: list, measures: pd.DataFrame = None) -> pd.DataFrame:
+    """
+    Sums the additive measures per group of `by`.
+    Group keys are returned as plain values (not categoricals), so partials from
+    chunks with different category levels align when merged.
+    """
+    if measures is None:
+        measures = measure_frame(df)
+    stats = measures.groupby([df[col] for col in by], observed=True).sum().reset_index()
+    for col in by:
+        if isinstance(stats[col].dtype, pd.CategoricalDtype):
+            stats[col] = stats[col].astype(stats[col].cat.categories.dtype)
+    return stats.set_index(by)
+
+
+def merge_stats(left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+    """Adds two partial group_stats frames (either may be None)."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    combined = pd.concat([left, right])
+    return combined.groupby(level=list(range(combined.index.nlevels))).sum()
+
+
+def _apply_to_range(func, filepath, start, end, sep, dtypes, usecols):
+    """Worker: parses one byte range and returns (func(df), rejected rows)."""
+    df, malformed, unparseable, _ = parse_byte_range(filepath, start, end, sep, dtypes, usecols)
+    return func(df), malformed + unparseable
+
+
+def map_chunks(filepath: str, func, columns: list = None, workers: int = 1, chunk_bytes: int = CHUNK_BYTES):
+    """
+    Streams the data in bounded chunks and yields func(chunk) for each one.
+    With workers > 1 (or -1 for all cores) cold CSV chunks are parsed and reduced
+    in worker processes, so only the small per-chunk results cross back.
+    `func` must be picklable (a module-level function or functools.partial).
+    """
+    workers = os.cpu_count() if workers == -1 else max(1, workers)
+    loader = DataLoader(filepath)
+
+    # The columnar cache is cheap to scan, so there is nothing to gain from processes
+    if workers == 1 or ColumnarCache(filepath).exists():
+        for df in loader.iter_chunks(columns, chunk_bytes):
+            yield func(df)
+        if loader.rejected_rows:
+            logger.warning(f"⚠️ Rejected {loader.rejected_rows} rows while streaming {filepath}")
+        return
+
+    sep, header, dtypes = csv_options(filepath)
+    usecols = select_usecols(header, columns)
+    ranges = loader.byte_ranges(chunk_bytes)
+    logger.info(f"Streaming {len(ranges)} chunks of {filepath} on {workers} workers...")
+
+    rejected = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_apply_to_range, func, filepath, start, end, sep, dtypes, usecols)
+                   for start, end in ranges]
+        for future in futures:
+            result, rejected_rows = future.result()
+            rejected += rejected_rows
+            yield result
+    if rejected:
+        logger.warning(f"⚠️ Rejected {rejected} rows while streaming {filepath}")
@@ -0,0 +1,51 @@
+import json
+import os
+import platform
+from datetime import datetime, timezone
+import joblib
+import sklearn
+import xgboost
+from src.schema import SCHEMA_VERSION
+from src.utils import get_logger
+
+logger = get_logger('Artifacts')
+
+
+def metadata_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + '.json'
+
+
+def save_model(pipeline, model_path: str, metadata: dict):
+    """
+    Saves a fitted pipeline with a JSON sidecar describing how to feed it:
+    feature lists, training dtypes, the data hash it was trained on and the
+    library versions needed to load it again.
+    """
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    joblib.dump(pipeline, model_path)
+
+    metadata = dict(metadata)
+    metadata.update({
+        'schema_version': SCHEMA_VERSION,
+        'saved_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sklearn': sklearn.__version__,
+        'xgboost': xgboost.__version__,
+    })
+    with open(metadata_path(model_path), 'w') as f:
+        json.dump(metadata, f, indent=2, default=float)
+    logger.info(f"Model artifact saved: {model_path}")
+
+
+def load_model(model_path: str):
+    """Returns (pipeline, metadata) for an artifact written by save_model."""
+    if not os.path.exists(model_path):
+        logger.error(f"Model not found: {model_path}")
+        raise FileNotFoundError(f"Model not found: {model_path}")
+
+    with open(metadata_path(model_path)) as f:
+        metadata = json.load(f)
+    if metadata.get('schema_version') != SCHEMA_VERSION:
+        logger.warning(f"⚠️ Model was trained on schema v{metadata.get('schema_version')}, "
+                       f"current schema is v{SCHEMA_VERSION}")
+    return joblib.load(model_path), metadata
@@ -0,0 +1,90 @@
+import glob
+import hashlib
+import os
+import re
+import pandas as pd
+import pyarrow.parquet as pq
+from src.schema import SCHEMA_VERSION
+from src.utils import get_logger
+
+logger = get_logger('ColumnarCache')
+
+CACHE_DIR = 'data/cache'
+
+
+def data_fingerprint(filepath: str) -> str:
+    """
+    Returns a content hash for a data file.
+    Prefers the md5 recorded by DVC in '<file>.dvc' so the raw CSV never has to be re-hashed.
+    Falls back to size + mtime when the file is untracked or no longer matches its .dvc entry.
+    """
+    stat = os.stat(filepath)
+    dvc_file = f"{filepath}.dvc"
+
+    if os.path.exists(dvc_file):
+        with open(dvc_file) as f:
+            content = f.read()
+        md5 = re.search(r'md5:\s*([0-9a-f]{32})', content)
+        size = re.search(r'size:\s*(\d+)', content)
+
+        # A size mismatch means the CSV was edited without `dvc add`
+        if md5 and (size is None or int(size.group(1)) == stat.st_size):
+            return md5.group(1)
+
+    return hashlib.md5(f"{stat.st_size}-{stat.st_mtime_ns}".encode()).hexdigest()
+
+
+class ColumnarCache:
+    """
+    Parquet copy of a parsed CSV, keyed on the data hash and the schema version.
+    Reads only the requested columns and replaces stale copies when the data changes.
+    """
+
+    def __init__(self, filepath: str, cache_dir: str = CACHE_DIR):
+        self.filepath = filepath
+        self.cache_dir = cache_dir
+        self.stem = os.path.splitext(os.path.basename(filepath))[0]
+        self.fingerprint = data_fingerprint(filepath)
+
+    @property
+    def path(self) -> str:
+        key = f"{self.stem}-{self.fingerprint[:12]}-v{SCHEMA_VERSION}"
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def columns(self) -> list:
+        """Column names stored in the cache (read from the Parquet footer only)."""
+        return pq.ParquetFile(self.path).schema_arrow.names
+
+    def read(self, columns: list = None) -> pd.DataFrame:
+        """Loads the cached frame, restricted to `columns` when given."""
+        return pd.read_parquet(self.path, columns=self._available(columns))
+
+    def iter_batches(self, columns: list = None, batch_size: int = 250_000):
+        """Yields the cached frame in row batches of at most `batch_size`."""
+        parquet_file = pq.ParquetFile(self.path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=self._available(columns)):
+            yield batch.to_pandas()
+
+    def _available(self, columns: list = None):
+        if columns is None:
+            return None
+        available = set(self.columns())
+        return [col for col in columns if col in available]
+
+    def write(self, df: pd.DataFrame):
+        """Writes the frame atomically and removes caches built from older data."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Columnar cache written: {self.path}")
+        self._purge_stale()
+
+    def _purge_stale(self):
+        for path in glob.glob(os.path.join(self.cache_dir, f"{self.stem}-*.parquet")):
+            if path != self.path:
+                os.remove(path)
+                logger.info(f"Removed stale cache: {path}")
@@ -1,21 +1,206 @@
 # src/cleaning.py
+import argparse
+import os
+from collections import Counter
+from functools import partial
+import joblib
+import numpy as np
+import pandas as pd
+from src.aggregation import map_chunks
+from src.sketches import QuantileSketch
+from src.utils import get_logger, instrument
 
-def handle_missing_values(df):
+logger = get_logger('Cleaning')
+
+IMPUTER_PATH = 'models/imputer.joblib'
+
+# Whole-number numeric columns with at most this many distinct values (years, cylinders,
+# doors, engine sizes, ...) are counted exactly, so their streamed median is exact
+EXACT_MAX_VALUES = 10_000
+
+
+class StreamingImputer:
+    """
+    Learns fill values once and applies them to any frame:
+    - Numeric columns -> Median (robust to outliers)
+    - Categorical columns -> Mode (most frequent), from a value counter
+
+    fit() on a frame uses the exact median. Streamed fits (partial_fit / merge,
+    e.g. chunks on separate workers) count whole-number columns with few
+    distinct values exactly and read the others from a QuantileSketch, within
+    `relative_accuracy` of the exact median. Sketch estimates for whole-number
+    columns are rounded; exact medians are used as they are. The fitted state
+    is small and can be saved and loaded again, so scoring data is filled with
+    the training statistics.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.sketches = {}
+        self.counts = {}
+        self.value_counts = {}      # numeric column -> Counter of values, None once not exact-countable
+        self.integral = {}          # numeric column -> every observed value is a whole number
+        self.medians = {}           # exact medians, only from fit() on a whole frame
+        self.rows = 0
+        self._fill_values = None
+
+    def fit(self, df: pd.DataFrame) -> 'StreamingImputer':
+        self.sketches, self.counts, self.value_counts, self.integral, self.rows = {}, {}, {}, {}, 0
+        self.partial_fit(df)
+        self.medians = {col: float(df[col].median()) for col, sketch in self.sketches.items() if sketch.count}
+        return self
+
+    def partial_fit(self, df: pd.DataFrame) -> 'StreamingImputer':
+        """Adds one chunk's statistics."""
+        for col in df.columns:
+            values = df[col]
+            if pd.api.types.is_bool_dtype(values):
+                continue
+            if pd.api.types.is_numeric_dtype(values):
+                values = values.to_numpy(dtype='float64', na_value=np.nan)
+                values = values[~np.isnan(values)]
+                self.sketches.setdefault(col, QuantileSketch(self.relative_accuracy)).update(values)
+                self._count_values(col, values)
+            elif isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(values) \
+                    or pd.api.types.is_string_dtype(values):
+                counts = values.value_counts(sort=False)
+                counts = counts[counts > 0]
+                self.counts.setdefault(col, Counter()).update(dict(zip(counts.index.tolist(), counts.tolist())))
+        self.rows += len(df)
+        self.medians = {}
+        self._fill_values = None
+        return self
+
+    def _count_values(self, col: str, values: np.ndarray):
+        self.integral[col] = self.integral.get(col, True) and bool(np.all(values == np.round(values)))
+        counts = self.value_counts.setdefault(col, Counter())
+        if counts is None:
+            return
+        if not self.integral[col]:
+            self.value_counts[col] = None
+            return
+        keys, freq = np.unique(values, return_counts=True)
+        counts.update(dict(zip(keys.tolist(), freq.tolist())))
+        if len(counts) > EXACT_MAX_VALUES:
+            self.value_counts[col] = None
+
+    def merge(self, other: 'StreamingImputer') -> 'StreamingImputer':
+        """Folds in an imputer fitted on other rows (e.g. another worker's chunks)."""
+        for col, sketch in other.sketches.items():
+            if col in self.sketches:
+                self.sketches[col].merge(sketch)
+            else:
+                self.sketches[col] = sketch
+        for col, counts in other.counts.items():
+            self.counts.setdefault(col, Counter()).update(counts)
+        for col, counts in other.value_counts.items():
+            mine = self.value_counts.get(col, Counter())
+            if mine is None or counts is None or len(mine.keys() | counts.keys()) > EXACT_MAX_VALUES:
+                self.value_counts[col] = None
+            else:
+                self.value_counts[col] = mine + counts
+            self.integral[col] = self.integral.get(col, True) and other.integral[col]
+        self.rows += other.rows
+        self.medians = {}
+        self._fill_values = None
+        return self
+
+    @property
+    def fill_values(self) -> dict:
+        """{column: median or mode}; columns that were never observed non-missing are left out."""
+        if self._fill_values is None:
+            values = {}
+            for col, sketch in self.sketches.items():
+                if not sketch.count:
+                    continue
+                if col in self.medians:
+                    values[col] = self.medians[col]
+                elif self.value_counts.get(col):
+                    values[col] = _counter_median(self.value_counts[col])
+                else:
+                    # Only the sketch estimate is approximate; keep it a whole number where the data is
+                    median = sketch.quantile(0.5)
+                    values[col] = float(np.round(median)) if self.integral.get(col) else median
+            for col, counts in self.counts.items():
+                if counts:
+                    # Ties go to the smallest value, as with Series.mode()[0]
+                    values[col] = max(sorted(counts), key=counts.__getitem__)
+            self._fill_values = values
+        return self._fill_values
+
+    def transform(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
+        """
+        Fills the gaps in df's fitted columns.
+        inplace=True fills df itself, column by column, instead of returning a copy.
+        """
+        if not inplace:
+            df = df.copy()
+        fills = {}
+        for col, value in self.fill_values.items():
+            if col not in df.columns or not df[col].hasnans:
+                continue
+            if isinstance(df[col].dtype, pd.CategoricalDtype) and value not in df[col].cat.categories:
+                df[col] = df[col].cat.add_categories([value])
+            fills[col] = value
+        if fills:
+            df.fillna(fills, inplace=True)
+        return df
+
+    def save(self, path: str = IMPUTER_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        joblib.dump(self, path)
+        logger.info(f"Imputer saved: {path} ({len(self.fill_values)} columns, {self.rows:,} rows)")
+
+    @classmethod
+    def load(cls, path: str = IMPUTER_PATH) -> 'StreamingImputer':
+        return joblib.load(path)
+
+
+def _counter_median(counts: Counter) -> float:
+    """Exact median of counted values (mean of the two middle ones for an even count, as Series.median)."""
+    keys = np.array(sorted(counts), dtype='float64')
+    cumulative = np.cumsum([counts[key] for key in sorted(counts)])
+    total = cumulative[-1]
+    low = keys[np.searchsorted(cumulative, (total - 1) // 2, side='right')]
+    high = keys[np.searchsorted(cumulative, total // 2, side='right')]
+    return (low + high) / 2
+
+
+def _fit_chunk(df, relative_accuracy=0.01):
+    """Worker: one chunk's imputer statistics."""
+    return StreamingImputer(relative_accuracy).fit(df)
+
+
+def fit_imputer(filepath: str, columns: list = None, workers: int = -1,
+                relative_accuracy: float = 0.01) -> StreamingImputer:
+    """Fits an imputer on every row of the file in one chunked (parallel on a cold CSV) pass."""
+    imputer = StreamingImputer(relative_accuracy)
+    for part in map_chunks(filepath, partial(_fit_chunk, relative_accuracy=relative_accuracy), columns, workers):
+        imputer.merge(part)
+    return imputer
+
+
+@instrument('clean', rows=lambda df, *args, **kwargs: len(df))
+def handle_missing_values(df, imputer: StreamingImputer = None):
     """
-    Imputes missing values:
+    Imputes missing values in place:
     - Numeric columns -> Median (robust to outliers)
     - Categorical columns -> Mode (most frequent)
+    Pass a fitted StreamingImputer to reuse its statistics instead of learning them from df.
     """
-    # 1. Numerical: Fill with Median
-    num_cols = df.select_dtypes(include=['float64', 'int64']).columns
-    for col in num_cols:
-        median_val = df[col].median()
-        df[col] = df[col].fillna(median_val)
-    
-    # 2. Categorical: Fill with Mode or "Unknown"
-    cat_cols = df.select_dtypes(include=['object']).columns
-    for col in cat_cols:
-        mode_val = df[col].mode()[0]
-        df[col] = df[col].fillna(mode_val)
-        
-    return df
\ No newline at end of file
+    if imputer is None:
+        imputer = StreamingImputer().fit(df)
+    return imputer.transform(df, inplace=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit the missing-value imputer on the full data and save it.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--output', default=IMPUTER_PATH)
+    parser.add_argument('--workers', type=int, default=-1, help="processes to use (-1 = all cores)")
+    args = parser.parse_args()
+
+    imputer = fit_imputer(args.data, workers=args.workers)
+    imputer.save(args.output)
+    for col, value in imputer.fill_values.items():
+        print(f"{col:<28}{value}")
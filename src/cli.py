@@ -0,0 +1,269 @@
+"""
+One entry point for the analysis: python -m src.cli <command> [options]
+
+Only argparse and the standard library are imported up front; each command
+imports pandas, matplotlib, scikit-learn, xgboost, ... inside its handler, so
+`--help` or a quick test run never pays for libraries it does not use.
+`python -m src.cli startup` checks that this stays true, and that commands which
+draw nothing never import the plotting / model-explanation libraries.
+"""
+import argparse
+import ast
+import importlib
+import inspect
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+DATA_PATH = 'data/insurance_claims.csv'
+# Same as loader.CHUNK_BYTES, which cannot be imported here without pandas
+CHUNK_MB = 64
+
+# `python -m src.cli --help` must finish within this (interpreter start included)
+STARTUP_BUDGET_SECONDS = 0.5
+# Must not be imported before a command runs
+HEAVY_MODULES = ['pandas', 'numpy', 'scipy', 'matplotlib', 'seaborn', 'sklearn', 'xgboost', 'shap', 'pyarrow',
+                 'joblib', 'psutil']
+# Only the commands that draw figures or explain models may import these
+PLOTTING_MODULES = ['matplotlib', 'seaborn', 'shap']
+PLOTTING_COMMANDS = ['eda', 'train', 'evidence']
+
+
+# --- Commands ---
+
+def cmd_load(args):
+    """Parses the CSV (in parallel) and (re)builds the columnar cache."""
+    from src.cache import ColumnarCache
+    from src.loader import DataLoader
+
+    cache = ColumnarCache(args.data)
+    if args.rebuild and cache.exists():
+        os.remove(cache.path)
+    df = DataLoader(args.data, workers=args.workers).load_data()
+    print(f"{args.data}: {df.shape[0]:,} rows x {df.shape[1]} columns, cache {cache.path}")
+
+
+def cmd_validate(args):
+    from src.validation import validate_file
+    summary = validate_file(args.data, args.workers, output_dir=args.output_dir)
+    return 1 if summary['rejected_rows'] and args.strict else 0
+
+
+def cmd_eda(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.cleaning import handle_missing_values
+    from src.eda import EDAStrategy
+    from src.loader import DataLoader
+
+    df = handle_missing_values(DataLoader(args.data, workers=args.workers).load_data())
+    EDAStrategy(df, output_dir=args.output_dir).render_all(workers=args.workers)
+
+
+def cmd_test(args):
+    from src.hypothesis_testing import (HYPOTHESIS_COLUMNS, run_permutation_tests, run_tests,
+                                        stream_test_stats)
+
+    # Every row is tested: the statistics are streamed, never the full frame
+    run_tests(stream_test_stats(args.data, args.workers))
+    if args.permutations > 0:
+        from src.loader import DataLoader
+        df = DataLoader(args.data).load_data(columns=HYPOTHESIS_COLUMNS)
+        run_permutation_tests(df, args.permutations, args.workers, args.seed)
+
+
+def cmd_train(args):
+    import matplotlib
+    matplotlib.use('Agg')
+
+    if args.out_of_core:
+        from src.out_of_core import train_out_of_core
+        train_out_of_core(args.data, args.chunk_mb * 1024 * 1024, args.epochs, args.rounds)
+        return
+
+    from src.cache import data_fingerprint
+    from src.modeling import load_data, train_models
+    train_models(load_data(args.data), n_jobs=args.workers, data_hash=data_fingerprint(args.data),
+                 search_budget=args.search_budget)
+
+
+def cmd_score(args):
+    from src.scoring import score_file
+    score_file(args.input, args.output, args.model, args.chunk_mb * 1024 * 1024)
+
+
+def cmd_evidence(args):
+    import matplotlib
+    matplotlib.use('Agg')
+    from src.generate_evidence import plot_evidence, stream_evidence
+
+    aggregator, margins = stream_evidence(args.data, args.workers, exact=not args.approximate)
+    plot_evidence(aggregator, margins)
+
+
+def cmd_reprice(args):
+    from src.repricing import reprice, save_tables, scenario_grid
+
+    caps = [None if cap.lower() == 'none' else float(cap) for cap in args.caps]
+    result = reprice(args.data, scenario_grid(args.loadings, caps), args.severity_model,
+                     None if args.claim_rate is not None else args.frequency_model, args.claim_rate,
+                     args.chunk_mb * 1024 * 1024, args.workers)
+    save_tables(result, args.output_dir)
+    print(result.table().droplevel('book').to_string(float_format=lambda v: f"{v:,.3f}"))
+
+
+def import_command(name: str):
+    """Runs every import statement in cmd_<name> (all branches) without running the command itself."""
+    tree = ast.parse(inspect.getsource(globals()[f"cmd_{name}"]))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom):
+            importlib.import_module(node.module)
+        elif isinstance(node, ast.Import):
+            for alias in node.names:
+                importlib.import_module(alias.name)
+
+
+def import_times(argv: list) -> tuple:
+    """
+    Runs `python <argv>` (e.g. ['-m', 'src.cli', '--help']) under -X importtime.
+    Returns ({top-level import: cumulative microseconds}, every module name imported).
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', *argv], capture_output=True, text=True)
+    times, modules = {}, set()
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \|( +)(\S+)', line)
+        if not match:
+            continue
+        modules.add(match.group(3))
+        # Nested imports are indented further; their time is in their importer's total
+        if len(match.group(2)) == 1:
+            times[match.group(3)] = int(match.group(1))
+    return times, modules
+
+
+def command_imports(name: str) -> set:
+    """Top-level names of every module cmd_<name> imports, measured in a fresh interpreter."""
+    _, modules = import_times(['-c', f"import src.cli; src.cli.import_command({name!r})"])
+    return {module.split('.')[0] for module in modules}
+
+
+def cmd_startup(args):
+    """
+    Times `python -m src.cli --help` and fails when it is over budget or imports a heavy library,
+    or when a command that draws nothing imports a plotting library.
+    """
+    samples = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'src.cli', '--help'], capture_output=True, check=True)
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+
+    times, modules = import_times(['-m', 'src.cli', '--help'])
+    heavy = sorted({name.split('.')[0] for name in modules} & set(HEAVY_MODULES))
+    print(f"Startup (python -m src.cli --help): median {median * 1000:.0f} ms over {args.runs} runs, "
+          f"budget {args.budget * 1000:.0f} ms")
+    print("Slowest imports:")
+    for name, micros in sorted(times.items(), key=lambda item: -item[1])[:5]:
+        print(f"   {name:<24}{micros / 1000:>8.1f} ms")
+
+    failed = False
+    if heavy:
+        print(f"[FAIL] Heavy modules imported at startup: {heavy}")
+        failed = True
+    if median > args.budget:
+        print("[FAIL] Startup is over budget.")
+        failed = True
+
+    commands = [name[len('cmd_'):] for name in globals() if name.startswith('cmd_') and name != 'cmd_startup']
+    for name in commands:
+        if name in PLOTTING_COMMANDS:
+            continue
+        plotting = sorted(command_imports(name) & set(PLOTTING_MODULES))
+        if plotting:
+            print(f"[FAIL] `{name}` imports plotting modules: {plotting}")
+            failed = True
+    if not failed:
+        print("[OK] Startup within budget, no heavy imports; only plotting commands import plotting modules.")
+    return 1 if failed else 0
+
+
+# --- Parser ---
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src.cli',
+                                     description="AlphaCare insurance analytics: load, validate, explore, test, "
+                                                 "train, score and report.")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    def add(name, func, help_text, aliases=(), data=True, workers=True):
+        sub = commands.add_parser(name, help=help_text, description=help_text, aliases=list(aliases))
+        if data:
+            sub.add_argument('--data', default=DATA_PATH, help=f"claims CSV (default: {DATA_PATH})")
+        if workers:
+            sub.add_argument('--workers', type=int, default=-1, help="processes / CPUs to use (-1 = all cores)")
+        sub.set_defaults(func=func)
+        return sub
+
+    sub = add('load', cmd_load, "Parse the CSV and build the columnar cache.", aliases=['cache'])
+    sub.add_argument('--rebuild', action='store_true', help="drop the current cache first")
+
+    sub = add('validate', cmd_validate, "Data-quality checks over every row, with a bad-row report.")
+    sub.add_argument('--output-dir', default='results/data_quality')
+    sub.add_argument('--strict', action='store_true', help="exit with 1 when any row is rejected")
+
+    sub = add('eda', cmd_eda, "Render the EDA figures headless.")
+    sub.add_argument('--output-dir', default='results/figures')
+
+    sub = add('test', cmd_test, "Hypothesis tests over every row (Task 3).")
+    sub.add_argument('--permutations', type=int, default=0,
+                     help="also run permutation tests with this many permutations (e.g. 10000)")
+    sub.add_argument('--seed', type=int, default=42)
+
+    sub = add('train', cmd_train, "Train and compare the claim severity models (Task 4).")
+    sub.add_argument('--search-budget', type=float, default=None,
+                     help="seconds for a successive-halving search over the tree models' settings")
+    sub.add_argument('--out-of-core', action='store_true',
+                     help="stream the data into frequency and severity models instead")
+    sub.add_argument('--chunk-mb', type=int, default=CHUNK_MB, help="CSV megabytes per chunk (--out-of-core)")
+    sub.add_argument('--epochs', type=int, default=1, help="SGD passes over the data (--out-of-core)")
+    sub.add_argument('--rounds', type=int, default=200, help="XGBoost boosting rounds (--out-of-core)")
+
+    sub = add('score', cmd_score, "Batch-score a policy CSV with the saved model.", data=False, workers=False)
+    sub.add_argument('input', help="policy CSV (same layout as data/insurance_claims.csv)")
+    sub.add_argument('--output', default='results/predictions.csv')
+    sub.add_argument('--model', default='models/best_model.joblib')
+    sub.add_argument('--chunk-mb', type=int, default=CHUNK_MB, help="CSV megabytes parsed and scored per batch")
+
+    sub = add('evidence', cmd_evidence, "Loss ratio, temporal trend and zip margin plots over every row.")
+    sub.add_argument('--approximate', action='store_true',
+                     help="margin boxes from quantile sketches (one pass, flat memory)")
+
+    sub = add('reprice', cmd_reprice, "Expected-loss premiums under many loading / cap scenarios, "
+                                      "with loss ratio and margin by Province and PostalCode.")
+    sub.add_argument('--loadings', type=float, nargs='+', default=[0.0, 0.1, 0.2, 0.3])
+    sub.add_argument('--caps', nargs='+', default=['none', '0.25', '0.1'],
+                     help="largest relative premium change per policy, or 'none'")
+    sub.add_argument('--severity-model', default='models/best_model.joblib')
+    sub.add_argument('--frequency-model', default='models/frequency_model.joblib',
+                     help="claim probability model (falls back to the book claim rate when missing)")
+    sub.add_argument('--claim-rate', type=float, default=None, help="flat claim probability to use instead")
+    sub.add_argument('--chunk-mb', type=int, default=CHUNK_MB, help="CSV megabytes parsed and scored per batch")
+    sub.add_argument('--output-dir', default='results/repricing')
+
+    sub = add('startup', cmd_startup, "Check the CLI's own startup time and imports.", data=False, workers=False)
+    sub.add_argument('--runs', type=int, default=5)
+    sub.add_argument('--budget', type=float, default=STARTUP_BUDGET_SECONDS, help="seconds")
+    return parser
+
+
+def main(argv: list = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
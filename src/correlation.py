@@ -0,0 +1,184 @@
+import argparse
+import os
+from functools import partial
+import numpy as np
+import pandas as pd
+from src.aggregation import map_chunks
+from src.loader import CHUNK_ROWS
+from src.schema import NUMERIC_COLUMNS
+from src.sketches import QuantileSketch
+from src.utils import get_logger
+
+logger = get_logger('Correlation')
+
+# Row / policy identifiers are numbers, not measurements
+IDENTIFIER_COLUMNS = ['UnderwrittenCoverID', 'PolicyID']
+MATRIX_COLUMNS = [col for col in NUMERIC_COLUMNS if col not in IDENTIFIER_COLUMNS]
+
+
+class CovarianceAccumulator:
+    """
+    Pairwise-complete covariance and Pearson correlation in O(columns²) memory.
+
+    For every column pair (i, j) it keeps, over the rows where both are present,
+    the count, the mean of i, the sum of squared deviations of i and the
+    co-moment of i and j. Each chunk's statistics come from a few matrix
+    products; chunks (or workers) are combined with Chan et al.'s pairwise
+    update, so the result matches DataFrame.cov() / .corr() on all the rows
+    without holding them.
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = np.zeros((k, k))
+        self.mean = np.zeros((k, k))      # mean[i, j]: mean of column i where i and j are both present
+        self.m2 = np.zeros((k, k))        # m2[i, j]: squared deviations of column i on the same rows
+        self.comoment = np.zeros((k, k))
+
+    def update(self, df: pd.DataFrame) -> 'CovarianceAccumulator':
+        """Adds a chunk (columns missing from it count as all-missing)."""
+        if len(df) == 0:
+            return self
+        X = np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan) if col in df.columns
+                             else np.full(len(df), np.nan) for col in self.columns])
+        present = np.isfinite(X)
+        X = np.where(present, X, 0.0)
+        # Shift by the chunk means so the raw sums below do not lose precision
+        observed = present.sum(axis=0)
+        shift = X.sum(axis=0) / np.maximum(observed, 1)
+        X = np.where(present, X - shift, 0.0)
+        P = present.astype('float64')
+
+        n = P.T @ P
+        sums = X.T @ P                    # sums[i, j]: sum of column i where j is present too
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(n > 0, sums / n, 0.0)
+            m2 = (X * X).T @ P - np.where(n > 0, sums * sums / n, 0.0)
+            comoment = X.T @ X - np.where(n > 0, sums * sums.T / n, 0.0)
+
+        chunk = CovarianceAccumulator(self.columns)
+        chunk.n, chunk.m2, chunk.comoment = n, m2, comoment
+        chunk.mean = mean + shift[:, None]
+        return self.merge(chunk)
+
+    def merge(self, other: 'CovarianceAccumulator') -> 'CovarianceAccumulator':
+        """Folds in the statistics of other rows (same columns, same order)."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge accumulators over different columns.")
+        n = self.n + other.n
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(n > 0, self.n * other.n / n, 0.0)
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * np.where(n > 0, other.n / n, 0.0)
+        self.m2 = self.m2 + other.m2 + delta * delta * weight
+        self.comoment = self.comoment + other.comoment + delta * delta.T * weight
+        self.n = n
+        return self
+
+    def counts(self) -> pd.DataFrame:
+        """Rows with both values present, per pair."""
+        return pd.DataFrame(self.n.astype('int64'), index=self.columns, columns=self.columns)
+
+    def covariance(self, min_periods: int = 2) -> pd.DataFrame:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cov = np.where(self.n >= max(min_periods, 2), self.comoment / (self.n - 1), np.nan)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def correlation(self, min_periods: int = 2) -> pd.DataFrame:
+        """Pearson correlation; NaN for pairs with fewer than min_periods rows or no variance."""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.comoment / np.sqrt(self.m2 * self.m2.T)
+        corr = np.where((self.n >= max(min_periods, 2)) & np.isfinite(corr), np.clip(corr, -1, 1), np.nan)
+        diagonal = np.diag(self.m2) > 0
+        corr[np.diag_indices_from(corr)] = np.where(diagonal, 1.0, np.nan)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def fit_sketches(df: pd.DataFrame, columns: list, relative_accuracy: float = 0.01) -> dict:
+    """Per-column QuantileSketch (first pass of the rank correlation)."""
+    return {col: QuantileSketch(relative_accuracy).update(df[col].to_numpy(dtype='float64', na_value=np.nan))
+            for col in columns if col in df.columns}
+
+
+def rank_frame(df: pd.DataFrame, sketches: dict) -> pd.DataFrame:
+    """Each value replaced by its approximate mid-rank CDF, so Pearson on the result approximates Spearman."""
+    return pd.DataFrame({col: sketch.cdf(df[col].to_numpy(dtype='float64', na_value=np.nan))
+                         for col, sketch in sketches.items() if col in df.columns}, index=df.index)
+
+
+def _accumulate_chunk(df, columns, sketches=None):
+    """Worker: one chunk's co-moments (of the ranks when sketches are given)."""
+    return CovarianceAccumulator(columns).update(rank_frame(df, sketches) if sketches else df)
+
+
+def merge_sketches(left: dict, right: dict) -> dict:
+    for col, sketch in right.items():
+        if col in left:
+            left[col].merge(sketch)
+        else:
+            left[col] = sketch
+    return left
+
+
+def frame_correlation(df: pd.DataFrame, columns: list = None, method: str = 'pearson',
+                      chunk_rows: int = CHUNK_ROWS) -> CovarianceAccumulator:
+    """
+    Accumulator over an in-memory frame, CHUNK_ROWS rows at a time (the
+    temporary float64 copy never exceeds one block). method='spearman' runs a
+    sketch pass first and accumulates the approximate ranks.
+    """
+    columns = list(columns or [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])])
+    blocks = [df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)]
+    sketches = None
+    if method == 'spearman':
+        sketches = {}
+        for block in blocks:
+            merge_sketches(sketches, fit_sketches(block, columns))
+    elif method != 'pearson':
+        raise ValueError(f"Unknown method: {method!r} (expected 'pearson' or 'spearman')")
+
+    accumulator = CovarianceAccumulator(columns)
+    for block in blocks:
+        accumulator.merge(_accumulate_chunk(block, columns, sketches))
+    return accumulator
+
+
+def stream_correlation(filepath: str, columns: list = None, method: str = 'pearson', workers: int = -1,
+                       relative_accuracy: float = 0.01) -> CovarianceAccumulator:
+    """
+    Accumulator over every row of the file, chunk by chunk (in parallel on a
+    cold CSV, see aggregation.map_chunks). 'spearman' takes two passes: one for
+    the per-column sketches, one for the co-moments of the ranks.
+    """
+    columns = list(columns or MATRIX_COLUMNS)
+    sketches = None
+    if method == 'spearman':
+        sketches = {}
+        for part in map_chunks(filepath, partial(fit_sketches, columns=columns, relative_accuracy=relative_accuracy),
+                               columns, workers):
+            merge_sketches(sketches, part)
+    elif method != 'pearson':
+        raise ValueError(f"Unknown method: {method!r} (expected 'pearson' or 'spearman')")
+
+    accumulator = CovarianceAccumulator(columns)
+    for part in map_chunks(filepath, partial(_accumulate_chunk, columns=columns, sketches=sketches),
+                           columns, workers):
+        accumulator.merge(part)
+    return accumulator
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Full numeric correlation matrix over every row, in bounded memory.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--method', choices=['pearson', 'spearman'], default='pearson')
+    parser.add_argument('--columns', nargs='*', default=None, help=f"default: {MATRIX_COLUMNS}")
+    parser.add_argument('--workers', type=int, default=-1, help="processes to use (-1 = all cores)")
+    parser.add_argument('--output', default='results/correlation_matrix.csv')
+    args = parser.parse_args()
+
+    corr = stream_correlation(args.data, args.columns, args.method, args.workers).correlation()
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    corr.to_csv(args.output)
+    print(corr.to_string(float_format=lambda v: f"{v:.3f}"))
+    logger.info(f"{args.method.title()} correlation matrix saved to {args.output}")
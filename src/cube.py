@@ -0,0 +1,172 @@
+import argparse
+import glob
+import os
+import time
+import numpy as np
+import pandas as pd
+from src.aggregation import MEASURES, group_stats, map_chunks, merge_stats, month_keys
+from src.cache import CACHE_DIR, data_fingerprint
+from src.loader import CHUNK_BYTES
+from src.schema import SCHEMA_VERSION
+from src.utils import get_logger
+
+logger = get_logger('SegmentCube')
+
+DIMENSIONS = ['Province', 'PostalCode', 'VehicleType', 'Gender', 'month']
+CUBE_DIR = os.path.join(CACHE_DIR, 'cube')
+CUBE_COLUMNS = ['Province', 'PostalCode', 'VehicleType', 'Gender', 'TransactionMonth', 'TotalPremium', 'TotalClaims']
+
+
+def _cube_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Worker: measures per observed combination of every dimension in one chunk."""
+    dims = pd.DataFrame({'month': month_keys(df)}, index=df.index)
+    for dim in DIMENSIONS[:-1]:
+        # Missing values become their own 'nan' member, so cube totals equal the row totals
+        dims[dim] = df[dim].astype(str) if dim in df.columns else 'nan'
+    return group_stats(pd.concat([dims, df[['TotalPremium', 'TotalClaims']]], axis=1), DIMENSIONS)
+
+
+def summarize(stats: pd.DataFrame) -> pd.DataFrame:
+    """Adds the business ratios to summed measures."""
+    stats = stats.copy()
+    stats['loss_ratio'] = stats['claims'] / stats['premium'].replace(0, np.nan)
+    stats['claim_frequency'] = stats['claim_count'] / stats['n']
+    stats['margin_mean'] = stats['margin'] / stats['n']
+    variance = stats['margin_sq'] / stats['n'] - stats['margin_mean'] ** 2
+    stats['margin_std'] = np.sqrt(variance.clip(lower=0))
+    return stats
+
+
+class SegmentCube:
+    """
+    Additive measures (aggregation.MEASURES) for every observed combination of
+    Province, PostalCode, VehicleType, Gender and month.
+
+    Dimensions are dictionary-encoded: each is a pandas Categorical whose codes
+    index a sorted dictionary of values, stored as Arrow dictionary columns in
+    Parquet. Queries work on the integer codes of the (small) cell table, never
+    on policy rows, so they answer in milliseconds:
+
+        cube.slice('Province', 'Gauteng')                      # one member
+        cube.dice(Gender=['Male', 'Female'], month=['2015-01'])  # several members
+        cube.rollup(['Province', 'month'])                     # totals + loss ratio, margin
+    """
+
+    def __init__(self, cells: pd.DataFrame):
+        self.cells = cells.reset_index(drop=True)
+
+    # --- Build / persist ---
+
+    @classmethod
+    def build(cls, filepath: str, workers: int = -1, chunk_bytes: int = CHUNK_BYTES) -> 'SegmentCube':
+        """One streaming pass over the data (parallel on a cold CSV, see aggregation.map_chunks)."""
+        start = time.perf_counter()
+        stats = None
+        for part in map_chunks(filepath, _cube_chunk, CUBE_COLUMNS, workers, chunk_bytes):
+            stats = merge_stats(stats, part)
+
+        cells = stats.reset_index()
+        for dim in DIMENSIONS:
+            cells[dim] = pd.Categorical(cells[dim], categories=sorted(cells[dim].unique()))
+        cube = cls(cells)
+        logger.info(f"Cube built from {filepath}: {len(cells):,} cells, {int(cells['n'].sum()):,} rows "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return cube
+
+    @staticmethod
+    def cache_path(filepath: str, cache_dir: str = CUBE_DIR) -> str:
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        return os.path.join(cache_dir, f"{stem}-{data_fingerprint(filepath)[:12]}-v{SCHEMA_VERSION}.parquet")
+
+    @classmethod
+    def for_data(cls, filepath: str, workers: int = -1) -> 'SegmentCube':
+        """Loads the persisted cube for the current data hash, building it on a miss."""
+        path = cls.cache_path(filepath)
+        if os.path.exists(path):
+            return cls.load(path)
+        cube = cls.build(filepath, workers)
+        cube.save(path)
+        stem = os.path.splitext(os.path.basename(filepath))[0]
+        for stale in glob.glob(os.path.join(os.path.dirname(path), f"{stem}-*.parquet")):
+            if stale != path:
+                os.remove(stale)
+                logger.info(f"Removed stale cube: {stale}")
+        return cube
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        self.cells.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, path)
+        logger.info(f"Cube saved: {path}")
+
+    @classmethod
+    def load(cls, path: str) -> 'SegmentCube':
+        return cls(pd.read_parquet(path))
+
+    # --- Queries ---
+
+    def members(self, dim: str) -> list:
+        return list(self.cells[dim].cat.categories)
+
+    def dice(self, **filters) -> 'SegmentCube':
+        """Keeps the cells whose members are in the given values, e.g. dice(Province=['Gauteng'], month='2015-01')."""
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, values in filters.items():
+            if dim not in DIMENSIONS:
+                raise ValueError(f"Unknown dimension: {dim!r} (expected one of {DIMENSIONS})")
+            values = [values] if np.isscalar(values) else list(values)
+            wanted = self.cells[dim].cat.categories.get_indexer([str(value) for value in values])
+            mask &= np.isin(self.cells[dim].cat.codes.to_numpy(), wanted[wanted >= 0])
+        return SegmentCube(self.cells[mask])
+
+    def slice(self, dim: str, value) -> 'SegmentCube':
+        """Fixes one dimension to a single member."""
+        return self.dice(**{dim: value})
+
+    def rollup(self, by: list = None) -> pd.DataFrame:
+        """
+        Sums the measures to the `by` dimensions (none = grand total) and adds
+        loss ratio, claim frequency and margin mean / std.
+        """
+        by = [by] if isinstance(by, str) else list(by or [])
+        if not by:
+            return summarize(self.cells[MEASURES].sum().to_frame('total').T)
+
+        codes = [self.cells[dim].cat.codes.to_numpy('int64') for dim in by]
+        shape = [len(self.cells[dim].cat.categories) for dim in by]
+        keys, inverse = np.unique(np.ravel_multi_index(codes, shape), return_inverse=True)
+        totals = {measure: np.bincount(inverse, weights=self.cells[measure].to_numpy('float64'),
+                                       minlength=len(keys)) for measure in MEASURES}
+        index_codes = np.unravel_index(keys, shape)
+        index = pd.MultiIndex.from_arrays(
+            [self.cells[dim].cat.categories[c] for dim, c in zip(by, index_codes)], names=by)
+        result = pd.DataFrame(totals, index=index if len(by) > 1 else index.get_level_values(0))
+        result[['n', 'claim_count']] = result[['n', 'claim_count']].astype('int64')
+        return summarize(result)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Loss ratio and margin by segment from the persisted cube.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--by', nargs='*', default=['Province'], help=f"dimensions to roll up to ({DIMENSIONS})")
+    parser.add_argument('--where', action='append', default=[],
+                        help="dimension=value[,value...] filter, repeatable (e.g. Gender=Female)")
+    parser.add_argument('--rebuild', action='store_true', help="rebuild the cube from the data")
+    args = parser.parse_args()
+
+    cube_path = SegmentCube.cache_path(args.data)
+    if args.rebuild and os.path.exists(cube_path):
+        os.remove(cube_path)
+    cube = SegmentCube.for_data(args.data)
+
+    filters = {}
+    for condition in args.where:
+        dim, _, values = condition.partition('=')
+        filters[dim] = values.split(',')
+
+    start = time.perf_counter()
+    result = cube.dice(**filters).rollup(args.by)
+    elapsed = time.perf_counter() - start
+    print(result.sort_values('loss_ratio', ascending=False).to_string(float_format=lambda v: f"{v:,.4f}"))
+    logger.info(f"Query answered in {elapsed * 1000:.1f} ms over {len(cube.cells):,} cells")
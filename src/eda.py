@@ -1,31 +1,135 @@
+import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from src.utils import get_logger
+from concurrent.futures import ProcessPoolExecutor
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.colors import LogNorm
+from matplotlib.figure import Figure
+from src.correlation import IDENTIFIER_COLUMNS, frame_correlation
+from src.utils import get_logger, instrument
 
 logger = get_logger('EDA')
 
+FIGURE_DIR = 'results/figures'
+
+# Cell values are written into the heatmap up to this many columns
+ANNOTATE_MAX_COLUMNS = 16
+
+
+def histogram_data(values, bins: int = 50) -> tuple:
+    """(counts, edges) over the finite values, so a histogram can be drawn from bins instead of rows."""
+    values = np.asarray(values, dtype='float64')
+    return np.histogram(values[np.isfinite(values)], bins=bins)
+
+
+def density_data(x, y, bins: int = 100) -> tuple:
+    """(counts, x edges, y edges) of a 2D histogram over every row with both values present."""
+    x, y = np.asarray(x, dtype='float64'), np.asarray(y, dtype='float64')
+    keep = np.isfinite(x) & np.isfinite(y)
+    return np.histogram2d(x[keep], y[keep], bins=bins)
+
+
+# Draw functions only see pre-binned data, so their cost does not depend on the row count
+
+def draw_distributions(fig, hists: dict):
+    """Univariate: Histograms (log-scaled counts) from histogram_data results."""
+    axes = fig.subplots(1, 2)
+    styles = [('TotalPremium', 'teal', 'Total Premium Distribution (Log Scale)'),
+              ('TotalClaims', 'coral', 'Total Claims Distribution (Log Scale)')]
+    for ax, (col, color, title) in zip(axes, styles):
+        if col not in hists:
+            continue
+        counts, edges = hists[col]
+        ax.stairs(counts, edges, fill=True, color=color, alpha=0.7)
+        # Log scale handles the massive difference between 0 and high claims
+        ax.set_yscale('log')
+        ax.set_xlabel(col)
+        ax.set_ylabel('Count')
+        ax.set_title(title)
+    fig.tight_layout()
+
+
+def draw_correlations(fig, corr: pd.DataFrame):
+    """Multivariate: Correlation Matrix heatmap."""
+    ax = fig.subplots()
+    sns.heatmap(corr, annot=len(corr) <= ANNOTATE_MAX_COLUMNS, cmap='coolwarm', fmt=".2f", linewidths=0.5,
+                vmin=-1, vmax=1, ax=ax)
+    ax.set_title('Multivariate Analysis: Numeric Correlation Matrix')
+    fig.tight_layout()
+
+
+def draw_premium_vs_claims(fig, density: tuple):
+    """Multivariate: Premium vs Claims as a binned density of all rows."""
+    counts, x_edges, y_edges = density
+    ax = fig.subplots()
+    mesh = ax.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), norm=LogNorm(), cmap='viridis')
+    fig.colorbar(mesh, ax=ax, label='Policies per bin')
+    ax.set_xlabel('TotalPremium')
+    ax.set_ylabel('TotalClaims')
+    ax.set_title(f'Total Premium vs. Total Claims (all {int(counts.sum()):,} rows, binned)')
+
+
+def render_figure(draw, data, path: str, figsize: tuple) -> str:
+    """Draws onto an Agg canvas (no GUI, no pyplot state) and saves to path."""
+    sns.set_theme(style="whitegrid")
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    draw(fig, data)
+    fig.savefig(path)
+    return path
+
+
 class EDAStrategy:
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, output_dir: str = FIGURE_DIR):
         self.df = df
+        self.output_dir = output_dir
         sns.set_theme(style="whitegrid")
 
+    # --- Plot data: one vectorized pass over the rows per figure ---
+
+    def distribution_data(self) -> dict:
+        return {col: histogram_data(self.df[col]) for col in ['TotalPremium', 'TotalClaims'] if col in self.df.columns}
+
+    def correlation_data(self, method: str = 'pearson'):
+        """
+        Every numeric column (identifiers aside), pairwise-complete, accumulated in
+        row blocks (see src.correlation). method='spearman' gives the sketch-based
+        rank approximation. Columns without any pair of values are dropped.
+        """
+        # Schema-typed frames hold float32 / int32 columns too
+        valid_cols = [col for col in self.df.select_dtypes(include='number').columns
+                      if col not in IDENTIFIER_COLUMNS]
+        if len(valid_cols) < 2:
+            return None
+        corr = frame_correlation(self.df, valid_cols, method).correlation()
+        corr = corr.dropna(how='all').dropna(axis=1, how='all')
+        return corr if len(corr) >= 2 else None
+
+    def scatter_data(self):
+        if 'TotalPremium' not in self.df.columns or 'TotalClaims' not in self.df.columns:
+            return None
+        return density_data(self.df['TotalPremium'], self.df['TotalClaims'])
+
+    def figure_tasks(self) -> list:
+        """(draw function, plot data, file name, figsize) for every figure that has data."""
+        tasks = [(draw_distributions, self.distribution_data(), 'distributions.png', (14, 6)),
+                 (draw_correlations, self.correlation_data(), 'correlation_matrix.png', (12, 10)),
+                 (draw_premium_vs_claims, self.scatter_data(), 'premium_vs_claims_density.png', (10, 6))]
+        return [task for task in tasks if task[1] is not None and len(task[1])]
+
+    # --- Interactive (notebook) plots ---
+
+    def _show(self, draw, data, figsize):
+        fig = plt.figure(figsize=figsize)
+        draw(fig, data)
+        plt.show()
+
     def plot_distributions(self):
         """Univariate: Histograms."""
         logger.info("Generating distribution plots...")
-        fig, axes = plt.subplots(1, 2, figsize=(14, 6))
-        
-        # Log scale handles the massive difference between 0 and high claims
-        if 'TotalPremium' in self.df.columns:
-            sns.histplot(self.df['TotalPremium'], bins=50, ax=axes[0], color='teal', log_scale=(False, True))
-            axes[0].set_title('Total Premium Distribution (Log Scale)')
-        
-        if 'TotalClaims' in self.df.columns:
-            sns.histplot(self.df['TotalClaims'], bins=50, ax=axes[1], color='coral', log_scale=(False, True))
-            axes[1].set_title('Total Claims Distribution (Log Scale)')
-        
-        plt.tight_layout()
-        plt.show()
+        self._show(draw_distributions, self.distribution_data(), (14, 6))
 
     def plot_correlations(self):
         """
@@ -33,43 +137,47 @@ class EDAStrategy:
         Identifies relationships between numerical financial variables.
         """
         logger.info("Generating correlation matrix...")
-        # Select only numeric columns
-        numeric_df = self.df.select_dtypes(include=['float64', 'int64'])
-        
-        # Focus on key financial fields to avoid noise
-        key_cols = ['TotalPremium', 'TotalClaims', 'CalculatedPremiumPerTerm', 'SumInsured']
-        
-        # Check which columns actually exist in the data
-        valid_cols = [col for col in key_cols if col in numeric_df.columns]
-        
-        if len(valid_cols) > 1:
-            subset_df = numeric_df[valid_cols]
-            plt.figure(figsize=(10, 8))
-            corr = subset_df.corr()
-            sns.heatmap(corr, annot=True, cmap='coolwarm', fmt=".2f", linewidths=0.5)
-            plt.title('Multivariate Analysis: Financial Correlation Matrix')
-            plt.show()
+        corr = self.correlation_data()
+        if corr is not None:
+            self._show(draw_correlations, corr, (12, 10))
         else:
             logger.warning("Not enough numeric columns found for correlation matrix.")
 
     def plot_scatter_premium_vs_claims(self):
         """
-        Multivariate: Scatter Plot.
+        Multivariate: Premium vs Claims density.
         Tests the hypothesis: Do higher premiums actually correlate with higher claims?
+        Every row is binned, so the picture no longer depends on a 5k-row sample.
+        """
+        logger.info("Generating Premium vs Claims density plot...")
+        density = self.scatter_data()
+        if density is not None:
+            self._show(draw_premium_vs_claims, density, (10, 6))
+        else:
+            logger.warning("TotalPremium or TotalClaims columns missing, skipping scatter plot.")
+
+    # --- Batch (headless) rendering ---
+
+    @instrument('eda', rows=lambda paths, self, *args, **kwargs: len(self.df))
+    def render_all(self, workers: int = -1) -> list:
         """
-        logger.info("Generating Premium vs Claims scatter plot...")
-        
-        if 'TotalPremium' in self.df.columns and 'TotalClaims' in self.df.columns:
-            plt.figure(figsize=(10, 6))
-            
-            # Sampling 5000 points to keep the plot readable and fast
-            sample_df = self.df.sample(n=min(5000, len(self.df)), random_state=42)
-            
-            # Check if Province exists for coloring, otherwise ignore hue
-            hue_col = 'Province' if 'Province' in self.df.columns else None
-            
-            sns.scatterplot(data=sample_df, x='TotalPremium', y='TotalClaims', hue=hue_col, alpha=0.6)
-            plt.title('Total Premium vs. Total Claims (Sampled 5k points)')
-            plt.show()
+        Renders every EDA figure to output_dir without a display.
+        The rows are binned here, once; only the small binned arrays are sent
+        to a process pool where each figure is drawn on its own Agg canvas.
+        Returns the saved paths.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        tasks = self.figure_tasks()
+        workers = os.cpu_count() if workers == -1 else max(1, workers)
+        workers = min(workers, len(tasks))
+        logger.info(f"Rendering {len(tasks)} EDA figures on {workers} workers...")
+
+        args = [(draw, data, os.path.join(self.output_dir, name), figsize) for draw, data, name, figsize in tasks]
+        if workers <= 1:
+            paths = [render_figure(*task) for task in args]
         else:
-            logger.warning("TotalPremium or TotalClaims columns missing, skipping scatter plot.")
\ No newline at end of file
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                paths = list(pool.map(render_figure, *zip(*args)))
+        for path in paths:
+            logger.info(f"Saved: {path}")
+        return paths
@@ -0,0 +1,21 @@
+"""
+Model inputs shared by training, scoring and repricing. Kept free of heavy
+imports so scoring a file does not load the training stack (shap, plotting).
+"""
+
+MODEL_COLUMNS = ['TotalClaims', 'CalculatedPremiumPerTerm', 'SumInsured',
+                 'Province', 'VehicleType', 'Bodytype', 'Gender', 'TermFrequency']
+
+# --- CORRECTION: Explicit Feature Lists ---
+# We explicitly define lists here to prevent any "Monthly" strings entering numeric processors
+NUMERIC_FEATURES = ['CalculatedPremiumPerTerm', 'SumInsured']
+CATEGORICAL_FEATURES = ['Province', 'VehicleType', 'Bodytype', 'Gender', 'TermFrequency']
+
+MODEL_PATH = 'models/best_model.joblib'
+
+
+def cast_categoricals(df, categorical):
+    """Force Categorical columns to String type to avoid type errors (missing -> 'nan')."""
+    for col in categorical:
+        df[col] = df[col].astype(str)
+    return df
@@ -1,31 +1,152 @@
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib import cbook
 import seaborn as sns
 import os
+from functools import partial
+from src.aggregation import group_stats, map_chunks, measure_frame, merge_stats
+from src.loader import DataLoader
+from src.sketches import QuantileSketch
 
 # Ensure directories exist
 os.makedirs('results/figures', exist_ok=True)
 
+EVIDENCE_COLUMNS = ['Province', 'PostalCode', 'TransactionMonth', 'TotalPremium', 'TotalClaims']
+
 def load_data():
-    # Use the robust loading logic we fixed earlier
-    try:
-        df = pd.read_csv('data/insurance_claims.csv', sep='|', low_memory=False, on_bad_lines='skip')
-    except:
-        df = pd.read_csv('data/insurance_claims.csv', sep=',', low_memory=False, on_bad_lines='skip')
+    # The DataLoader sniffs the delimiter once and parses a cold load on all cores
+    df = DataLoader('data/insurance_claims.csv', workers=-1).load_data(columns=EVIDENCE_COLUMNS)
     
-    # Numeric conversion
+    # Financial columns are typed by the loader schema; only the gaps need filling
     cols = ['TotalPremium', 'TotalClaims']
     for c in cols:
-        df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0)
+        df[c] = df[c].fillna(0)
     return df
 
-def generate_plots(df):
+class EvidenceAggregator:
+    """
+    Partial aggregates behind the evidence plots, built one chunk at a time.
+    Province, month and zip totals are additive and each zip's margin
+    distribution is a mergeable quantile sketch, so partials from any number of
+    chunks or workers merge into the full-data result in bounded memory.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.province = None
+        self.monthly = None
+        self.zips = None
+        self.zip_sketches = {}
+
+    def update(self, df: pd.DataFrame):
+        """Folds one chunk in (without modifying it)."""
+        measures = measure_frame(df)
+        self.province = merge_stats(self.province, group_stats(df, ['Province'], measures))
+        if 'TransactionMonth' in df.columns:
+            months = df['TransactionMonth']
+            # Parsed once by the loader schema; frames built elsewhere may still carry strings
+            if not pd.api.types.is_datetime64_any_dtype(months):
+                months = pd.to_datetime(months, errors='coerce')
+            self.monthly = merge_stats(self.monthly, group_stats(pd.DataFrame({'TransactionMonth': months}),
+                                                                 ['TransactionMonth'], measures))
+        self.zips = merge_stats(self.zips, group_stats(df, ['PostalCode'], measures))
+
+        for zip_code, margins in measures['margin'].groupby(df['PostalCode'], observed=True):
+            sketch = self.zip_sketches.setdefault(zip_code, QuantileSketch(self.relative_accuracy))
+            sketch.update(margins.to_numpy())
+        return self
+
+    def merge(self, other: 'EvidenceAggregator'):
+        """Folds in the partial aggregates of another chunk or worker."""
+        self.province = merge_stats(self.province, other.province)
+        self.monthly = merge_stats(self.monthly, other.monthly)
+        self.zips = merge_stats(self.zips, other.zips)
+        for zip_code, sketch in other.zip_sketches.items():
+            if zip_code in self.zip_sketches:
+                self.zip_sketches[zip_code].merge(sketch)
+            else:
+                self.zip_sketches[zip_code] = sketch
+        return self
+
+    def top_zips(self, n: int = 10) -> list:
+        return list(self.zips['n'].nlargest(n).index)
+
+    def margin_box_stats(self, zips: list, margins: dict = None) -> list:
+        """
+        Box statistics per zip for Axes.bxp.
+        Exact when the zip's raw margins are given, otherwise read from the sketches
+        (quartiles within relative_accuracy; whiskers clipped to the observed range).
+        """
+        box_stats = []
+        for zip_code in zips:
+            if margins is not None:
+                box = cbook.boxplot_stats(margins[zip_code], whis=1.5)[0]
+            else:
+                sketch = self.zip_sketches[zip_code]
+                q1, med, q3 = (sketch.quantile(q) for q in (0.25, 0.5, 0.75))
+                iqr = q3 - q1
+                box = {'q1': q1, 'med': med, 'q3': q3,
+                       'whislo': max(sketch.min, q1 - 1.5 * iqr),
+                       'whishi': min(sketch.max, q3 + 1.5 * iqr),
+                       'fliers': []}
+            box['label'] = str(zip_code)
+            box_stats.append(box)
+        return box_stats
+
+
+def _aggregate_chunk(df, relative_accuracy=0.01):
+    return EvidenceAggregator(relative_accuracy).update(df)
+
+
+def collect_margins(df: pd.DataFrame, zips: list) -> dict:
+    """Raw margins of the given zips only, for exact quantiles: {zip: array}."""
+    in_zips = df['PostalCode'].isin(zips)
+    zip_df = df[in_zips]
+    margins = zip_df['TotalPremium'].fillna(0) - zip_df['TotalClaims'].fillna(0)
+    return {zip_code: values.to_numpy() for zip_code, values in margins.groupby(zip_df['PostalCode'], observed=True)}
+
+
+def stream_evidence(filepath: str = 'data/insurance_claims.csv', workers: int = -1,
+                    exact: bool = True, relative_accuracy: float = 0.01):
+    """
+    Builds every evidence aggregate in one streaming pass over the data.
+    exact=True adds a second pass that keeps only the top zips' margins, so the
+    boxplot uses exact quantiles; exact=False uses the sketches and keeps peak
+    memory flat however large the file grows.
+    Returns (aggregator, margins or None).
+    """
+    aggregator = EvidenceAggregator(relative_accuracy)
+    for part in map_chunks(filepath, partial(_aggregate_chunk, relative_accuracy=relative_accuracy),
+                           EVIDENCE_COLUMNS, workers):
+        aggregator.merge(part)
+
+    margins = None
+    if exact:
+        top_zips = aggregator.top_zips(10)
+        pieces = {}
+        for part in map_chunks(filepath, partial(collect_margins, zips=top_zips),
+                               ['PostalCode', 'TotalPremium', 'TotalClaims'], workers):
+            for zip_code, values in part.items():
+                pieces.setdefault(zip_code, []).append(values)
+        margins = {zip_code: np.concatenate(values) for zip_code, values in pieces.items()}
+
+    return aggregator, margins
+
+
+def generate_plots(df, exact=True):
+    """Evidence plots for an in-memory frame (one chunk; df is left unmodified)."""
+    aggregator = EvidenceAggregator().update(df)
+    margins = collect_margins(df, aggregator.top_zips(10)) if exact else None
+    plot_evidence(aggregator, margins)
+
+def plot_evidence(aggregator: EvidenceAggregator, margins: dict = None):
     print("Generating evidence plots...")
     
     # 1. LOSS RATIO BY PROVINCE
     # Loss Ratio = TotalClaims / TotalPremium
-    province_stats = df.groupby('Province')[['TotalPremium', 'TotalClaims']].sum().reset_index()
-    province_stats['LossRatio'] = province_stats['TotalClaims'] / province_stats['TotalPremium']
+    province_stats = aggregator.province.reset_index()
+    province_stats['LossRatio'] = province_stats['claims'] / province_stats['premium']
     
     plt.figure(figsize=(10, 6))
     sns.barplot(data=province_stats.sort_values('LossRatio', ascending=False), x='LossRatio', y='Province', palette='viridis')
@@ -37,14 +158,12 @@ def generate_plots(df):
     print("Saved: results/figures/loss_ratio_province.png")
 
     # 2. TEMPORAL TRENDS
-    # Ensure TransactionMonth is datetime
-    if 'TransactionMonth' in df.columns:
-        df['TransactionMonth'] = pd.to_datetime(df['TransactionMonth'], errors='coerce')
-        monthly_stats = df.groupby('TransactionMonth')[['TotalPremium', 'TotalClaims']].sum().reset_index()
+    if aggregator.monthly is not None:
+        monthly_stats = aggregator.monthly.reset_index()
         
         plt.figure(figsize=(12, 6))
-        plt.plot(monthly_stats['TransactionMonth'], monthly_stats['TotalPremium'], label='Total Premium', marker='o')
-        plt.plot(monthly_stats['TransactionMonth'], monthly_stats['TotalClaims'], label='Total Claims', marker='x', color='red')
+        plt.plot(monthly_stats['TransactionMonth'], monthly_stats['premium'], label='Total Premium', marker='o')
+        plt.plot(monthly_stats['TransactionMonth'], monthly_stats['claims'], label='Total Claims', marker='x', color='red')
         plt.title('Temporal Trends: Premiums vs Claims (2014-2015)')
         plt.ylabel('Amount (Rand)')
         plt.legend()
@@ -54,18 +173,18 @@ def generate_plots(df):
         print("Saved: results/figures/temporal_trends.png")
 
     # 3. MARGIN BY ZIPCODE (Boxplot for top zips)
-    df['Margin'] = df['TotalPremium'] - df['TotalClaims']
-    top_zips = df['PostalCode'].value_counts().nlargest(10).index
-    zip_data = df[df['PostalCode'].isin(top_zips)]
+    top_zips = sorted(aggregator.top_zips(10), key=str)
     
-    plt.figure(figsize=(12, 6))
-    sns.boxplot(data=zip_data, x='PostalCode', y='Margin', showfliers=False) # Hide extreme outliers for readability
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.bxp(aggregator.margin_box_stats(top_zips, margins), showfliers=False, patch_artist=True) # Hide extreme outliers for readability
     plt.title('Profit Margin Distribution by Top 10 ZipCodes')
+    plt.xlabel('PostalCode')
+    plt.ylabel('Margin')
     plt.xticks(rotation=45)
     plt.tight_layout()
     plt.savefig('results/figures/margin_zipcode.png')
     print("Saved: results/figures/margin_zipcode.png")
 
 if __name__ == "__main__":
-    df = load_data()
-    generate_plots(df)
\ No newline at end of file
+    aggregator, margins = stream_evidence()
+    plot_evidence(aggregator, margins)
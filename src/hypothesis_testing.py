@@ -1,12 +1,20 @@
 import pandas as pd
+import numpy as np
 import scipy.stats as stats
 import os
 import sys
+from src.aggregation import group_stats, map_chunks, measure_frame, merge_stats
+from src.loader import DataLoader
+from src.resampling import fdr_bh, holm, permutation_test
+from src.utils import instrument
+
+HYPOTHESIS_COLUMNS = ['TotalPremium', 'TotalClaims', 'Province', 'PostalCode', 'Gender']
 
 def load_data(filepath):
     """
-    Loads data by forcing the delimiter to '|' (pipe), which is standard 
-    for this dataset, or falling back to ',' (comma).
+    Loads data through the DataLoader, which sniffs the delimiter ('|' for this
+    dataset, ',' for exports) from the header once instead of re-parsing the
+    file after a wrong guess. A cold load is parsed on all cores.
     """
     if not os.path.exists(filepath):
         print(f"Error: File not found at {filepath}")
@@ -14,38 +22,89 @@ def load_data(filepath):
 
     print(f"Attempting to load {filepath}...")
 
-    # Method 1: Try Pipe '|' Separator (Most likely correct)
     try:
-        print("   [System] Trying pipe '|' delimiter...")
-        # Reading 500k rows to be safe on memory
-        df = pd.read_csv(filepath, sep='|', nrows=500000, on_bad_lines='skip', low_memory=False)
-        
-        # Check if it actually worked by looking for the target column
-        # We strip whitespace from columns just in case
-        df.columns = df.columns.str.strip()
-        
-        if 'TotalClaims' in df.columns:
-            print(f"   [Success] Loaded with pipe '|'. Shape: {df.shape}")
-            return df
-        else:
-            print("   [Warning] Pipe delimiter loaded data, but 'TotalClaims' column is missing.")
-            print(f"   Columns found: {list(df.columns[:5])}...")
-            # If pipe failed to find the right columns, we might try comma
-            raise ValueError("Columns missing with pipe delimiter")
-
-    except Exception as e:
-        print(f"   [System] Pipe failed ({e}). Trying comma ',' delimiter...")
-
-    # Method 2: Fallback to Comma ',' Separator
-    try:
-        df = pd.read_csv(filepath, sep=',', nrows=500000, on_bad_lines='skip', low_memory=False)
-        df.columns = df.columns.str.strip()
-        print(f"   [Success] Loaded with comma ','. Shape: {df.shape}")
-        return df
+        # Columnar cache reads only the tested fields
+        df = DataLoader(filepath, workers=-1).load_data(columns=HYPOTHESIS_COLUMNS)
     except Exception as e:
         print(f"   [Critical Error] Could not load data. {e}")
         sys.exit(1)
 
+    # Check if it actually worked by looking for the target column
+    if 'TotalClaims' in df.columns:
+        print(f"   [Success] Loaded. Shape: {df.shape}")
+    else:
+        print("   [Warning] Data loaded, but 'TotalClaims' column is missing.")
+        print(f"   Columns found: {list(df.columns[:5])}...")
+    return df
+
+TEST_DIMENSIONS = ['Province', 'PostalCode', 'Gender']
+GENDER_LEVELS = ['male', 'female', 'm', 'f']
+
+
+def collect_test_stats(df):
+    """
+    Sufficient statistics for every test in one vectorized pass:
+    per Province / PostalCode / Gender group the row count, claim count and
+    margin sum and sum of squares. Results from separate chunks add up with
+    merge_test_stats, so the whole dataset can be tested in bounded memory.
+    """
+    measures = measure_frame(df)
+    return {dim: group_stats(df, [dim], measures) for dim in TEST_DIMENSIONS if dim in df.columns}
+
+
+def merge_test_stats(left, right):
+    for dim, group in right.items():
+        left[dim] = merge_stats(left.get(dim), group)
+    return left
+
+
+@instrument('hypothesis_stats')
+def stream_test_stats(filepath, workers=-1):
+    """Collects the test statistics chunk by chunk over every row of the file."""
+    test_stats = {}
+    for part in map_chunks(filepath, collect_test_stats, HYPOTHESIS_COLUMNS, workers):
+        merge_test_stats(test_stats, part)
+    return test_stats
+
+
+def chi2_from_stats(group):
+    """Chi-square test of claim frequency across groups, from counts only."""
+    contingency = np.column_stack([group['n'] - group['claim_count'], group['claim_count']])
+    # A slice without claims (or without claim-free rows) gives a k x 1 table, as the
+    # crosstab did: no degrees of freedom, chi2 = 0 and p = 1
+    contingency = contingency[:, contingency.sum(axis=0) > 0]
+    chi2, p, dof, ex = stats.chi2_contingency(contingency)
+    return chi2, p
+
+
+def anova_from_stats(group):
+    """
+    One-way ANOVA of margin across groups, from per-group n, sum and sum of squares.
+    Returns (nan, nan) when there is no within-group variance (or no residual
+    degrees of freedom), where the F statistic is undefined.
+    """
+    n = group['n'].to_numpy(dtype='float64')
+    sums = group['margin'].to_numpy(dtype='float64')
+    k, total = len(n), n.sum()
+
+    between = np.sum(sums ** 2 / n) - sums.sum() ** 2 / total
+    within = group['margin_sq'].sum() - np.sum(sums ** 2 / n)
+    # The difference of sums can leave rounding noise where the true value is 0
+    if total <= k or within <= 1e-12 * max(group['margin_sq'].sum(), 1.0):
+        return np.nan, np.nan
+    f_stat = (between / (k - 1)) / (within / (total - k))
+    p = stats.f.sf(f_stat, k - 1, total - k)
+    return f_stat, p
+
+
+def clean_gender_stats(group):
+    """Folds raw Gender spellings ('Male', ' male', ...) into the standard levels."""
+    cleaned = group.index.astype(str).str.lower().str.strip()
+    group = group.groupby(cleaned).sum()
+    return group[group.index.isin(GENDER_LEVELS)]
+
+
+@instrument('hypothesis', rows=lambda result, df, *args, **kwargs: len(df))
 def perform_hypothesis_testing(df):
     print("\n==================================================")
     print("           TASK 3: HYPOTHESIS TESTING             ")
@@ -56,66 +115,56 @@ def perform_hypothesis_testing(df):
     print(f"Columns in dataset: {list(df.columns)}")
 
     # --- DATA PREPARATION ---
-    # Convert financial columns to numeric (coerce errors to NaN, then fill 0)
-    cols_to_numeric = ['TotalPremium', 'TotalClaims']
-    for col in cols_to_numeric:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        else:
+    for col in ['TotalPremium', 'TotalClaims']:
+        if col not in df.columns:
             print(f"Error: Required column '{col}' is missing!")
             return
 
-    # Create Features
-    df['Claim_Flag'] = df['TotalClaims'].apply(lambda x: 1 if x > 0 else 0)
-    df['Margin'] = df['TotalPremium'] - df['TotalClaims']
+    run_tests(collect_test_stats(df))
 
+def run_tests(test_stats):
+    """Runs all four tests from the collected group statistics."""
     # --- TEST 1: Risk Differences Across Provinces ---
-    if 'Province' in df.columns:
+    if 'Province' in test_stats:
         print("\n[Test 1] Risk (Frequency) across Provinces")
-        contingency = pd.crosstab(df['Province'], df['Claim_Flag'])
-        chi2, p, dof, ex = stats.chi2_contingency(contingency)
+        chi2, p = chi2_from_stats(test_stats['Province'])
         print(f"   Chi2 Stat: {chi2:.2f}, P-value: {p:.4e}")
         interpret_p_value(p)
     else:
         print("\n[Test 1] Skipped: 'Province' column not found.")
 
     # --- TEST 2: Risk Differences Between ZipCodes ---
-    if 'PostalCode' in df.columns:
+    if 'PostalCode' in test_stats:
         print("\n[Test 2] Risk (Frequency) across ZipCodes")
-        top_zips = df['PostalCode'].value_counts().nlargest(20).index
-        zip_df = df[df['PostalCode'].isin(top_zips)]
-        
-        contingency_zip = pd.crosstab(zip_df['PostalCode'], zip_df['Claim_Flag'])
-        chi2, p, dof, ex = stats.chi2_contingency(contingency_zip)
-        print(f"   Chi2 Stat: {chi2:.2f}, P-value: {p:.4e} (Top 20 Zips)")
+        zip_stats = test_stats['PostalCode']
+        chi2, p = chi2_from_stats(zip_stats)
+        print(f"   Chi2 Stat: {chi2:.2f}, P-value: {p:.4e} (All {len(zip_stats)} Zips)")
         interpret_p_value(p)
     else:
         print("\n[Test 2] Skipped: 'PostalCode' column not found.")
 
     # --- TEST 3: Margin Difference Between ZipCodes ---
-    if 'PostalCode' in df.columns:
+    if 'PostalCode' in test_stats:
         print("\n[Test 3] Margin (Profit) Difference across ZipCodes")
-        top_zips = df['PostalCode'].value_counts().nlargest(20).index
-        zip_df = df[df['PostalCode'].isin(top_zips)]
-        
-        groups = [data['Margin'].values for name, data in zip_df.groupby('PostalCode')]
+        zip_stats = test_stats['PostalCode']
         
-        if len(groups) > 1:
-            f_stat, p = stats.f_oneway(*groups)
-            print(f"   F-Stat: {f_stat:.2f}, P-value: {p:.4e}")
-            interpret_p_value(p)
+        if len(zip_stats) > 1:
+            f_stat, p = anova_from_stats(zip_stats)
+            if np.isnan(p):
+                print("   No within-group variance in margin; ANOVA skipped.")
+            else:
+                print(f"   F-Stat: {f_stat:.2f}, P-value: {p:.4e}")
+                interpret_p_value(p)
         else:
             print("   Not enough groups for ANOVA.")
 
     # --- TEST 4: Risk Difference Between Women and Men ---
-    if 'Gender' in df.columns:
+    if 'Gender' in test_stats:
         print("\n[Test 4] Risk (Frequency) Women vs Men")
-        df['Gender_Clean'] = df['Gender'].astype(str).str.lower().str.strip()
-        gender_df = df[df['Gender_Clean'].isin(['male', 'female', 'm', 'f'])]
+        gender_stats = clean_gender_stats(test_stats['Gender'])
         
-        if not gender_df.empty:
-            contingency_gender = pd.crosstab(gender_df['Gender_Clean'], gender_df['Claim_Flag'])
-            chi2, p, dof, ex = stats.chi2_contingency(contingency_gender)
+        if not gender_stats.empty:
+            chi2, p = chi2_from_stats(gender_stats)
             print(f"   Chi2 Stat: {chi2:.2f}, P-value: {p:.4e}")
             interpret_p_value(p)
         else:
@@ -123,6 +172,55 @@ def perform_hypothesis_testing(df):
     else:
         print("\n[Test 4] Skipped: 'Gender' column not found.")
 
+def run_permutation_tests(df, n_permutations=10000, workers=-1, seed=42,
+                          output_path='results/zip_permutation_tests.csv'):
+    """
+    Assumption-free versions of the tests: label permutations on integer-coded
+    groups, so heavy-tailed TotalClaims cannot distort the p-values.
+    Every PostalCode is also tested on its own (claim frequency and margin vs the
+    pooled book) with Holm and Benjamini-Hochberg adjusted p-values.
+    """
+    print("\n[Permutation Tests] "
+          f"{n_permutations} label permutations per test (seed={seed})")
+    claims = df['TotalClaims'].fillna(0)
+    claim_flag = (claims > 0).to_numpy(dtype='float64')
+    margin = (df['TotalPremium'].fillna(0) - claims).to_numpy(dtype='float64')
+
+    tests = [(df['Province'], 'frequency', claim_flag),
+             (df['PostalCode'], 'frequency', claim_flag),
+             (df['PostalCode'], 'margin', margin)]
+    if 'Gender' in df.columns:
+        gender = df['Gender'].astype(str).str.lower().str.strip()
+        tests.append((gender.where(gender.isin(GENDER_LEVELS)), 'frequency', claim_flag))
+
+    labels = {'frequency': 'Risk (Frequency)', 'margin': 'Margin (Profit)'}
+    zip_results = {}
+    for groups, metric, values in tests:
+        codes, levels = pd.factorize(groups)
+        result = permutation_test(codes, values, n_permutations, workers, seed)
+        print(f"   {labels[metric]} across {groups.name}: permutation p-value {result['p_value']:.4e} "
+              f"({len(result['groups'])} groups)")
+        interpret_p_value(result['p_value'])
+
+        if groups.name == 'PostalCode':
+            zip_results[f'{metric}_p'] = pd.Series(result['group_p_values'], index=levels[result['groups']])
+
+    zip_table = pd.DataFrame(zip_results)
+    zip_table.index.name = 'PostalCode'
+    for col in list(zip_table.columns):
+        zip_table[f'{col}_holm'] = holm(zip_table[col])
+        zip_table[f'{col}_fdr'] = fdr_bh(zip_table[col])
+
+    for metric in ['frequency', 'margin']:
+        flagged = (zip_table[f'{metric}_p_fdr'] < 0.05).sum()
+        print(f"   ZipCodes differing in {metric} (FDR < 0.05): {flagged} of {len(zip_table)} "
+              f"(Holm: {(zip_table[f'{metric}_p_holm'] < 0.05).sum()})")
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    zip_table.sort_values('margin_p').to_csv(output_path)
+    print(f"   Per-zip results saved to {output_path}")
+    return zip_table
+
 def interpret_p_value(p):
     if p < 0.05:
         print("   Result: REJECT Null Hypothesis (Significant difference).")
@@ -130,7 +228,26 @@ def interpret_p_value(p):
         print("   Result: FAIL TO REJECT Null Hypothesis (No difference).")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Task 3: hypothesis testing")
+    parser.add_argument('--permutations', type=int, default=0,
+                        help="also run permutation tests with this many permutations (e.g. 10000)")
+    parser.add_argument('--workers', type=int, default=-1, help="processes to use (-1 = all cores)")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
     data_path = "data/insurance_claims.csv" 
-    df = load_data(data_path)
-    if df is not None:
-        perform_hypothesis_testing(df)
\ No newline at end of file
+    if not os.path.exists(data_path):
+        print(f"Error: File not found at {data_path}")
+        sys.exit(1)
+
+    # Every row is tested: the statistics are streamed, never the full frame
+    print("\n==================================================")
+    print("           TASK 3: HYPOTHESIS TESTING             ")
+    print("==================================================")
+    run_tests(stream_test_stats(data_path, args.workers))
+
+    if args.permutations > 0:
+        df = DataLoader(data_path).load_data(columns=HYPOTHESIS_COLUMNS)
+        run_permutation_tests(df, args.permutations, args.workers, args.seed)
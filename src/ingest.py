@@ -0,0 +1,292 @@
+import argparse
+import copy
+import json
+import os
+import pickle
+import shutil
+import time
+import uuid
+import pandas as pd
+from src.aggregation import MEASURES, group_stats, measure_frame, merge_stats, month_keys
+from src.generate_evidence import EvidenceAggregator
+from src.loader import CHUNK_BYTES, DataLoader
+from src.sketches import QuantileSketch
+from src.utils import get_logger
+
+logger = get_logger('Ingest')
+
+STORE_DIR = 'data/warehouse'
+# Segments with persisted additive aggregates (see aggregation.MEASURES)
+SEGMENTS = ['Province', 'PostalCode', 'TransactionMonth', 'Gender']
+
+
+class MonthlyStore:
+    """
+    Month-partitioned copy of the policy data with materialized aggregates.
+
+    Layout under `root`:
+      partitions/month=YYYY-MM/part-*.parquet   raw rows, one directory per month
+      aggregates/<segment>-<batch>.parquet       additive measures per (month, segment value)
+      sketches/month=YYYY-MM-<batch>.pkl         per-zip margin QuantileSketch for the month
+      manifest.json                              rows, files, sketch per month; aggregate per segment
+      staging/batch=<batch>/                     partitions of an ingest still in progress
+
+    Ingesting a slice only reads the slice: its months get new partitions, their
+    aggregate rows are added (append) or rebuilt (replace), and every other month
+    is left untouched. Totals over all months are sums of the stored rows, so
+    refreshing the evidence and the test statistics costs the size of the
+    aggregates, not of the history.
+
+    The manifest is the commit point: an ingest writes its partitions under
+    staging/ and new versions of the aggregates and sketches beside the current
+    ones, then replaces manifest.json in one rename. Readers only open files the
+    manifest lists, so a failed or interrupted ingest leaves the store as it was,
+    and a replaced month's old files are deleted only after the commit. One
+    writer at a time.
+    """
+
+    def __init__(self, root: str = STORE_DIR, relative_accuracy: float = 0.01):
+        self.root = root
+        self.relative_accuracy = relative_accuracy
+        self.manifest_path = os.path.join(root, 'manifest.json')
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> dict:
+        manifest = {'months': {}}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        manifest.setdefault('aggregates', {})
+        return manifest
+
+    def _write_atomic(self, path: str, write):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_file(self, path: str, dump, obj, binary: bool = False):
+        def write(tmp_path):
+            with open(tmp_path, 'wb' if binary else 'w') as f:
+                dump(obj, f)
+        self._write_atomic(path, write)
+
+    def partition_dir(self, month: str) -> str:
+        return os.path.join(self.root, 'partitions', f'month={month}')
+
+    def aggregate_path(self, segment: str) -> str:
+        """The committed aggregate table of a segment (stores written before versioning use the plain name)."""
+        default = os.path.join('aggregates', f'{segment}.parquet')
+        return os.path.join(self.root, self.manifest['aggregates'].get(segment, default))
+
+    def sketch_path(self, month: str) -> str:
+        """The committed margin sketches of a month."""
+        default = os.path.join('sketches', f'month={month}.pkl')
+        return os.path.join(self.root, self.manifest['months'].get(month, {}).get('sketch', default))
+
+    def months(self) -> list:
+        return sorted(self.manifest['months'])
+
+    # --- Ingest ---
+
+    def ingest(self, filepath: str, mode: str = 'append', chunk_bytes: int = CHUNK_BYTES) -> list:
+        """
+        Adds a new slice of data (any months, any size: it is read in chunks).
+        mode='append': rows are added to the months they belong to.
+        mode='replace': the slice restates its months; their old partitions and
+                        aggregates are dropped once the new ones are committed.
+        Returns the months touched.
+        """
+        if mode not in ('append', 'replace'):
+            raise ValueError(f"Unknown mode: {mode!r} (expected 'append' or 'replace')")
+
+        start = time.perf_counter()
+        ingested_at = time.strftime('%Y%m%dT%H%M%S')
+        batch = f"{ingested_at}-{uuid.uuid4().hex[:8]}"
+        staging = os.path.join(self.root, 'staging', f'batch={batch}')
+        loader = DataLoader(filepath)
+        new_stats = {segment: None for segment in SEGMENTS}
+        new_sketches = {}
+        written = {}
+        row_counts = {}
+
+        try:
+            for i, chunk in enumerate(loader.iter_chunks(chunk_bytes=chunk_bytes)):
+                keys = month_keys(chunk)
+                for month, rows in chunk.groupby(keys, observed=True).groups.items():
+                    part = chunk.loc[rows]
+                    row_counts[month] = row_counts.get(month, 0) + len(part)
+
+                    name = f'part-{batch}-{i:05d}.parquet'
+                    os.makedirs(os.path.join(staging, f'month={month}'), exist_ok=True)
+                    part.to_parquet(os.path.join(staging, f'month={month}', name), index=False)
+                    written.setdefault(month, []).append(name)
+
+                    measures = measure_frame(part)
+                    for segment in SEGMENTS:
+                        if segment in part.columns:
+                            stats = group_stats(part, [segment], measures)
+                            stats = stats.set_index(pd.Index([month] * len(stats), name='month'), append=True)
+                            new_stats[segment] = merge_stats(new_stats[segment],
+                                                             stats.reorder_levels(['month', segment]))
+
+                    sketches = new_sketches.setdefault(month, {})
+                    for zip_code, margins in measures['margin'].groupby(part['PostalCode'], observed=True):
+                        sketch = sketches.setdefault(zip_code, QuantileSketch(self.relative_accuracy))
+                        sketch.update(margins.to_numpy())
+
+            if written:
+                self._commit(batch, ingested_at, mode, staging, written, row_counts, new_stats, new_sketches)
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+        if loader.rejected_rows:
+            logger.warning(f"⚠️ {loader.rejected_rows} rows of {filepath} were rejected and not ingested")
+        logger.info(f"✅ Ingested {filepath} ({mode}) into {len(written)} months "
+                    f"{sorted(written)} in {time.perf_counter() - start:.1f}s")
+        return sorted(written)
+
+    def _commit(self, batch, ingested_at, mode, staging, written, row_counts, new_stats, new_sketches):
+        """
+        Publishes a staged batch: moves its partitions into place, writes new versions of
+        the aggregates and sketches it changes, then swaps in the new manifest. Anything
+        written before the swap is removed again if it fails; files the new manifest no
+        longer lists are removed after it.
+        """
+        manifest = copy.deepcopy(self.manifest)
+        created, obsolete = [], []
+        committed = False
+        try:
+            for month, names in written.items():
+                entry = manifest['months'].get(month)
+                if mode == 'replace' and entry is not None:
+                    logger.info(f"Replacing month {month}")
+                    obsolete += [os.path.join(self.root, path) for path in entry['files']]
+                    entry = None
+                if entry is None:
+                    entry = manifest['months'][month] = {'rows': 0, 'files': []}
+                for name in names:
+                    path = os.path.join(self.partition_dir(month), name)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    os.replace(os.path.join(staging, f'month={month}', name), path)
+                    created.append(path)
+                    entry['files'].append(os.path.relpath(path, self.root))
+                entry['rows'] += row_counts[month]
+                entry['ingested_at'] = ingested_at
+
+                sketches = {} if mode == 'replace' else self._read_sketches(month)
+                for zip_code, sketch in new_sketches.get(month, {}).items():
+                    if zip_code in sketches:
+                        sketches[zip_code].merge(sketch)
+                    else:
+                        sketches[zip_code] = sketch
+                relpath = os.path.join('sketches', f'month={month}-{batch}.pkl')
+                self._write_file(os.path.join(self.root, relpath), pickle.dump, sketches, binary=True)
+                created.append(os.path.join(self.root, relpath))
+                obsolete.append(self.sketch_path(month))
+                entry['sketch'] = relpath
+
+            for segment in SEGMENTS:
+                stored = self._read_aggregate(segment)
+                stats = new_stats[segment]
+                if stored is not None and mode == 'replace':
+                    restated = stored['month'].isin(list(written))
+                    if restated.any():
+                        stored = stored[~restated]
+                    elif stats is None:
+                        continue
+                elif stats is None:
+                    continue
+                if stored is not None:
+                    stats = merge_stats(stored.set_index(['month', segment]), stats)
+                relpath = os.path.join('aggregates', f'{segment}-{batch}.parquet')
+                table = stats.reset_index()
+                self._write_atomic(os.path.join(self.root, relpath), lambda tmp: table.to_parquet(tmp, index=False))
+                created.append(os.path.join(self.root, relpath))
+                obsolete.append(self.aggregate_path(segment))
+                manifest['aggregates'][segment] = relpath
+
+            # The commit point: until this rename, readers see only the previous state
+            self._write_file(self.manifest_path, lambda obj, f: json.dump(obj, f, indent=2), manifest)
+            committed = True
+        finally:
+            if not committed:
+                for path in created:
+                    if os.path.exists(path):
+                        os.remove(path)
+
+        self.manifest = manifest
+        for path in obsolete:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _read_aggregate(self, segment: str):
+        path = self.aggregate_path(segment)
+        return pd.read_parquet(path) if os.path.exists(path) else None
+
+    def _read_sketches(self, month: str) -> dict:
+        path = self.sketch_path(month)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    # --- Queries over the materialized aggregates ---
+
+    def segment_stats(self, segment: str, months: list = None) -> pd.DataFrame:
+        """Measures per segment value summed over `months` (default: all), in group_stats format."""
+        stored = self._read_aggregate(segment)
+        if stored is None:
+            return None
+        if months is not None:
+            stored = stored[stored['month'].isin(months)]
+        return stored.groupby(segment)[MEASURES].sum()
+
+    def test_stats(self, months: list = None) -> dict:
+        """Sufficient statistics for hypothesis_testing.run_tests."""
+        test_stats = {}
+        for dim in ['Province', 'PostalCode', 'Gender']:
+            stats = self.segment_stats(dim, months)
+            if stats is not None:
+                test_stats[dim] = stats
+        return test_stats
+
+    def evidence(self, months: list = None) -> EvidenceAggregator:
+        """EvidenceAggregator for generate_evidence.plot_evidence (margin boxes from the sketches)."""
+        aggregator = EvidenceAggregator(self.relative_accuracy)
+        aggregator.province = self.segment_stats('Province', months)
+        aggregator.monthly = self.segment_stats('TransactionMonth', months)
+        aggregator.zips = self.segment_stats('PostalCode', months)
+        for month in months or self.months():
+            part = EvidenceAggregator(self.relative_accuracy)
+            part.zip_sketches = self._read_sketches(month)
+            aggregator.merge(part)
+        return aggregator
+
+    def read(self, columns: list = None, months: list = None) -> pd.DataFrame:
+        """Raw rows of the given months (default: all) from the partition files the manifest lists."""
+        paths = []
+        for month in months or self.months():
+            files = self.manifest['months'].get(month, {}).get('files', [])
+            paths += [os.path.join(self.root, path) for path in files]
+        return pd.concat([pd.read_parquet(path, columns=columns) for path in paths], ignore_index=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest a monthly slice and refresh the evidence and tests.")
+    parser.add_argument('input', help="CSV slice (same layout as data/insurance_claims.csv)")
+    parser.add_argument('--store', default=STORE_DIR)
+    parser.add_argument('--replace', action='store_true',
+                        help="restate the slice's months instead of appending to them")
+    parser.add_argument('--refresh', action='store_true',
+                        help="redraw the evidence plots and rerun the tests from the aggregates")
+    args = parser.parse_args()
+
+    store = MonthlyStore(args.store)
+    store.ingest(args.input, mode='replace' if args.replace else 'append')
+
+    if args.refresh:
+        from src.generate_evidence import plot_evidence
+        from src.hypothesis_testing import run_tests
+        plot_evidence(store.evidence())
+        run_tests(store.test_stats())
@@ -1,40 +1,237 @@
 import pandas as pd
+import io
 import os
-from src.utils import get_logger
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from pandas.api.types import union_categoricals
+from src.cache import ColumnarCache
+from src.schema import apply_schema, csv_dtypes
+from src.utils import get_logger, instrument
 
 logger = get_logger('DataLoader')
 
+DELIMITERS = ['|', ',', '\t', ';']
+
+# Streaming reads parse about this much CSV (or this many cached rows) at a time
+CHUNK_BYTES = 64 * 1024 * 1024
+CHUNK_ROWS = 250_000
+
+
+def sniff_delimiter(filepath: str) -> str:
+    """Picks the delimiter from the header line alone ('|' for the claims extract)."""
+    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
+        header = f.readline()
+    counts = {sep: header.count(sep) for sep in DELIMITERS}
+    best = max(DELIMITERS, key=lambda sep: counts[sep])
+    return best if counts[best] > 0 else '|'
+
+
+def csv_options(filepath: str) -> tuple:
+    """Returns (sep, raw header names, read_csv dtypes) for a CSV, from its header line only."""
+    sep = sniff_delimiter(filepath)
+    header = pd.read_csv(filepath, sep=sep, nrows=0).columns
+    dtypes = csv_dtypes(header.str.strip())
+    dtypes = {raw: dtypes[col] for raw, col in zip(header, header.str.strip()) if col in dtypes}
+    return sep, list(header), dtypes
+
+
+def select_usecols(header: list, columns: list = None):
+    """Maps wanted (stripped) column names onto the raw header names, or None for all."""
+    if columns is None:
+        return None
+    return [raw for raw in header if raw.strip() in columns]
+
+
+def split_byte_ranges(filepath: str, n_parts: int) -> list:
+    """
+    Splits the data section of a CSV into `n_parts` (start, end) byte ranges.
+    Every boundary is moved forward to the next line start, so no row is cut in two.
+    Assumes rows contain no quoted newlines, which holds for the pipe-delimited extract.
+    """
+    size = os.path.getsize(filepath)
+    with open(filepath, 'rb') as f:
+        f.readline()
+        data_start = f.tell()
+        step = max(1, (size - data_start) // max(1, n_parts))
+
+        bounds = [data_start]
+        for i in range(1, n_parts):
+            f.seek(data_start + i * step)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            if pos > bounds[-1]:
+                bounds.append(pos)
+        bounds.append(size)
+
+    return [(start, end) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def _parse_csv(source, sep: str, dtypes: dict, usecols: list = None):
+    """Parses one CSV source with the schema; returns (df, malformed, unparseable, coerced)."""
+    # Malformed lines are reported through ParserWarnings so they can be counted
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        df = pd.read_csv(source, sep=sep, dtype=dtypes, usecols=usecols, low_memory=False, on_bad_lines='warn')
+    malformed = sum(str(w.message).count('Skipping line') for w in caught)
+
+    df.columns = df.columns.str.strip()
+    df, unparseable, coerced = apply_schema(df)
+    return df, malformed, unparseable, coerced
+
+
+def parse_byte_range(filepath: str, start: int, end: int, sep: str, dtypes: dict, usecols: list = None):
+    """
+    Parses rows in [start, end) with the file's own header line prepended.
+    Returns (df, malformed, unparseable, coerced) like a full parse would.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        body = f.read(end - start)
+    return _parse_csv(io.BytesIO(header + body), sep, dtypes, usecols)
+
+
+def _concat_parts(frames: list) -> pd.DataFrame:
+    """
+    Concatenates parsed parts into the frame a serial parse would produce.
+    Each part only knows its own category levels, so levels are unified (sorted,
+    as read_csv sorts them) before concatenating to keep the categorical dtypes.
+    """
+    if len(frames) == 1:
+        return frames[0]
+
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            levels = union_categoricals([frame[col] for frame in frames], sort_categories=True).categories
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(levels)
+
+    return pd.concat(frames, ignore_index=True)
+
+
 class DataLoader:
-    def __init__(self, filepath: str):
+    def __init__(self, filepath: str, use_cache: bool = True, workers: int = 1):
+        """
+        workers: processes used to parse the CSV on a cache miss
+                 (1 = serial, -1 = all cores). The result is identical either way.
+        """
         self.filepath = filepath
+        self.use_cache = use_cache
+        self.workers = os.cpu_count() if workers == -1 else max(1, workers)
         self.df = None
+        self.rejected_rows = 0
 
-    def load_data(self) -> pd.DataFrame:
-        """Loads data and validates columns."""
+    @instrument('load', rows=lambda df, *args, **kwargs: len(df))
+    def load_data(self, columns: list = None) -> pd.DataFrame:
+        """
+        Loads data and validates columns.
+        Served from the columnar cache when it matches the current data hash;
+        otherwise the CSV is parsed once and the cache is (re)built.
+        Pass `columns` to read only the fields you need.
+        """
         if not os.path.exists(self.filepath):
             logger.error(f"File not found: {self.filepath}")
             raise FileNotFoundError(f"File not found: {self.filepath}")
-        
+
         try:
-            # Using pipe separator '|'
-            self.df = pd.read_csv(self.filepath, sep='|', low_memory=False)
-            logger.info(f"Data loaded successfully. Shape: {self.df.shape}")
-            
+            cache = ColumnarCache(self.filepath) if self.use_cache else None
+
+            if cache is not None and cache.exists():
+                self.df = cache.read(columns)
+                logger.info(f"Data loaded from cache {cache.path}. Shape: {self.df.shape}")
+            else:
+                self.df = self._read_csv()
+                logger.info(f"Data loaded successfully. Shape: {self.df.shape}")
+
+                if cache is not None:
+                    self._write_cache(cache)
+
+                if columns is not None:
+                    self.df = self.df[[col for col in columns if col in self.df.columns]]
+
             # Validation Step
-            self._validate_columns()
-            
+            self._validate_columns(columns)
+
         except Exception as e:
             logger.error(f"Failed to load data: {e}")
             raise e
-        
+
         return self.df
 
-    def _validate_columns(self):
+    def iter_chunks(self, columns: list = None, chunk_bytes: int = CHUNK_BYTES):
+        """
+        Yields the data as schema-typed frames of bounded size, so callers can
+        aggregate files that do not fit in memory. Reads the columnar cache when
+        it is current, otherwise parses the CSV one byte range at a time.
+        """
+        if not os.path.exists(self.filepath):
+            logger.error(f"File not found: {self.filepath}")
+            raise FileNotFoundError(f"File not found: {self.filepath}")
+
+        cache = ColumnarCache(self.filepath) if self.use_cache else None
+        if cache is not None and cache.exists():
+            yield from cache.iter_batches(columns, CHUNK_ROWS)
+            return
+
+        sep, header, dtypes = csv_options(self.filepath)
+        usecols = select_usecols(header, columns)
+        for start, end in self.byte_ranges(chunk_bytes):
+            df, malformed, unparseable, _ = parse_byte_range(self.filepath, start, end, sep, dtypes, usecols)
+            self.rejected_rows += malformed + unparseable
+            yield df
+
+    def byte_ranges(self, chunk_bytes: int = CHUNK_BYTES) -> list:
+        """Newline-aligned byte ranges of roughly `chunk_bytes` each."""
+        n_parts = -(-os.path.getsize(self.filepath) // chunk_bytes)
+        return split_byte_ranges(self.filepath, max(1, n_parts))
+
+    def _read_csv(self) -> pd.DataFrame:
+        """Parses the CSV with the declared schema and counts every rejected row."""
+        sep, _, dtypes = csv_options(self.filepath)
+
+        ranges = split_byte_ranges(self.filepath, self.workers * 2) if self.workers > 1 else []
+        if len(ranges) > 1:
+            logger.info(f"Parsing {len(ranges)} byte ranges on {self.workers} workers (sep={sep!r})...")
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                parts = list(pool.map(parse_byte_range, [self.filepath] * len(ranges),
+                                      [start for start, _ in ranges], [end for _, end in ranges],
+                                      [sep] * len(ranges), [dtypes] * len(ranges)))
+        else:
+            parts = [_parse_csv(self.filepath, sep, dtypes)]
+
+        df = _concat_parts([part[0] for part in parts])
+        malformed = sum(part[1] for part in parts)
+        unparseable = sum(part[2] for part in parts)
+        coerced = {}
+        for part in parts:
+            for col, count in part[3].items():
+                coerced[col] = coerced.get(col, 0) + count
+
+        self.rejected_rows = malformed + unparseable
+        if self.rejected_rows:
+            logger.warning(f"⚠️ Rejected {self.rejected_rows} rows "
+                           f"({malformed} malformed, {unparseable} with unparseable values)")
+        for col, count in coerced.items():
+            logger.warning(f"⚠️ {count} unparseable values in '{col}' set to NaN")
+        return df
+
+    def _write_cache(self, cache: ColumnarCache):
+        # A failed cache write only costs speed on the next run, never the current one
+        try:
+            cache.write(self.df)
+        except Exception as e:
+            logger.warning(f"Could not write columnar cache: {e}")
+
+    def _validate_columns(self, columns: list = None):
         """Ensures critical columns for analysis exist."""
         required_cols = ['TotalPremium', 'TotalClaims', 'Province', 'PostalCode']
+        if columns is not None:
+            required_cols = [col for col in required_cols if col in columns]
         missing = [col for col in required_cols if col not in self.df.columns]
-        
+
         if missing:
             logger.warning(f"⚠️ Missing critical columns: {missing}")
         else:
-            logger.info("✅ All critical columns are present.")
\ No newline at end of file
+            logger.info("✅ All critical columns are present.")
@@ -10,9 +10,21 @@ from sklearn.ensemble import RandomForestRegressor
 from xgboost import XGBRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from sklearn.base import BaseEstimator, TransformerMixin
+from joblib import Parallel, delayed
+from threadpoolctl import threadpool_limits
 import shap
+import argparse
 import os
 import sys
+import time
+from src.artifacts import save_model
+from src.cache import data_fingerprint
+from src.explain import dense_features, tree_shap_values
+from src.features import CATEGORICAL_FEATURES, MODEL_COLUMNS, MODEL_PATH, NUMERIC_FEATURES, cast_categoricals
+from src.loader import DataLoader
+from src.tuning import tune_models
+from src.utils import instrument
 
 # Ensure results directory exists
 os.makedirs('results/figures', exist_ok=True)
@@ -23,108 +35,243 @@ def load_data(filepath):
         sys.exit(1)
     
     print(f"Loading data from {filepath}...")
-    # Use pipe separator
-    df = pd.read_csv(filepath, sep='|', low_memory=False, on_bad_lines='skip')
+    # Columnar cache: only the modeling fields are read back
+    df = DataLoader(filepath).load_data(columns=MODEL_COLUMNS)
     
-    # Clean column names
-    df.columns = df.columns.str.strip()
-    
-    # Force financial columns to numeric
-    cols_to_numeric = ['TotalPremium', 'TotalClaims', 'CalculatedPremiumPerTerm', 'SumInsured']
-    for col in cols_to_numeric:
+    # Financial columns arrive numeric from the schema; only the gaps need filling
+    cols_to_fill = ['TotalPremium', 'TotalClaims', 'CalculatedPremiumPerTerm', 'SumInsured']
+    for col in cols_to_fill:
         if col in df.columns:
-            # Coerce errors turns non-numeric text to NaN, then we fill with 0
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+            df[col] = df[col].fillna(0)
             
     return df
 
-def train_models(df):
-    print("\n==================================================")
-    print("           TASK 4: PREDICTIVE MODELING            ")
-    print("==================================================")
-
-    # --- 1. DATA PREPARATION ---
+def prepare_features(df):
+    """Claim rows, explicit feature lists and the X / y used by every model."""
     # Filter for rows with actual claims
     modeling_df = df[df['TotalClaims'] > 0].copy()
     print(f"Training on {len(modeling_df)} rows where TotalClaims > 0")
 
-    # --- CORRECTION: Explicit Feature Lists ---
-    # We explicitly define lists here to prevent any "Monthly" strings entering numeric processors
-    numeric_features = ['CalculatedPremiumPerTerm', 'SumInsured']
-    categorical_features = ['Province', 'VehicleType', 'Bodytype', 'Gender', 'TermFrequency']
-    
     # Debug Print to confirm lists are correct
-    print(f"Numeric Features: {numeric_features}")
-    print(f"Categorical Features: {categorical_features}")
+    print(f"Numeric Features: {NUMERIC_FEATURES}")
+    print(f"Categorical Features: {CATEGORICAL_FEATURES}")
 
     # Check which columns actually exist in the data
-    available_numeric = [c for c in numeric_features if c in modeling_df.columns]
-    available_categorical = [c for c in categorical_features if c in modeling_df.columns]
+    available_numeric = [c for c in NUMERIC_FEATURES if c in modeling_df.columns]
+    available_categorical = [c for c in CATEGORICAL_FEATURES if c in modeling_df.columns]
     
-    # Force Categorical columns to String type to avoid type errors
-    for col in available_categorical:
-        modeling_df[col] = modeling_df[col].astype(str)
+    cast_categoricals(modeling_df, available_categorical)
 
     # Drop rows with missing values in these columns
     modeling_df = modeling_df.dropna(subset=available_numeric + available_categorical)
     
     X = modeling_df[available_numeric + available_categorical]
     y = modeling_df['TotalClaims']
+    return X, y, available_numeric, available_categorical
 
-    # --- 2. PIPELINE SETUP ---
+def build_preprocessor(numeric, categorical, sparse=False):
     # Scale numbers, One-Hot encode categories
+    # sparse=True keeps the one-hot block in CSR form end to end, so memory follows
+    # the non-zeros (one per categorical column per row) instead of the level count
     numeric_transformer = StandardScaler()
-    categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=False)
+    categorical_transformer = OneHotEncoder(handle_unknown='ignore', sparse_output=sparse)
 
-    preprocessor = ColumnTransformer(
+    return ColumnTransformer(
         transformers=[
-            ('num', numeric_transformer, available_numeric),
-            ('cat', categorical_transformer, available_categorical)
-        ])
+            ('num', numeric_transformer, numeric),
+            ('cat', categorical_transformer, categorical)
+        ],
+        sparse_threshold=1.0 if sparse else 0.0)
 
-    # Split Data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+class NativeCategoricalEncoder(BaseEstimator, TransformerMixin):
+    """
+    Passes numeric columns through and pins categorical columns to the pandas
+    category levels seen in fit (unseen levels become missing), for XGBoost's
+    native categorical splits. Nothing is expanded, whatever the level count.
+    """
 
-    # --- 3. DEFINE MODELS ---
+    def __init__(self, numeric, categorical):
+        self.numeric = numeric
+        self.categorical = categorical
+
+    def fit(self, X, y=None):
+        self.categories_ = {col: pd.Index(X[col].dropna().unique()).sort_values() for col in self.categorical}
+        return self
+
+    def transform(self, X):
+        out = X[self.numeric + self.categorical].copy()
+        for col in self.categorical:
+            out[col] = pd.Categorical(X[col], categories=self.categories_[col])
+        return out
+
+    def get_feature_names_out(self, input_features=None):
+        return np.array(self.numeric + self.categorical, dtype=object)
+
+def build_feature_sets(numeric, categorical, feature_path='sparse'):
+    """
+    Preprocessors per feature set and which set each model trains on.
+    'dense': one dense one-hot matrix for every model (the original path).
+    'sparse': CSR one-hot for Linear Regression and Random Forest, and native
+              categoricals with the hist tree method for XGBoost.
+    """
+    if feature_path == 'dense':
+        preprocessors = {'onehot': build_preprocessor(numeric, categorical)}
+        model_inputs = {"Linear Regression": 'onehot', "Random Forest": 'onehot', "XGBoost": 'onehot'}
+    elif feature_path == 'sparse':
+        preprocessors = {'onehot': build_preprocessor(numeric, categorical, sparse=True),
+                         'native': NativeCategoricalEncoder(numeric, categorical)}
+        model_inputs = {"Linear Regression": 'onehot', "Random Forest": 'onehot', "XGBoost": 'native'}
+    else:
+        raise ValueError(f"Unknown feature_path: {feature_path!r} (expected 'dense' or 'sparse')")
+    return preprocessors, model_inputs
+
+def split_cpu_budget(n_jobs):
+    """
+    Splits a CPU budget between the three models: Linear Regression gets one
+    thread, the tree ensembles share the rest instead of each taking every core.
+    Below three CPUs the models cannot run side by side within the budget; they
+    train one after another (see train_models) and each ensemble gets all of it.
+    """
+    total = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    if total < 3:
+        return {"Linear Regression": 1, "Random Forest": total, "XGBoost": total}
+    trees = max(1, (total - 1) // 2)
+    return {"Linear Regression": 1, "Random Forest": trees, "XGBoost": trees}
+
+def build_models(threads, native_categorical=False, params=None):
+    """The three candidate models; params optionally overrides settings per model (e.g. tuned ones)."""
     models = {
         "Linear Regression": LinearRegression(),
-        "Random Forest": RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=-1),
-        "XGBoost": XGBRegressor(n_estimators=50, learning_rate=0.1, random_state=42, n_jobs=-1)
+        "Random Forest": RandomForestRegressor(n_estimators=50, random_state=42, n_jobs=threads["Random Forest"]),
+        "XGBoost": XGBRegressor(n_estimators=50, learning_rate=0.1, random_state=42, n_jobs=threads["XGBoost"],
+                                tree_method='hist', enable_categorical=native_categorical)
+    }
+    for name, overrides in (params or {}).items():
+        models[name].set_params(**overrides)
+    return models
+
+def fit_and_score(name, model, X_train, y_train, X_test, y_test, threads=1):
+    """
+    Fits one model on pre-transformed matrices; returns (name, model, metrics).
+    A failing model is reported and returned as (name, None, None).
+    """
+    try:
+        # Caps BLAS/OpenMP pools so concurrent models stay inside their share of the budget
+        with threadpool_limits(limits=threads):
+            start = time.perf_counter()
+            model.fit(X_train, y_train)
+            fit_seconds = time.perf_counter() - start
+            y_pred = model.predict(X_test)
+    except Exception as e:
+        print(f"   [Error] Failed to train {name}: {e}")
+        import traceback
+        traceback.print_exc()
+        return name, None, None
+
+    metrics = {
+        'fit_seconds': fit_seconds,
+        'rmse': np.sqrt(mean_squared_error(y_test, y_pred)),
+        'mae': mean_absolute_error(y_test, y_pred),
+        'r2': r2_score(y_test, y_pred),
     }
+    return name, model, metrics
+
+@instrument('modeling', rows=lambda result, df, *args, **kwargs: len(df))
+def train_models(df, parallel=True, n_jobs=-1, feature_path='sparse', model_path=MODEL_PATH, data_hash=None,
+                 search_budget=None):
+    """
+    Trains and compares the three models.
+    Each preprocessor is fitted once and its transformed matrices are shared by
+    the models that use it; with parallel=True the models train concurrently in
+    worker processes that memory-map those matrices read-only, within an overall
+    budget of n_jobs CPUs (-1 = all cores). See build_feature_sets for feature_path.
+    search_budget (seconds) first tunes the tree models with a successive-halving
+    search on the same training matrices (see src.tuning); None keeps the defaults.
+    The winning pipeline is saved to model_path (None to skip) and returned.
+    """
+    print("\n==================================================")
+    print("           TASK 4: PREDICTIVE MODELING            ")
+    print("==================================================")
+
+    # --- 1. DATA PREPARATION ---
+    X, y, available_numeric, available_categorical = prepare_features(df)
+
+    # --- 2. PIPELINE SETUP ---
+    preprocessors, model_inputs = build_feature_sets(available_numeric, available_categorical, feature_path)
+
+    # Split Data
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+
+    # Fit each preprocessor once; every model on that feature set reuses the same matrices
+    matrices = {}
+    for key, preprocessor in preprocessors.items():
+        matrices[key] = (preprocessor.fit_transform(X_train), preprocessor.transform(X_test))
+    y_train_v, y_test_v = y_train.to_numpy(), y_test.to_numpy()
+
+    # --- 3. DEFINE MODELS ---
+    threads = split_cpu_budget(n_jobs)
+    tuned = None
+    if search_budget:
+        print(f"\nTuning tree models within a {search_budget:.0f}s budget...")
+        tuned = tune_models(["Random Forest", "XGBoost"], {key: train for key, (train, _) in matrices.items()},
+                            model_inputs, y_train_v, search_budget, n_jobs=n_jobs,
+                            native_categorical='native' in preprocessors)
+    models = build_models(threads, native_categorical='native' in preprocessors, params=tuned)
+
+    # --- 4. TRAIN & EVALUATE ---
+    tasks = [delayed(fit_and_score)(name, model, matrices[model_inputs[name]][0], y_train_v,
+                                    matrices[model_inputs[name]][1], y_test_v, threads[name])
+             for name, model in models.items()]
+    budget = os.cpu_count() if n_jobs == -1 else max(1, n_jobs)
+    if parallel and budget >= len(models):
+        print(f"\nTraining {len(models)} models concurrently (threads per model: {threads})...")
+        # Arrays above 1 MB reach the workers as read-only memory maps, not copies
+        results = Parallel(n_jobs=min(len(models), budget), backend='loky', max_nbytes='1M',
+                           mmap_mode='r')(tasks)
+    else:
+        results = [task_func(*args, **kwargs) for task_func, args, kwargs in tasks]
 
     best_model = None
     best_score = -float("inf")
     best_name = ""
+    scores = {}
 
-    # --- 4. TRAIN & EVALUATE ---
-    for name, model in models.items():
-        print(f"\nTraining {name}...")
-        try:
-            pipeline = Pipeline(steps=[('preprocessor', preprocessor),
-                                       ('model', model)])
-            
-            pipeline.fit(X_train, y_train)
-            y_pred = pipeline.predict(X_test)
-            
-            rmse = np.sqrt(mean_squared_error(y_test, y_pred))
-            mae = mean_absolute_error(y_test, y_pred)
-            r2 = r2_score(y_test, y_pred)
-            
-            print(f"   -> RMSE: {rmse:,.2f}")
-            print(f"   -> MAE:  {mae:,.2f}")
-            print(f"   -> R2:   {r2:.4f}")
-            
-            if r2 > best_score:
-                best_score = r2
-                best_model = pipeline
-                best_name = name
-        except Exception as e:
-            print(f"   [Error] Failed to train {name}: {e}")
-            import traceback
-            traceback.print_exc()
+    for name, model, metrics in results:
+        if model is None:
+            continue
+        scores[name] = metrics
+        print(f"\n{name}:")
+        print(f"   -> Fit:  {metrics['fit_seconds']:.2f}s")
+        print(f"   -> RMSE: {metrics['rmse']:,.2f}")
+        print(f"   -> MAE:  {metrics['mae']:,.2f}")
+        print(f"   -> R2:   {metrics['r2']:.4f}")
+        
+        if metrics['r2'] > best_score:
+            best_score = metrics['r2']
+            best_model = Pipeline(steps=[('preprocessor', preprocessors[model_inputs[name]]),
+                                         ('model', model)])
+            best_name = name
+
+    print(f"\n{'Model':<20}{'Fit (s)':>10}{'RMSE':>14}{'MAE':>14}{'R2':>10}")
+    for name, metrics in scores.items():
+        print(f"{name:<20}{metrics['fit_seconds']:>10.2f}{metrics['rmse']:>14,.2f}"
+              f"{metrics['mae']:>14,.2f}{metrics['r2']:>10.4f}")
 
     print(f"\n[Winner] Best Model: {best_name} (R2: {best_score:.4f})")
 
+    if best_model is not None and model_path:
+        save_model(best_model, model_path, {
+            'model_name': best_name,
+            'metrics': scores[best_name],
+            'numeric_features': available_numeric,
+            'categorical_features': available_categorical,
+            'dtypes': {col: str(dtype) for col, dtype in X.dtypes.items()},
+            'feature_path': feature_path,
+            'params': (tuned or {}).get(best_name),
+            'data_fingerprint': data_hash,
+        })
+        print(f"   -> Model saved to {model_path}")
+
     # --- 5. FEATURE IMPORTANCE (SHAP) ---
     if best_name in ["Random Forest", "XGBoost"]:
         print("\nGenerating SHAP Feature Importance Plot...")
@@ -133,17 +280,14 @@ def train_models(df):
             model_step = best_model.named_steps['model']
             preprocessor_step = best_model.named_steps['preprocessor']
             
-            X_test_transformed = preprocessor_step.transform(X_test)
+            X_test_transformed = matrices[model_inputs[best_name]][1]
+            feature_names = list(preprocessor_step.get_feature_names_out())
             
-            cat_names = preprocessor_step.named_transformers_['cat'].get_feature_names_out(available_categorical)
-            feature_names = available_numeric + list(cat_names)
-            
-            # Using a small sample for SHAP to speed up processing
-            explainer = shap.Explainer(model_step, X_test_transformed)
-            shap_values = explainer(X_test_transformed[:500]) 
+            # Full test set: tree SHAP in parallel chunks, cached by model + data hash
+            shap_values, _ = tree_shap_values(model_step, X_test_transformed, n_jobs=n_jobs)
             
             plt.figure(figsize=(10, 6))
-            shap.summary_plot(shap_values, X_test_transformed[:500], feature_names=feature_names, show=False)
+            shap.summary_plot(shap_values, dense_features(X_test_transformed), feature_names=feature_names, show=False)
             output_path = 'results/figures/shap_summary.png'
             plt.savefig(output_path, bbox_inches='tight')
             print(f"   -> Plot saved to {output_path}")
@@ -151,7 +295,15 @@ def train_models(df):
         except Exception as e:
             print(f"   [Warning] Could not generate SHAP plot: {e}")
 
+    return best_model
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train and compare the claim severity models.")
+    parser.add_argument('--search-budget', type=float, default=None,
+                        help="seconds for a successive-halving search over the tree models' settings")
+    parser.add_argument('--jobs', type=int, default=-1, help="CPU budget (-1 = all cores)")
+    args = parser.parse_args()
+
     data_path = "data/insurance_claims.csv" 
     df = load_data(data_path)
-    train_models(df)
\ No newline at end of file
+    train_models(df, n_jobs=args.jobs, data_hash=data_fingerprint(data_path), search_budget=args.search_budget)
\ No newline at end of file
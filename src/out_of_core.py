@@ -0,0 +1,327 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from src.artifacts import save_model
+from src.cache import data_fingerprint
+from src.features import CATEGORICAL_FEATURES, NUMERIC_FEATURES
+from src.loader import CHUNK_BYTES, DataLoader
+from src.scoring import model_frame
+from src.utils import get_logger
+
+logger = get_logger('OutOfCore')
+
+FREQUENCY_MODEL_PATH = 'models/frequency_model.joblib'
+SEVERITY_MODEL_PATH = 'models/severity_model.joblib'
+EXTMEM_CACHE_DIR = 'data/cache/xgb_extmem'
+
+# A frequency model whose mean predicted probability is further than this (relative)
+# from the holdout claim rate is not saved as the winner: its expected losses would
+# misprice the whole book, whatever its log loss
+CALIBRATION_TOLERANCE = 0.25
+
+
+class StreamingPreprocessor(BaseEstimator, TransformerMixin):
+    """
+    The modeling preprocessor (scaled numerics + one-hot categoricals, CSR output)
+    fitted chunk by chunk: the scaler is updated with partial_fit and category
+    levels are collected as they appear, so fitting never needs the whole file.
+    Levels not seen during fitting encode to all zeros, as with handle_unknown='ignore'.
+    """
+
+    def __init__(self, numeric, categorical):
+        self.numeric = numeric
+        self.categorical = categorical
+
+    def partial_fit(self, X, y=None):
+        if not hasattr(self, 'scaler_'):
+            self.scaler_ = StandardScaler()
+            self.levels_ = {col: set() for col in self.categorical}
+        self.scaler_.partial_fit(X[self.numeric].to_numpy('float64'))
+        for col in self.categorical:
+            self.levels_[col].update(X[col].unique())
+        self.categories_ = {col: pd.Index(sorted(levels)) for col, levels in self.levels_.items()}
+        return self
+
+    def fit(self, X, y=None):
+        for attr in ('scaler_', 'levels_', 'categories_'):
+            self.__dict__.pop(attr, None)
+        return self.partial_fit(X)
+
+    def transform(self, X):
+        numeric = sparse.csr_matrix(self.scaler_.transform(X[self.numeric].to_numpy('float64')))
+        n_rows = len(X)
+        rows, cols, offset = [], [], 0
+        for col in self.categorical:
+            codes = self.categories_[col].get_indexer(X[col])
+            seen = codes >= 0
+            rows.append(np.flatnonzero(seen))
+            cols.append(codes[seen] + offset)
+            offset += len(self.categories_[col])
+        rows, cols = np.concatenate(rows), np.concatenate(cols)
+        onehot = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(n_rows, offset))
+        return sparse.hstack([numeric, onehot], format='csr')
+
+    def get_feature_names_out(self, input_features=None):
+        names = [f"num__{col}" for col in self.numeric]
+        for col in self.categorical:
+            names += [f"cat__{col}_{level}" for level in self.categories_[col]]
+        return np.array(names, dtype=object)
+
+
+class BoosterModel(BaseEstimator):
+    """Wraps a trained xgboost Booster so it can sit in a Pipeline and be scored like the sklearn models."""
+
+    def __init__(self, booster: xgb.Booster = None):
+        self.booster = booster
+
+    def fit(self, X, y=None):
+        # Training happens out of core with xgb.train (see train_out_of_core)
+        return self
+
+    def __sklearn_is_fitted__(self):
+        return self.booster is not None
+
+    def predict(self, X):
+        return self.booster.inplace_predict(X)
+
+
+class ChunkIter(xgb.DataIter):
+    """
+    Feeds preprocessed chunks to XGBoost's external-memory DMatrix one at a time;
+    the quantised pages are cached on disk, so only one chunk is in memory.
+    target: 'frequency' (claim flag, every row) or 'severity' (claim amount, claim rows only).
+    """
+
+    def __init__(self, stream, preprocessor, target, cache_prefix):
+        self._stream = stream
+        self._preprocessor = preprocessor
+        self._target = target
+        self._chunks = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data) -> bool:
+        if self._chunks is None:
+            self._chunks = self._stream.training_chunks(self._target)
+        for X, y in self._chunks:
+            if len(y):
+                input_data(data=self._preprocessor.transform(X), label=y)
+                return True
+        return False
+
+    def reset(self):
+        self._chunks = None
+
+
+class ChunkStream:
+    """
+    Re-readable stream of (features, claims, holdout mask) chunks from the loader.
+    The train/holdout split is drawn per chunk from (seed, chunk number), so every
+    pass over the file sees the same split without storing it.
+    """
+
+    def __init__(self, filepath, numeric, categorical, chunk_bytes=CHUNK_BYTES, test_size=0.2, seed=42):
+        self.filepath = filepath
+        self.features = {'numeric_features': numeric, 'categorical_features': categorical}
+        self.columns = numeric + categorical + ['TotalClaims']
+        self.chunk_bytes = chunk_bytes
+        self.test_size = test_size
+        self.seed = seed
+
+    def __iter__(self):
+        loader = DataLoader(self.filepath)
+        for i, chunk in enumerate(loader.iter_chunks(self.columns, self.chunk_bytes)):
+            claims = chunk['TotalClaims'].fillna(0).to_numpy('float64')
+            holdout = np.random.default_rng([self.seed, i]).random(len(chunk)) < self.test_size
+            yield model_frame(chunk, self.features), claims, holdout
+
+    def training_chunks(self, target):
+        for X, claims, holdout in self:
+            keep = ~holdout if target == 'frequency' else ~holdout & (claims > 0)
+            y = (claims > 0).astype('float64') if target == 'frequency' else claims
+            yield X[keep], y[keep]
+
+
+def _severity_metrics(totals):
+    n = totals['n']
+    mean = totals['sum_y'] / n
+    total_ss = totals['sum_y2'] - n * mean * mean
+    return {'rmse': float(np.sqrt(totals['sse'] / n)), 'mae': float(totals['sae'] / n),
+            'r2': float(1 - totals['sse'] / total_ss), 'rows': int(n)}
+
+
+def _frequency_metrics(totals):
+    n = totals['n']
+    calibration = totals['predicted'] / totals['claims'] if totals['claims'] else float('nan')
+    return {'log_loss': float(totals['log_loss'] / n), 'brier': float(totals['brier'] / n),
+            'claim_rate': float(totals['claims'] / n), 'predicted_rate': float(totals['predicted'] / n),
+            'calibration': float(calibration), 'rows': int(n)}
+
+
+def calibrated(scores: dict, tolerance: float = CALIBRATION_TOLERANCE) -> dict:
+    """The frequency models whose predicted claim rate is within tolerance of the observed one."""
+    return {name: metrics for name, metrics in scores.items() if abs(metrics['calibration'] - 1) <= tolerance}
+
+
+def evaluate(stream, preprocessor, frequency_models, severity_models):
+    """
+    One streaming pass over the holdout rows; metrics are accumulated as running
+    sums, so nothing per-row is kept. Returns {model name: metrics} per target.
+    """
+    eps = 1e-15
+    frequency = {name: dict.fromkeys(['n', 'log_loss', 'brier', 'claims', 'predicted'], 0.0)
+                 for name in frequency_models}
+    severity = {name: dict.fromkeys(['n', 'sse', 'sae', 'sum_y', 'sum_y2'], 0.0) for name in severity_models}
+
+    for X, claims, holdout in stream:
+        if not holdout.any():
+            continue
+        features = preprocessor.transform(X[holdout])
+        flag = (claims[holdout] > 0).astype('float64')
+        for name, model in frequency_models.items():
+            p = np.clip(predict_frequency(model, features), eps, 1 - eps)
+            totals = frequency[name]
+            totals['n'] += len(flag)
+            totals['log_loss'] -= float(np.sum(flag * np.log(p) + (1 - flag) * np.log(1 - p)))
+            totals['brier'] += float(np.sum((p - flag) ** 2))
+            totals['claims'] += float(flag.sum())
+            totals['predicted'] += float(p.sum())
+
+        claim_rows = flag > 0
+        if not claim_rows.any():
+            continue
+        y = claims[holdout][claim_rows]
+        for name, model in severity_models.items():
+            error = model.predict(features[claim_rows]) - y
+            totals = severity[name]
+            totals['n'] += len(y)
+            totals['sse'] += float(np.sum(error ** 2))
+            totals['sae'] += float(np.sum(np.abs(error)))
+            totals['sum_y'] += float(y.sum())
+            totals['sum_y2'] += float(np.sum(y ** 2))
+
+    return ({name: _frequency_metrics(t) for name, t in frequency.items() if t['n']},
+            {name: _severity_metrics(t) for name, t in severity.items() if t['n'] > 1})
+
+
+def predict_frequency(model, X):
+    """Claim probability from either a fitted classifier or a binary:logistic booster."""
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(X)[:, 1]
+    return model.predict(X)
+
+
+def train_out_of_core(filepath, chunk_bytes=CHUNK_BYTES, epochs=1, xgb_rounds=200, test_size=0.2,
+                      frequency_path=FREQUENCY_MODEL_PATH, severity_path=SEVERITY_MODEL_PATH, seed=42):
+    """
+    Trains a claim frequency model on every row and a claim severity model on
+    the claim rows without ever holding the file in memory:
+
+    1. one pass fits the StreamingPreprocessor;
+    2. `epochs` passes stream preprocessed chunks into SGD learners via partial_fit
+       (SGDClassifier on the claim flag, SGDRegressor on claim amounts);
+    3. XGBoost trains on ExtMemQuantileDMatrix built from a DataIter over the same
+       chunks, so its quantised pages live on disk;
+    4. one pass scores the holdout rows.
+
+    Peak memory is bounded by the chunk size, not the row count. For each target
+    the better model on the holdout is saved with save_model (None skips saving).
+    Returns {'frequency': metrics per model, 'severity': metrics per model}.
+    """
+    numeric, categorical = list(NUMERIC_FEATURES), list(CATEGORICAL_FEATURES)
+    stream = ChunkStream(filepath, numeric, categorical, chunk_bytes, test_size, seed)
+
+    start = time.perf_counter()
+    preprocessor = StreamingPreprocessor(numeric, categorical)
+    rows = 0
+    for X, _, _ in stream:
+        preprocessor.partial_fit(X)
+        rows += len(X)
+    logger.info(f"Preprocessor fitted on {rows:,} rows in {time.perf_counter() - start:.1f}s "
+                f"({len(preprocessor.get_feature_names_out())} features)")
+
+    sgd_frequency = SGDClassifier(loss='log_loss', alpha=1e-5, random_state=seed)
+    sgd_severity = SGDRegressor(loss='huber', epsilon=1.0, alpha=1e-5, learning_rate='adaptive',
+                                eta0=0.01, random_state=seed)
+    for epoch in range(epochs):
+        epoch_start = time.perf_counter()
+        for X, claims, holdout in stream:
+            features = preprocessor.transform(X[~holdout])
+            train_claims = claims[~holdout]
+            sgd_frequency.partial_fit(features, (train_claims > 0).astype('int8'), classes=[0, 1])
+            claim_rows = train_claims > 0
+            if claim_rows.any():
+                sgd_severity.partial_fit(features[claim_rows], train_claims[claim_rows])
+        logger.info(f"SGD epoch {epoch + 1}/{epochs} done in {time.perf_counter() - epoch_start:.1f}s")
+
+    os.makedirs(EXTMEM_CACHE_DIR, exist_ok=True)
+    boosters = {}
+    for target, objective in (('frequency', 'binary:logistic'), ('severity', 'reg:squarederror')):
+        target_start = time.perf_counter()
+        data = xgb.ExtMemQuantileDMatrix(
+            ChunkIter(stream, preprocessor, target, os.path.join(EXTMEM_CACHE_DIR, target)), max_bin=256)
+        boosters[target] = BoosterModel(xgb.train(
+            {'objective': objective, 'tree_method': 'hist', 'learning_rate': 0.1, 'max_depth': 6, 'seed': seed},
+            data, num_boost_round=xgb_rounds))
+        logger.info(f"XGBoost {target} model trained (external memory) in "
+                    f"{time.perf_counter() - target_start:.1f}s")
+
+    frequency_models = {'SGD Classifier': sgd_frequency, 'XGBoost': boosters['frequency']}
+    severity_models = {'SGD Regressor': sgd_severity, 'XGBoost': boosters['severity']}
+    frequency_scores, severity_scores = evaluate(stream, preprocessor, frequency_models, severity_models)
+
+    for target, scores in (('frequency', frequency_scores), ('severity', severity_scores)):
+        for name, metrics in scores.items():
+            logger.info(f"{target.capitalize()} {name}: " + ", ".join(
+                f"{key}={value:,.4f}" if isinstance(value, float) else f"{key}={value:,}"
+                for key, value in metrics.items()))
+
+    data_hash = data_fingerprint(filepath)
+    for target, scores, models, path, criterion in (
+            ('frequency', frequency_scores, frequency_models, frequency_path, 'log_loss'),
+            ('severity', severity_scores, severity_models, severity_path, 'rmse')):
+        if not scores or not path:
+            continue
+        candidates = scores
+        if target == 'frequency':
+            candidates = calibrated(scores)
+            for name in scores.keys() - candidates.keys():
+                logger.warning(f"⚠️ Frequency {name} is miscalibrated (predicted rate "
+                               f"{scores[name]['predicted_rate']:.5f} vs claim rate {scores[name]['claim_rate']:.5f}); "
+                               f"not eligible as the winner")
+            if not candidates:
+                logger.warning("⚠️ No calibrated frequency model; saving the best log loss anyway")
+                candidates = scores
+        best_name = min(candidates, key=lambda name: candidates[name][criterion])
+        save_model(Pipeline(steps=[('preprocessor', preprocessor), ('model', models[best_name])]), path, {
+            'model_name': best_name,
+            'target': target,
+            'metrics': scores[best_name],
+            'numeric_features': numeric,
+            'categorical_features': categorical,
+            'feature_path': 'streaming',
+            'data_fingerprint': data_hash,
+        })
+        logger.info(f"{target.capitalize()} winner: {best_name} -> {path}")
+
+    logger.info(f"✅ Out-of-core training finished in {time.perf_counter() - start:.1f}s")
+    return {'frequency': frequency_scores, 'severity': severity_scores}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train frequency and severity models out of core.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024),
+                        help="CSV megabytes parsed per chunk on a cold cache")
+    parser.add_argument('--epochs', type=int, default=1, help="SGD passes over the data")
+    parser.add_argument('--rounds', type=int, default=200, help="XGBoost boosting rounds")
+    args = parser.parse_args()
+
+    train_out_of_core(args.data, args.chunk_mb * 1024 * 1024, args.epochs, args.rounds)
@@ -0,0 +1,317 @@
+import ast
+import hashlib
+import importlib.util
+import inspect
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from src.utils import get_logger, track_stage
+
+logger = get_logger('Pipeline')
+
+STATE_PATH = 'data/cache/pipeline_state.json'
+STAGE_LOG_DIR = 'logs/stages'
+# Packages whose modules count as stage code (everything else is a library)
+PROJECT_PACKAGES = ['src']
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _module_path(name: str):
+    """Source file of a project module, found without importing anything; None if it is not one."""
+    if name.split('.')[0] not in PROJECT_PACKAGES:
+        return None
+    base = os.path.join(PROJECT_ROOT, *name.split('.'))
+    for path in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def _imported_modules(tree: ast.AST) -> set:
+    """Project modules imported anywhere in a parsed source, including imports inside functions."""
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module)
+            # `from src import cleaning` names a module too
+            names.update(f"{node.module}.{alias.name}" for alias in node.names)
+    return {name for name in names if _module_path(name)}
+
+
+def reachable_modules(func) -> list:
+    """
+    Every project module the stage function can reach: the ones it imports
+    (lazily in its body, or at the top of its own module for the names it uses)
+    and, transitively, everything those import. Found by parsing sources, so
+    nothing is actually imported.
+    """
+    found = _imported_modules(ast.parse(inspect.getsource(func).strip()))
+    for name in func.__code__.co_names:
+        value = func.__globals__.get(name)
+        module = getattr(value, '__name__', None) if inspect.ismodule(value) else getattr(value, '__module__', None)
+        if module and _module_path(module):
+            found.add(module)
+
+    queue = list(found)
+    while queue:
+        with open(_module_path(queue.pop()), 'rb') as f:
+            tree = ast.parse(f.read())
+        for module in _imported_modules(tree) - found:
+            found.add(module)
+            queue.append(module)
+    return sorted(found)
+
+
+class Stage:
+    """
+    One pipeline step.
+
+    func(inputs, **params): `inputs` maps each upstream stage name to its result.
+    outputs: files the stage writes; it counts as done only while they all exist.
+    modules: extra modules whose source is part of the stage's code hash; the project
+             modules func imports, directly or indirectly, are found automatically.
+    files: files the stage reads that no stage writes (e.g. a model trained outside the
+           pipeline); their size and mtime are part of the stage's key.
+    in_process: the result is an in-memory object (e.g. the loaded frame) that
+                downstream stages read; such stages run in the runner's process,
+                only when a downstream stage needs them, and are never cached.
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), params=None, modules=(), files=(), in_process=False):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.params = dict(params or {})
+        self.modules = list(modules)
+        self.files = list(files)
+        self.in_process = in_process
+
+    def code_hash(self) -> str:
+        digest = hashlib.md5(inspect.getsource(self.func).encode())
+        for module in sorted(set(reachable_modules(self.func)) | set(self.modules)):
+            with open(_module_path(module) or importlib.util.find_spec(module).origin, 'rb') as f:
+                digest.update(f.read())
+        return digest.hexdigest()
+
+    def file_stamps(self) -> dict:
+        """{path: 'size-mtime'}, None for a missing file."""
+        stamps = {}
+        for path in self.files:
+            stat = os.stat(path) if os.path.exists(path) else None
+            stamps[path] = f"{stat.st_size}-{stat.st_mtime_ns}" if stat else None
+        return stamps
+
+
+# Shared with forked workers: stages and in-process results are inherited, never pickled
+_stages = {}
+_results = {}
+
+
+def pool_context(start_method: str = None):
+    """
+    The multiprocessing context for stage workers: fork where the platform has it
+    (workers inherit the in-process results), spawn otherwise (e.g. Windows).
+    """
+    if start_method is None:
+        start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(start_method)
+
+
+def _run_stage(name):
+    """Worker: runs one stage headless, with its stdout going to logs/stages/<name>.log."""
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+
+    stage = _stages[name]
+    os.makedirs(STAGE_LOG_DIR, exist_ok=True)
+    start = time.perf_counter()
+    try:
+        with open(os.path.join(STAGE_LOG_DIR, f'{name}.log'), 'w') as log, redirect_stdout(log), \
+                track_stage(f'pipeline.{name}'):
+            stage.func({dep: _results.get(dep) for dep in stage.inputs}, **stage.params)
+    finally:
+        # Idle joblib workers would otherwise keep this process alive after the pool shuts down
+        from joblib.externals.loky import get_reusable_executor
+        get_reusable_executor().shutdown(wait=True)
+    return time.perf_counter() - start
+
+
+def _run_spawned_stage(name, stages):
+    """
+    Worker under spawn: nothing is inherited, so the in-process stages this one
+    depends on (e.g. load, which reads the columnar cache the runner just wrote)
+    are recomputed here first. `stages` is the stage's closure in dependency order.
+    """
+    _stages.clear()
+    _stages.update(stages)
+    _results.clear()
+    for dep_name, stage in stages.items():
+        if stage.in_process:
+            _results[dep_name] = stage.func({dep: _results[dep] for dep in stage.inputs}, **stage.params)
+    return _run_stage(name)
+
+
+class PipelineRunner:
+    """
+    Runs a DAG of stages once per process.
+
+    A stage is skipped when its key is unchanged since its last successful run
+    and its outputs still exist. The key hashes the input data fingerprint, the
+    stage's code, its params and the keys of its upstream stages, so a change
+    anywhere upstream reruns everything below it. In-process stages (load,
+    clean) run at most once, in this process; file-producing stages that are
+    ready run concurrently in forked workers that inherit the loaded data
+    copy-on-write instead of reloading the CSV. Where fork is not available
+    (Windows) workers are spawned and reload those results themselves.
+    """
+
+    def __init__(self, stages: list, data_hash: str, state_path: str = STATE_PATH, workers: int = -1,
+                 start_method: str = None):
+        self.stages = {stage.name: stage for stage in stages}
+        self.context = pool_context(start_method)
+        self.data_hash = data_hash
+        self.state_path = state_path
+        self.workers = os.cpu_count() if workers == -1 else max(1, workers)
+        self.state = self._load_state()
+        self._keys = {}
+        for stage in stages:
+            unknown = [dep for dep in stage.inputs if dep not in self.stages]
+            if unknown:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stages {unknown}")
+            if stage.in_process and any(not self.stages[dep].in_process for dep in stage.inputs):
+                raise ValueError(f"In-process stage '{stage.name}' can only depend on in-process stages")
+
+    def _load_state(self) -> dict:
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def key(self, name: str) -> str:
+        if name not in self._keys:
+            stage = self.stages[name]
+            payload = json.dumps({
+                'data': self.data_hash,
+                'code': stage.code_hash(),
+                'params': stage.params,
+                'files': stage.file_stamps(),
+                'inputs': [self.key(dep) for dep in stage.inputs],
+            }, sort_keys=True, default=str)
+            self._keys[name] = hashlib.md5(payload.encode()).hexdigest()
+        return self._keys[name]
+
+    def is_fresh(self, name: str) -> bool:
+        stage = self.stages[name]
+        return (self.state.get(name, {}).get('key') == self.key(name)
+                and all(os.path.exists(path) for path in stage.outputs))
+
+    def _closure(self, names: list) -> list:
+        """The given stages plus everything upstream, in dependency order."""
+        ordered, seen = [], set()
+
+        def visit(name):
+            if name in seen:
+                return
+            seen.add(name)
+            for dep in self.stages[name].inputs:
+                visit(dep)
+            ordered.append(name)
+
+        for name in names:
+            visit(name)
+        return ordered
+
+    def run(self, targets: list = None, force: bool = False) -> dict:
+        """
+        Brings the target stages (default: all) up to date.
+        force=True reruns them even when cached. Returns {stage: 'ran' | 'cached' | 'failed'}.
+        """
+        targets = targets or [name for name, stage in self.stages.items() if not stage.in_process]
+        order = self._closure(targets)
+        stale = [name for name in order if not self.stages[name].in_process
+                 and (force and name in targets or not self.is_fresh(name))]
+        status = {name: 'cached' for name in order if not self.stages[name].in_process and name not in stale}
+        for name in status:
+            logger.info(f"⏭️ {name}: up to date, skipped")
+        if not stale:
+            return status
+
+        # In-process stages run once, and only if a stale stage needs them
+        _stages.clear()
+        _stages.update(self.stages)
+        _results.clear()
+        needed = self._closure(stale)
+        for name in needed:
+            stage = self.stages[name]
+            if stage.in_process:
+                start = time.perf_counter()
+                _results[name] = stage.func({dep: _results[dep] for dep in stage.inputs}, **stage.params)
+                logger.info(f"✅ {name}: done in {time.perf_counter() - start:.1f}s")
+
+        pending = [name for name in needed if name in stale]
+        running = {}
+        failed = set()
+        # fork: workers inherit the in-process results instead of receiving pickled copies
+        forked = self.context.get_start_method() == 'fork'
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)), mp_context=self.context) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.stages[name].inputs
+                    if any(dep in failed for dep in deps):
+                        pending.remove(name)
+                        failed.add(name)
+                        status[name] = 'failed'
+                        logger.error(f"❌ {name}: skipped, an upstream stage failed")
+                    elif not any(dep in pending or dep in running.values() for dep in deps):
+                        pending.remove(name)
+                        logger.info(f"▶️ {name}: running (output in {STAGE_LOG_DIR}/{name}.log)")
+                        if forked:
+                            running[pool.submit(_run_stage, name)] = name
+                        else:
+                            closure = {dep: self.stages[dep] for dep in self._closure([name])}
+                            running[pool.submit(_run_spawned_stage, name, closure)] = name
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        seconds = future.result()
+                    except Exception as e:
+                        failed.add(name)
+                        status[name] = 'failed'
+                        logger.error(f"❌ {name}: failed: {e}")
+                        continue
+                    self.state[name] = {'key': self.key(name), 'seconds': round(seconds, 2),
+                                        'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')}
+                    self._save_state()
+                    status[name] = 'ran'
+                    logger.info(f"✅ {name}: done in {seconds:.1f}s")
+
+        if failed:
+            logger.error(f"Pipeline finished with failed stages: {sorted(failed)}")
+        return status
+
+
+def print_plan(runner: PipelineRunner, targets: list = None, out=sys.stdout):
+    """Lists each stage with its inputs and whether it would be skipped."""
+    targets = targets or [name for name, stage in runner.stages.items() if not stage.in_process]
+    for name in runner._closure(targets):
+        stage = runner.stages[name]
+        state = 'in-process' if stage.in_process else ('cached' if runner.is_fresh(name) else 'stale')
+        print(f"{name:<12}{state:<12}inputs={stage.inputs} outputs={stage.outputs}", file=out)
@@ -0,0 +1,256 @@
+import argparse
+import os
+import re
+import time
+import numpy as np
+import pandas as pd
+from src.aggregation import map_chunks
+from src.artifacts import load_model
+from src.features import MODEL_PATH
+from src.loader import CHUNK_BYTES, DataLoader
+from src.out_of_core import FREQUENCY_MODEL_PATH, predict_frequency
+from src.scoring import model_frame
+from src.utils import get_logger, instrument
+
+logger = get_logger('Repricing')
+
+OUTPUT_DIR = 'results/repricing'
+GROUP_COLUMNS = ['Province', 'PostalCode']
+MISSING_LABEL = '(missing)'
+
+# Loading: expense/profit margin on top of the expected loss.
+# Cap: largest relative move away from the current premium (None = uncapped).
+DEFAULT_LOADINGS = [0.0, 0.1, 0.2, 0.3]
+DEFAULT_CAPS = [None, 0.25, 0.1]
+
+# Policy x scenario premiums held at once (float64), independent of the chunk size
+BLOCK_CELLS = 4_000_000
+
+
+def scenario_grid(loadings: list = None, caps: list = None) -> pd.DataFrame:
+    """Every (loading, cap) combination; cap is NaN for an uncapped scenario."""
+    loadings = DEFAULT_LOADINGS if loadings is None else loadings
+    caps = DEFAULT_CAPS if caps is None else caps
+    grid = pd.MultiIndex.from_product([loadings, [np.nan if cap is None else cap for cap in caps]],
+                                      names=['loading', 'cap']).to_frame(index=False)
+    grid.index.name = 'scenario'
+    return grid
+
+
+def price_policies(expected_loss: np.ndarray, current: np.ndarray, loadings: np.ndarray,
+                   caps: np.ndarray) -> np.ndarray:
+    """
+    New premium of every policy under every scenario, in one broadcast: the
+    expected loss times (1 + loading), clipped to within `cap` of the current
+    premium. Under a cap a policy without a positive current premium stays
+    within `cap` of it too (a zero premium stays zero), so the book-level change
+    is bounded by the cap. Returns a (policies, scenarios) array.
+    """
+    target = expected_loss[:, None] * (1 + loadings)
+    low = current[:, None] * (1 - np.nan_to_num(caps))
+    high = current[:, None] * (1 + np.nan_to_num(caps))
+    capped = np.clip(target, np.minimum(low, high), np.maximum(low, high))
+    return np.where(np.isnan(caps), target, capped)
+
+
+def _group_sums(codes: np.ndarray, weights: np.ndarray, n_groups: int) -> np.ndarray:
+    """Per-group sums of a (rows,) or (rows, scenarios) array with one bincount."""
+    if weights.ndim == 1:
+        return np.bincount(codes, weights=weights, minlength=n_groups)
+    n_scenarios = weights.shape[1]
+    flat = (codes[:, None] * n_scenarios + np.arange(n_scenarios)).ravel()
+    return np.bincount(flat, weights=weights.ravel(),
+                       minlength=n_groups * n_scenarios).reshape(n_groups, n_scenarios)
+
+
+class RepricingAccumulator:
+    """
+    Book totals per scenario and per group of each GROUP_COLUMNS column, built one
+    chunk at a time. Group labels get integer codes as they first appear, so every
+    total is an np.bincount over those codes and memory depends on the number of
+    groups and scenarios, not on the number of policies.
+    """
+
+    # unpriced: policies without a positive current premium, held at it under a cap
+    MEASURES = ['policies', 'unpriced', 'claims', 'expected_loss', 'current_premium']
+
+    def __init__(self, scenarios: pd.DataFrame, by: list = None):
+        self.scenarios = scenarios
+        self.by = list(GROUP_COLUMNS if by is None else by)
+        self.rows = 0
+        self.labels = {col: pd.Index([], dtype=object) for col in self.by}
+        self.sums = {col: self._empty(0) for col in self.by}
+
+    def _empty(self, n_groups: int) -> dict:
+        sums = {name: np.zeros(n_groups) for name in self.MEASURES}
+        sums['premium'] = np.zeros((n_groups, len(self.scenarios)))
+        return sums
+
+    def codes(self, col: str, values: pd.Series) -> np.ndarray:
+        """Integer group code per row; labels not seen before are appended (and their totals start at 0)."""
+        values = values.astype(object).where(values.notna(), MISSING_LABEL)
+        values = pd.Categorical(values)
+        categories = values.categories
+        new = categories[self.labels[col].get_indexer(categories) < 0]
+        if len(new):
+            self.labels[col] = self.labels[col].append(pd.Index(new, dtype=object))
+            self.sums[col] = {name: np.concatenate([total, np.zeros((len(new),) + total.shape[1:])])
+                              for name, total in self.sums[col].items()}
+        return self.labels[col].get_indexer(categories)[values.codes]
+
+    def update(self, df: pd.DataFrame, expected_loss: np.ndarray, premiums: np.ndarray):
+        """Folds in a block of policies: their expected loss and (policies, scenarios) new premiums."""
+        current = df['TotalPremium'].fillna(0).to_numpy('float64')
+        measures = {
+            'policies': np.ones(len(df)),
+            'unpriced': (current <= 0).astype('float64'),
+            'claims': df['TotalClaims'].fillna(0).to_numpy('float64'),
+            'expected_loss': expected_loss,
+            'current_premium': current,
+            'premium': premiums,
+        }
+        for col in self.by:
+            codes = self.codes(col, df[col])
+            n_groups = len(self.labels[col])
+            for name, weights in measures.items():
+                self.sums[col][name] += _group_sums(codes, weights, n_groups)
+        self.rows += len(df)
+        return self
+
+    def table(self, col: str = None) -> pd.DataFrame:
+        """
+        One row per (group, scenario) with the totals, the repriced loss ratio
+        (actual claims / new premium) and margin (new premium - claims) next to
+        the current ones. col=None gives the whole book per scenario.
+        """
+        if col is None:
+            sums = {name: total.sum(axis=0, keepdims=True) for name, total in self.sums[self.by[0]].items()}
+            labels = pd.Index(['All'], name='book')
+        else:
+            sums, labels = self.sums[col], self.labels[col].rename(col)
+
+        n_groups, n_scenarios = sums['premium'].shape
+        index = pd.MultiIndex.from_product([labels, self.scenarios.index])
+        table = pd.DataFrame({name: np.repeat(sums[name], n_scenarios) for name in self.MEASURES}, index=index)
+        table[['policies', 'unpriced']] = table[['policies', 'unpriced']].astype('int64')
+        table['premium'] = sums['premium'].ravel()
+        table = table.join(self.scenarios, on='scenario')
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            table['current_loss_ratio'] = table['claims'] / table['current_premium']
+            table['loss_ratio'] = table['claims'] / table['premium']
+            table['premium_change'] = table['premium'] / table['current_premium'] - 1
+        table['current_margin'] = table['current_premium'] - table['claims']
+        table['margin'] = table['premium'] - table['claims']
+        return table[['loading', 'cap', 'policies', 'unpriced', 'claims', 'expected_loss', 'current_premium',
+                      'current_loss_ratio', 'current_margin', 'premium', 'premium_change', 'loss_ratio', 'margin']]
+
+
+def _claim_counts(df):
+    claims = df['TotalClaims'].fillna(0).to_numpy()
+    return len(claims), int(np.count_nonzero(claims > 0))
+
+
+def book_claim_rate(filepath: str, workers: int = -1) -> float:
+    """Share of policies with a claim, from a pass over TotalClaims only."""
+    rows = claim_rows = 0
+    for n, k in map_chunks(filepath, _claim_counts, ['TotalClaims'], workers):
+        rows, claim_rows = rows + n, claim_rows + k
+    return claim_rows / max(rows, 1)
+
+
+@instrument('reprice', rows=lambda accumulator, *args, **kwargs: accumulator.rows)
+def reprice(filepath: str, scenarios: pd.DataFrame = None, severity_path: str = MODEL_PATH,
+            frequency_path: str = FREQUENCY_MODEL_PATH, claim_rate: float = None,
+            chunk_bytes: int = CHUNK_BYTES, workers: int = -1) -> RepricingAccumulator:
+    """
+    Reprices the whole book with the saved models in bounded memory.
+
+    Each chunk is scored once: expected loss = claim probability x predicted
+    claim amount (the severity model, by default the best modeling.py pipeline,
+    clipped at 0). The claim probability comes from the frequency model when it
+    exists (see out_of_core.py), otherwise from claim_rate or the book's observed
+    claim rate. Every scenario is then priced in the same pass (price_policies on
+    blocks of at most BLOCK_CELLS premiums) and folded into the group totals.
+    """
+    scenarios = scenario_grid() if scenarios is None else scenarios
+    severity, severity_meta = load_model(severity_path)
+    frequency = frequency_meta = None
+    if frequency_path and os.path.exists(frequency_path):
+        frequency, frequency_meta = load_model(frequency_path)
+        logger.info(f"Claim probability: {frequency_meta['model_name']} ({frequency_path})")
+    else:
+        if claim_rate is None:
+            claim_rate = book_claim_rate(filepath, workers)
+        logger.info(f"Claim probability: flat book claim rate {claim_rate:.4%} (no frequency model)")
+    logger.info(f"Claim amount: {severity_meta['model_name']} ({severity_path}); "
+                f"repricing {len(scenarios)} scenarios")
+
+    features = [severity_meta] + ([frequency_meta] if frequency_meta else [])
+    columns = list(dict.fromkeys(GROUP_COLUMNS + ['TotalPremium', 'TotalClaims'] + [
+        col for meta in features for col in meta['numeric_features'] + meta['categorical_features']]))
+    loadings = scenarios['loading'].to_numpy('float64')
+    caps = scenarios['cap'].to_numpy('float64')
+    block_rows = max(1, BLOCK_CELLS // len(scenarios))
+
+    accumulator = RepricingAccumulator(scenarios)
+    loader = DataLoader(filepath)
+    start = time.perf_counter()
+    for chunk in loader.iter_chunks(columns, chunk_bytes):
+        if len(chunk) == 0:
+            continue
+        expected_loss = np.clip(severity.predict(model_frame(chunk, severity_meta)), 0, None)
+        if frequency is not None:
+            expected_loss = expected_loss * predict_frequency(frequency, model_frame(chunk, frequency_meta))
+        else:
+            expected_loss = expected_loss * claim_rate
+        current = chunk['TotalPremium'].fillna(0).to_numpy('float64')
+
+        for block in range(0, len(chunk), block_rows):
+            rows = slice(block, block + block_rows)
+            premiums = price_policies(expected_loss[rows], current[rows], loadings, caps)
+            accumulator.update(chunk.iloc[rows], expected_loss[rows], premiums)
+
+        elapsed = time.perf_counter() - start
+        logger.info(f"Repriced {accumulator.rows:,} policies ({accumulator.rows / elapsed:,.0f} rows/sec)")
+
+    if loader.rejected_rows:
+        logger.warning(f"⚠️ {loader.rejected_rows} malformed input rows were not repriced")
+    return accumulator
+
+
+def save_tables(accumulator: RepricingAccumulator, output_dir: str = OUTPUT_DIR) -> dict:
+    """Writes the book and per-group tables as CSV; returns {name: path}."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {}
+    for name, col in [('scenarios', None)] + [(re.sub(r'(?<!^)(?=[A-Z])', '_', col).lower(), col)
+                                             for col in accumulator.by]:
+        paths[name] = os.path.join(output_dir, f"{name}.csv")
+        accumulator.table(col).to_csv(paths[name])
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reprice the policy book under many loading / cap scenarios.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--loadings', type=float, nargs='+', default=DEFAULT_LOADINGS,
+                        help="expected-loss loadings, e.g. 0 0.1 0.2")
+    parser.add_argument('--caps', nargs='+', default=[str(cap).lower() for cap in DEFAULT_CAPS],
+                        help="largest relative premium change per policy, or 'none'")
+    parser.add_argument('--severity-model', default=MODEL_PATH)
+    parser.add_argument('--frequency-model', default=FREQUENCY_MODEL_PATH,
+                        help="claim probability model (falls back to the book claim rate when missing)")
+    parser.add_argument('--claim-rate', type=float, default=None, help="flat claim probability to use instead")
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024),
+                        help="CSV megabytes parsed and scored per batch")
+    parser.add_argument('--workers', type=int, default=-1, help="processes for the claim rate pass (-1 = all cores)")
+    parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    args = parser.parse_args()
+
+    caps = [None if cap.lower() == 'none' else float(cap) for cap in args.caps]
+    frequency_path = None if args.claim_rate is not None else args.frequency_model
+    result = reprice(args.data, scenario_grid(args.loadings, caps), args.severity_model, frequency_path,
+                     args.claim_rate, args.chunk_mb * 1024 * 1024, args.workers)
+    paths = save_tables(result, args.output_dir)
+    print(result.table().droplevel('book').to_string(float_format=lambda v: f"{v:,.3f}"))
+    logger.info(f"✅ Repricing tables saved to {args.output_dir} ({', '.join(paths)})")
@@ -0,0 +1,132 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy import stats
+from src.utils import get_logger
+
+logger = get_logger('Resampling')
+
+# Elements (permutations x rows) shuffled at once; bounds a batch to ~200 MB of scratch
+BATCH_ELEMENTS = 8_000_000
+PERMUTATIONS_PER_TASK = 250
+
+# Shared with pool workers once through the initializer instead of once per task
+_codes = None
+_values = None
+
+
+def _init_worker(codes, values):
+    global _codes, _values
+    _codes, _values = codes, values
+
+
+def _group_stats(sums, counts, mean):
+    """Between-group sum of squares (global) and |group sum - expected| (per group)."""
+    between = (sums ** 2 / counts).sum(axis=-1)
+    deviation = np.abs(sums - counts * mean)
+    return between, deviation
+
+
+def _count_exceedances(seed, n_permutations, n_groups, observed_between, observed_deviation):
+    """
+    Worker: runs `n_permutations` label permutations in batches and counts how
+    often each permuted statistic reaches the observed one.
+    """
+    codes, values = _codes, _values
+    rng = np.random.default_rng(seed)
+    n = len(values)
+    counts = np.bincount(codes, minlength=n_groups).astype('float64')
+    mean = values.mean()
+    batch_size = max(1, BATCH_ELEMENTS // n)
+
+    # Relative tolerance so ties are not lost to floating-point noise
+    between_bar = observed_between * (1 - 1e-12)
+    deviation_bar = observed_deviation * (1 - 1e-12)
+
+    global_hits = 0
+    group_hits = np.zeros(n_groups, dtype='int64')
+    done = 0
+    while done < n_permutations:
+        batch = min(batch_size, n_permutations - done)
+        shuffled = rng.permuted(np.broadcast_to(values, (batch, n)), axis=1)
+        # One bincount for the whole batch: permutation b owns bins [b*k, (b+1)*k)
+        offsets = (np.arange(batch, dtype='int64') * n_groups)[:, None]
+        sums = np.bincount((codes + offsets).ravel(), weights=shuffled.ravel(),
+                           minlength=batch * n_groups).reshape(batch, n_groups)
+
+        between, deviation = _group_stats(sums, counts, mean)
+        global_hits += int((between >= between_bar).sum())
+        group_hits += (deviation >= deviation_bar).sum(axis=0)
+        done += batch
+
+    return global_hits, group_hits
+
+
+def permutation_test(codes, values, n_permutations: int = 10000, workers: int = -1, seed: int = 42) -> dict:
+    """
+    Label-permutation test of whether `values` differ across integer-coded groups.
+
+    codes: integer group code per row (negative codes, e.g. missing categories, are dropped)
+    values: per-row value, e.g. a 0/1 claim flag or the margin
+
+    The global statistic is the between-group sum of squares (monotone in both the
+    chi-square statistic for a 0/1 value and the ANOVA F), so no distributional
+    assumption is needed. Each group is also tested against the pooled mean.
+    Work is split into fixed-size tasks seeded from one SeedSequence, so results
+    depend on `seed` only, not on the number of workers.
+    Returns {'groups', 'p_value', 'group_p_values', 'n_permutations'}, where
+    group_p_values[i] belongs to the code groups[i].
+    """
+    codes = np.asarray(codes)
+    values = np.asarray(values, dtype='float64')
+    keep = codes >= 0
+    # Re-index to the groups actually present so every bin has rows
+    groups, codes = np.unique(codes[keep], return_inverse=True)
+    codes, values = codes.astype('int64'), values[keep]
+    n_groups = len(groups)
+
+    counts = np.bincount(codes, minlength=n_groups).astype('float64')
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    observed_between, observed_deviation = _group_stats(sums, counts, values.mean())
+
+    n_tasks = -(-n_permutations // PERMUTATIONS_PER_TASK)
+    sizes = [min(PERMUTATIONS_PER_TASK, n_permutations - i * PERMUTATIONS_PER_TASK) for i in range(n_tasks)]
+    seeds = np.random.SeedSequence(seed).spawn(n_tasks)
+    workers = os.cpu_count() if workers == -1 else max(1, workers)
+
+    logger.info(f"Permutation test: {len(values)} rows, {n_groups} groups, "
+                f"{n_permutations} permutations on {workers} workers")
+    if workers == 1:
+        _init_worker(codes, values)
+        results = [_count_exceedances(s, size, n_groups, observed_between, observed_deviation)
+                   for s, size in zip(seeds, sizes)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(codes, values)) as pool:
+            results = list(pool.map(_count_exceedances, seeds, sizes, [n_groups] * n_tasks,
+                                    [observed_between] * n_tasks, [observed_deviation] * n_tasks))
+
+    global_hits = sum(hits for hits, _ in results)
+    group_hits = sum(hits for _, hits in results)
+    return {
+        'groups': groups,
+        'p_value': (1 + global_hits) / (1 + n_permutations),
+        'group_p_values': (1 + group_hits) / (1 + n_permutations),
+        'n_permutations': n_permutations,
+    }
+
+
+def holm(p_values) -> np.ndarray:
+    """Holm step-down adjusted p-values (family-wise error rate)."""
+    p_values = np.asarray(p_values, dtype='float64')
+    m = len(p_values)
+    order = np.argsort(p_values)
+    adjusted = np.maximum.accumulate((m - np.arange(m)) * p_values[order])
+    result = np.empty(m)
+    result[order] = np.minimum(adjusted, 1.0)
+    return result
+
+
+def fdr_bh(p_values) -> np.ndarray:
+    """Benjamini-Hochberg adjusted p-values (false discovery rate)."""
+    return stats.false_discovery_control(np.asarray(p_values, dtype='float64'), method='bh')
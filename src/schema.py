@@ -0,0 +1,109 @@
+import pandas as pd
+
+# Bump whenever a declaration below changes so cached Parquet copies are rebuilt.
+SCHEMA_VERSION = 3
+
+# Low-cardinality strings: stored as pandas categoricals (one small int code per row)
+CATEGORICAL_COLUMNS = [
+    'IsVATRegistered', 'Citizenship', 'LegalType', 'Title', 'Language', 'Bank',
+    'AccountType', 'MaritalStatus', 'Gender', 'Country', 'Province', 'PostalCode',
+    'MainCrestaZone', 'SubCrestaZone', 'ItemType', 'VehicleType', 'make', 'Model',
+    'Bodytype', 'VehicleIntroDate', 'AlarmImmobiliser', 'TrackingDevice', 'NewVehicle',
+    'WrittenOff', 'Rebuilt', 'Converted', 'CrossBorder', 'TermFrequency', 'ExcessSelected',
+    'CoverCategory', 'CoverType', 'CoverGroup', 'Section', 'Product', 'StatutoryClass',
+    'StatutoryRiskType',
+]
+
+# Numerics with their downcast target.
+# Money that gets summed (loss ratios, margins) stays float64; features fit in float32.
+# mmcode is an 8-digit code, which float32 cannot represent exactly.
+NUMERIC_COLUMNS = {
+    'UnderwrittenCoverID': 'int32',
+    'PolicyID': 'int32',
+    'mmcode': 'float64',
+    'RegistrationYear': 'float32',
+    'Cylinders': 'float32',
+    'cubiccapacity': 'float32',
+    'kilowatts': 'float32',
+    'NumberOfDoors': 'float32',
+    'CustomValueEstimate': 'float32',
+    'CapitalOutstanding': 'float32',
+    'NumberOfVehiclesInFleet': 'float32',
+    'SumInsured': 'float32',
+    'CalculatedPremiumPerTerm': 'float32',
+    'TotalPremium': 'float64',
+    'TotalClaims': 'float64',
+}
+
+DATE_COLUMNS = ['TransactionMonth']
+
+# A row is rejected when any of these is present but unparseable.
+# Other numerics are coerced to NaN and only reported.
+STRICT_COLUMNS = ['TotalPremium', 'TotalClaims', 'TransactionMonth']
+
+
+def csv_dtypes(columns) -> dict:
+    """
+    dtype mapping for pd.read_csv.
+    Dates are read as categories so each distinct month string is parsed only once.
+    Undeclared columns are read as categories too, so their dtype never depends on
+    which rows a parser happened to see (serial and byte-range parses must agree).
+    """
+    dtypes = {}
+    for col in columns:
+        if col not in NUMERIC_COLUMNS:
+            dtypes[col] = 'category'
+    return dtypes
+
+
+def apply_schema(df: pd.DataFrame):
+    """
+    Coerces a freshly parsed frame to the declared dtypes, in place.
+    Returns the frame without rejected rows, the number of rows rejected and
+    a {column: count} of lenient values that were coerced to NaN.
+    """
+    bad_rows = pd.Series(False, index=df.index)
+    coerced = {}
+
+    for col, dtype in NUMERIC_COLUMNS.items():
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        values = raw if pd.api.types.is_numeric_dtype(raw) else pd.to_numeric(raw, errors='coerce')
+        failed = raw.notna() & values.isna()
+
+        if failed.any():
+            if col in STRICT_COLUMNS:
+                bad_rows |= failed
+            else:
+                coerced[col] = int(failed.sum())
+
+        if pd.api.types.is_integer_dtype(dtype) and values.isna().any():
+            # Cannot downcast to a plain int with gaps; keep the nullable equivalent
+            dtype = dtype.capitalize()
+        df[col] = values.astype(dtype)
+
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col].astype('category')
+        parsed = pd.to_datetime(raw.cat.categories, errors='coerce')
+        values = pd.Series(parsed.take(raw.cat.codes.to_numpy(), allow_fill=True, fill_value=pd.NaT),
+                           index=df.index)
+        failed = raw.notna() & values.isna()
+
+        if col in STRICT_COLUMNS:
+            bad_rows |= failed
+        elif failed.any():
+            coerced[col] = int(failed.sum())
+        df[col] = values
+
+    rejected = int(bad_rows.sum())
+    if rejected:
+        df = df[~bad_rows].reset_index(drop=True)
+        # Rejected rows may have been the only carriers of some levels
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].cat.remove_unused_categories()
+
+    return df, rejected, coerced
@@ -0,0 +1,82 @@
+import argparse
+import os
+import time
+from functools import partial
+import pandas as pd
+from src.artifacts import load_model
+from src.features import MODEL_PATH, cast_categoricals
+from src.loader import CHUNK_BYTES, DataLoader
+from src.utils import get_logger
+
+logger = get_logger('Scoring')
+
+ID_COLUMN = 'UnderwrittenCoverID'
+
+
+def model_frame(chunk: pd.DataFrame, metadata: dict) -> pd.DataFrame:
+    """Feeds a raw chunk to the model the way training did (see modeling.load_data / prepare_features)."""
+    numeric, categorical = metadata['numeric_features'], metadata['categorical_features']
+    X = pd.DataFrame(index=chunk.index)
+    for col in numeric:
+        X[col] = chunk[col].fillna(0) if col in chunk.columns else 0.0
+    for col in categorical:
+        X[col] = chunk[col] if col in chunk.columns else None
+    return cast_categoricals(X, categorical)
+
+
+def score_file(input_path: str, output_path: str, model_path: str = MODEL_PATH,
+               chunk_bytes: int = CHUNK_BYTES, id_column: str = ID_COLUMN) -> int:
+    """
+    Scores a policy file with the saved model in bounded memory: the input is
+    streamed in chunks, each chunk is predicted in one vectorized call and its
+    predictions are appended to output_path before the next chunk is read.
+    Returns the number of rows scored.
+    """
+    pipeline, metadata = load_model(model_path)
+    # Frequency artifacts (out_of_core.py) predict claim probabilities; the others claim amounts
+    target = metadata.get('target', 'severity')
+    if target == 'frequency':
+        from src.out_of_core import predict_frequency
+        predict, output_column = partial(predict_frequency, pipeline), 'PredictedClaimProbability'
+    else:
+        predict, output_column = pipeline.predict, 'PredictedClaims'
+    logger.info(f"Scoring {input_path} with {metadata['model_name']} ({target}, "
+                f"trained on data {metadata.get('data_fingerprint')})")
+
+    columns = [id_column] + metadata['numeric_features'] + metadata['categorical_features']
+    loader = DataLoader(input_path)
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+
+    rows = 0
+    start = time.perf_counter()
+    with open(output_path, 'w', newline='') as out:
+        for chunk in loader.iter_chunks(columns, chunk_bytes):
+            predictions = predict(model_frame(chunk, metadata))
+
+            result = pd.DataFrame({output_column: predictions}, index=chunk.index)
+            if id_column in chunk.columns:
+                result.insert(0, id_column, chunk[id_column].to_numpy())
+            result.to_csv(out, header=(rows == 0), index=False)
+
+            rows += len(chunk)
+            elapsed = time.perf_counter() - start
+            logger.info(f"Scored {rows:,} rows ({rows / elapsed:,.0f} rows/sec)")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"✅ Scored {rows:,} rows in {elapsed:.1f}s "
+                f"({rows / max(elapsed, 1e-9):,.0f} rows/sec) -> {output_path}")
+    if loader.rejected_rows:
+        logger.warning(f"⚠️ {loader.rejected_rows} malformed input rows were not scored")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-score a policy CSV with the saved model.")
+    parser.add_argument('input', help="policy CSV (same layout as data/insurance_claims.csv)")
+    parser.add_argument('--output', default='results/predictions.csv')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--chunk-mb', type=int, default=CHUNK_BYTES // (1024 * 1024),
+                        help="CSV megabytes parsed and scored per batch")
+    args = parser.parse_args()
+
+    score_file(args.input, args.output, args.model, args.chunk_mb * 1024 * 1024)
@@ -0,0 +1,135 @@
+import math
+import numpy as np
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a relative-error guarantee (DDSketch-style).
+    Values are counted in logarithmic buckets, so any quantile is returned within
+    `relative_accuracy` of the true value and memory depends on the value range,
+    not on how many values were seen. Sketches built on separate chunks or
+    workers merge into exactly the sketch of the combined data.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        """Adds an array of values (NaNs are ignored)."""
+        values = np.asarray(values, dtype='float64')
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        self.count += int(values.size)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        positive = values[values > 0]
+        negative = -values[values < 0]
+        self.zero_count += int(values.size - positive.size - negative.size)
+        self._add(self.positive, positive)
+        self._add(self.negative, negative)
+        return self
+
+    def merge(self, other: 'QuantileSketch'):
+        """Folds another sketch with the same accuracy into this one."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy.")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Approximate q-quantile (0 <= q <= 1); NaN for an empty sketch."""
+        if self.count == 0:
+            return math.nan
+
+        rank = q * (self.count - 1)
+        seen = 0
+        # Walk from the most negative value upwards
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return self._clamp(-self._bucket_value(key))
+        seen += self.zero_count
+        if seen > rank:
+            return self._clamp(0.0)
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._clamp(self._bucket_value(key))
+        return self.max
+
+    def cdf(self, values) -> np.ndarray:
+        """
+        Approximate mid-rank CDF of each value, in [0, 1]: the share of sketched
+        values below its bucket plus half of its bucket, so values that share a
+        bucket (e.g. all the zeros) share a rank. NaN stays NaN.
+        """
+        values = np.asarray(values, dtype='float64')
+        result = np.full(values.shape, np.nan)
+        if self.count == 0:
+            return result
+
+        bucket_order = np.concatenate([
+            self._order_keys(-np.ones(len(self.negative)), np.fromiter(self.negative, np.int64, len(self.negative))),
+            self._order_keys(np.zeros(1), np.zeros(1, dtype=np.int64)),
+            self._order_keys(np.ones(len(self.positive)), np.fromiter(self.positive, np.int64, len(self.positive))),
+        ])
+        bucket_counts = np.concatenate([np.fromiter(self.negative.values(), np.float64, len(self.negative)),
+                                        [self.zero_count],
+                                        np.fromiter(self.positive.values(), np.float64, len(self.positive))])
+        order = np.argsort(bucket_order)
+        bucket_order, bucket_counts = bucket_order[order], bucket_counts[order]
+        below = np.cumsum(bucket_counts) - bucket_counts
+
+        present = ~np.isnan(values)
+        x = values[present]
+        signs = np.sign(x)
+        magnitudes = np.where(x == 0, 1.0, np.abs(x))
+        keys = np.where(x == 0, 0, np.ceil(np.log(magnitudes) / self._log_gamma)).astype(np.int64)
+        value_order = self._order_keys(signs, keys)
+
+        idx = np.searchsorted(bucket_order, value_order)
+        matched = np.zeros(x.shape, dtype=bool)
+        in_range = idx < len(bucket_order)
+        matched[in_range] = bucket_order[idx[in_range]] == value_order[in_range]
+        clipped = np.minimum(idx, len(bucket_order) - 1)
+        rank = np.where(in_range, below[clipped], self.count) + np.where(matched, bucket_counts[clipped] / 2, 0.0)
+        result[present] = rank / self.count
+        return result
+
+    @staticmethod
+    def _order_keys(signs: np.ndarray, keys: np.ndarray) -> np.ndarray:
+        """One sortable integer per (sign, bucket key): negatives by falling magnitude, then zero, then positives."""
+        signs = np.asarray(signs, dtype=np.int64)
+        return (signs + 1) * 2 ** 40 + np.where(signs < 0, -keys, keys)
+
+    def _add(self, store: dict, magnitudes: np.ndarray):
+        if magnitudes.size == 0:
+            return
+        keys = np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64)
+        keys, counts = np.unique(keys, return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def _bucket_value(self, key: int) -> float:
+        # Midpoint (in relative terms) of the bucket (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _clamp(self, value: float) -> float:
+        return min(max(value, self.min), self.max)
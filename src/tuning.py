@@ -0,0 +1,201 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import ParameterSampler
+from threadpoolctl import threadpool_limits
+from xgboost import XGBRegressor
+from src.utils import get_logger
+
+logger = get_logger('Tuning')
+
+LEADERBOARD_PATH = 'results/tuning_leaderboard.csv'
+
+# Candidate settings per tree model, sampled at random for the first rung
+SEARCH_SPACES = {
+    "Random Forest": {
+        'max_depth': [None, 8, 12, 16, 24],
+        'min_samples_leaf': [1, 2, 5, 10, 20],
+        'max_features': [1.0, 0.7, 0.5, 'sqrt'],
+    },
+    "XGBoost": {
+        'max_depth': [3, 4, 6, 8, 10],
+        'learning_rate': [0.02, 0.05, 0.1, 0.2],
+        'subsample': [0.6, 0.8, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+        'min_child_weight': [1, 5, 10, 20],
+    },
+}
+
+# Tree-count ceiling and patience for early stopping on the validation split
+MAX_TREES = {"Random Forest": 400, "XGBoost": 1000}
+FOREST_STEP = 25
+EARLY_STOPPING_ROUNDS = 30
+
+
+def _rows(X, index):
+    return X.iloc[index] if isinstance(X, pd.DataFrame) else X[index]
+
+
+def _rmse(y_true, y_pred):
+    return float(np.sqrt(mean_squared_error(y_true, y_pred)))
+
+
+def base_estimator(name, native_categorical=False):
+    if name == "Random Forest":
+        return RandomForestRegressor(random_state=42, n_jobs=1)
+    if name == "XGBoost":
+        return XGBRegressor(random_state=42, n_jobs=1, tree_method='hist',
+                            enable_categorical=native_categorical)
+    raise ValueError(f"No search space for {name!r}")
+
+
+def _fit_forest(model, X_fit, y_fit, X_val, y_val, max_trees):
+    """Grows the forest FOREST_STEP trees at a time; stops once validation RMSE stops improving."""
+    model.set_params(warm_start=True)
+    best_rmse, best_trees, stalls = np.inf, 0, 0
+    for n_trees in range(FOREST_STEP, max_trees + 1, FOREST_STEP):
+        model.set_params(n_estimators=n_trees)
+        model.fit(X_fit, y_fit)
+        rmse = _rmse(y_val, model.predict(X_val))
+        if rmse < best_rmse * (1 - 1e-4):
+            best_rmse, best_trees, stalls = rmse, n_trees, 0
+        else:
+            stalls += 1
+            if stalls * FOREST_STEP >= EARLY_STOPPING_ROUNDS:
+                break
+    return best_rmse, best_trees
+
+
+def _fit_booster(model, X_fit, y_fit, X_val, y_val, max_trees):
+    """Boosts up to max_trees rounds with early stopping on the validation split."""
+    model.set_params(n_estimators=max_trees, early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+    model.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+    return _rmse(y_val, model.predict(X_val)), int(model.best_iteration) + 1
+
+
+def run_trial(trial_id, name, params, native_categorical, X_train, y_train, fit_index, val_index):
+    """
+    Worker: fits one configuration on the rung's rows (fit_index) and scores it on
+    the fixed validation rows. Returns a leaderboard record.
+    """
+    model = base_estimator(name, native_categorical).set_params(**params)
+    X_fit, y_fit = _rows(X_train, fit_index), y_train[fit_index]
+    X_val, y_val = _rows(X_train, val_index), y_train[val_index]
+
+    start = time.perf_counter()
+    try:
+        with threadpool_limits(limits=1):
+            if name == "Random Forest":
+                rmse, n_trees = _fit_forest(model, X_fit, y_fit, X_val, y_val, MAX_TREES[name])
+            else:
+                rmse, n_trees = _fit_booster(model, X_fit, y_fit, X_val, y_val, MAX_TREES[name])
+    except Exception as e:
+        logger.warning(f"Trial {trial_id} ({name} {params}) failed: {e}")
+        rmse, n_trees = np.inf, 0
+    return {'trial': trial_id, 'model': name, 'rows': len(fit_index), 'val_rmse': rmse,
+            'n_estimators': n_trees, 'fit_seconds': time.perf_counter() - start, 'params': params}
+
+
+def successive_halving(name, matrices, y_train, budget_seconds, n_configs=27, eta=3,
+                       min_rows=2000, val_fraction=0.2, n_jobs=-1, native_categorical=False, seed=42):
+    """
+    Budgeted search for one tree model.
+
+    matrices: the preprocessed training matrix, transformed once and shared by
+    every trial (workers receive it as a read-only memory map, not a copy).
+    Rung 0 fits n_configs random configurations on min_rows rows; each later rung
+    keeps the best 1/eta on eta times as many rows, until one configuration is
+    left or the full training split is used. Rows come from one fixed
+    permutation, so each rung's sample contains the previous one, and every trial
+    is scored on the same held-out validation rows with early stopping on the
+    tree count. A rung is only started when its estimated cost (the previous
+    rung's wall time) still fits the remaining budget.
+    Returns (best record, or None when every trial failed; leaderboard DataFrame).
+    """
+    deadline = time.perf_counter() + budget_seconds
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(y_train))
+    n_val = max(1, int(len(order) * val_fraction))
+    val_index, pool = np.sort(order[:n_val]), order[n_val:]
+
+    configs = list(ParameterSampler(SEARCH_SPACES[name], n_iter=n_configs, random_state=seed))
+    trial_ids = list(range(len(configs)))
+    rows = min(min_rows, len(pool))
+    records, rung, last_rung_seconds = [], 0, 0.0
+
+    with Parallel(n_jobs=n_jobs, backend='loky', max_nbytes='1M', mmap_mode='r') as parallel:
+        while configs:
+            remaining = deadline - time.perf_counter()
+            if rung > 0 and last_rung_seconds > remaining:
+                logger.info(f"{name}: stopping before rung {rung} "
+                            f"(estimated {last_rung_seconds:.0f}s > {remaining:.0f}s left)")
+                break
+
+            fit_index = np.sort(pool[:rows])
+            logger.info(f"{name}: rung {rung}, {len(configs)} configs on {rows:,} rows")
+            rung_start = time.perf_counter()
+            results = parallel(delayed(run_trial)(trial_id, name, params, native_categorical,
+                                                  matrices, y_train, fit_index, val_index)
+                               for trial_id, params in zip(trial_ids, configs))
+            last_rung_seconds = time.perf_counter() - rung_start
+            for record in results:
+                record['rung'] = rung
+            records.extend(results)
+
+            if len(configs) == 1 or rows == len(pool):
+                break
+            ranked = sorted(results, key=lambda r: r['val_rmse'])[:max(1, len(configs) // eta)]
+            trial_ids, configs = [r['trial'] for r in ranked], [r['params'] for r in ranked]
+            rows = min(rows * eta, len(pool))
+            rung += 1
+
+    leaderboard = pd.DataFrame(records).sort_values(['rung', 'val_rmse'], ascending=[False, True])
+    # Failed trials score inf; when every trial failed there is no best config
+    finite = leaderboard[np.isfinite(leaderboard['val_rmse'])]
+    best = finite.iloc[0].to_dict() if len(finite) else None
+    return best, leaderboard
+
+
+def log_leaderboard(leaderboard: pd.DataFrame, top: int = 10):
+    lines = [f"{'Model':<15}{'Trial':>6}{'Rung':>5}{'Rows':>10}{'Trees':>7}{'Val RMSE':>14}{'Fit (s)':>9}  Params"]
+    for record in leaderboard.head(top).to_dict('records'):
+        lines.append(f"{record['model']:<15}{record['trial']:>6}{record['rung']:>5}{record['rows']:>10,}"
+                     f"{record['n_estimators']:>7}{record['val_rmse']:>14,.2f}{record['fit_seconds']:>9.2f}"
+                     f"  {record['params']}")
+    logger.info("Leaderboard:\n" + "\n".join(lines))
+
+
+def tune_models(names, matrices, model_inputs, y_train, budget_seconds, n_jobs=-1,
+                native_categorical=False, output_path=LEADERBOARD_PATH, **search_options):
+    """
+    Splits the wall-clock budget evenly across the tree models and runs
+    successive_halving for each on its own feature set.
+    Returns {model name: tuned parameters} (n_estimators set to the
+    early-stopped tree count); the full leaderboard is logged and written to
+    output_path (None to skip).
+    """
+    tuned, boards = {}, []
+    deadline = time.perf_counter() + budget_seconds
+    for i, name in enumerate(names):
+        share = (deadline - time.perf_counter()) / (len(names) - i)
+        best, leaderboard = successive_halving(name, matrices[model_inputs[name]], y_train, share,
+                                               n_jobs=n_jobs, native_categorical=native_categorical,
+                                               **search_options)
+        boards.append(leaderboard)
+        if best is None:
+            logger.warning(f"⚠️ {name}: every trial failed; keeping the default settings")
+            continue
+        tuned[name] = {**best['params'], 'n_estimators': max(1, int(best['n_estimators']))}
+        logger.info(f"{name}: best trial {best['trial']} (val RMSE {best['val_rmse']:,.2f}) -> {tuned[name]}")
+
+    leaderboard = pd.concat(boards, ignore_index=True)
+    log_leaderboard(leaderboard.sort_values(['rung', 'val_rmse'], ascending=[False, True]))
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        leaderboard.to_csv(output_path, index=False)
+        logger.info(f"Leaderboard written to {output_path}")
+    return tuned
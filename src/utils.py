@@ -1,5 +1,16 @@
+import cProfile
+import functools
+import io
+import json
 import logging
 import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import psutil
 
 def get_logger(name: str, log_file: str = 'logs/app.log'):
     """
@@ -27,4 +38,149 @@ def get_logger(name: str, log_file: str = 'logs/app.log'):
         logger.addHandler(file_handler)
         logger.addHandler(console_handler)
 
-    return logger
\ No newline at end of file
+    return logger
+
+
+# --- Stage instrumentation ---
+
+# One JSON record per stage run, next to logs/app.log
+METRICS_FILE = 'logs/metrics.jsonl'
+# Comma-separated stage names to run under cProfile (e.g. STAGE_PROFILE=modeling,load)
+PROFILE_ENV = 'STAGE_PROFILE'
+# Set to 1 to also record the tracemalloc peak (Python + NumPy allocations; slows the stage down)
+TRACEMALLOC_ENV = 'STAGE_TRACEMALLOC'
+RSS_SAMPLE_SECONDS = 0.05
+
+
+class _RSSSampler(threading.Thread):
+    """Polls this process's resident memory to find the peak while a stage runs."""
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        super().__init__(daemon=True)
+        self.process = psutil.Process()
+        self.interval = interval
+        self.start_rss = self.peak_rss = self.process.memory_info().rss
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+
+class StageMetrics:
+    """What track_stage records; set `rows` inside the block to get rows/sec."""
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.rows = None
+        # Any additional JSON-serialisable fields for the record
+        self.extra = {}
+
+
+def _profiled_stages() -> set:
+    return {name.strip() for name in os.environ.get(PROFILE_ENV, '').split(',') if name.strip()}
+
+
+@contextmanager
+def track_stage(stage: str, rows: int = None, profile: bool = None, trace_memory: bool = None,
+                metrics_file: str = METRICS_FILE):
+    """
+    Measures a pipeline stage and appends one JSON record to metrics_file:
+    wall and CPU seconds (CPU includes reaped child processes), peak and delta
+    RSS (sampled every 50 ms), the tracemalloc peak when trace_memory is on,
+    and rows/sec when the row count is known.
+
+        with track_stage('load') as metrics:
+            df = loader.load_data()
+            metrics.rows = len(df)
+
+    profile=True (or the stage named in STAGE_PROFILE) runs the block under
+    cProfile, saves logs/profile-<stage>.prof and logs the top functions.
+    """
+    logger = get_logger('Metrics')
+    metrics = StageMetrics(stage)
+    metrics.rows = rows
+    profile = stage in _profiled_stages() if profile is None else profile
+    trace_memory = os.environ.get(TRACEMALLOC_ENV) == '1' if trace_memory is None else trace_memory
+
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    elif trace_memory:
+        tracemalloc.reset_peak()
+    sampler = _RSSSampler()
+    sampler.start()
+    profiler = cProfile.Profile() if profile else None
+    times_start = os.times()
+    wall_start = time.perf_counter()
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    status = 'ok'
+    try:
+        if profiler:
+            profiler.enable()
+        yield metrics
+    except BaseException:
+        status = 'error'
+        raise
+    finally:
+        if profiler:
+            profiler.disable()
+        wall = time.perf_counter() - wall_start
+        times_end = os.times()
+        sampler.stop()
+
+        record = {
+            'stage': stage,
+            'status': status,
+            'started_at': started_at,
+            'pid': os.getpid(),
+            'wall_s': round(wall, 4),
+            'cpu_s': round(sum(times_end[:4]) - sum(times_start[:4]), 4),
+            'rss_peak_mb': round(sampler.peak_rss / 2**20, 1),
+            'rss_delta_mb': round((sampler.peak_rss - sampler.start_rss) / 2**20, 1),
+        }
+        if trace_memory:
+            record['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+            if tracing:
+                tracemalloc.stop()
+        if metrics.rows is not None:
+            record['rows'] = int(metrics.rows)
+            record['rows_per_s'] = round(metrics.rows / wall, 1) if wall > 0 else None
+        record.update(metrics.extra)
+
+        os.makedirs(os.path.dirname(metrics_file) or '.', exist_ok=True)
+        with open(metrics_file, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+        rate = f", {record['rows_per_s']:,.0f} rows/s" if record.get('rows_per_s') else ''
+        logger.info(f"⏱️ {stage}: {record['wall_s']:.2f}s wall, {record['cpu_s']:.2f}s CPU, "
+                    f"peak RSS {record['rss_peak_mb']:,.0f} MB (+{record['rss_delta_mb']:,.0f}){rate}")
+
+        if profiler:
+            profile_path = os.path.join(os.path.dirname(metrics_file) or '.', f'profile-{stage}.prof')
+            profiler.dump_stats(profile_path)
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+            logger.info(f"cProfile for {stage} saved to {profile_path}\n{summary.getvalue()}")
+
+
+def instrument(stage: str, rows=None):
+    """
+    Decorator form of track_stage.
+    rows: optional callable rows(result, *args, **kwargs) -> row count, e.g.
+          `lambda df, *args, **kwargs: len(df)` for a function returning a frame.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_stage(stage) as metrics:
+                result = func(*args, **kwargs)
+                if rows is not None:
+                    metrics.rows = rows(result, *args, **kwargs)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,278 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from src.loader import CHUNK_BYTES, csv_options, split_byte_ranges
+from src.schema import DATE_COLUMNS, NUMERIC_COLUMNS, STRICT_COLUMNS
+from src.utils import get_logger, instrument
+
+logger = get_logger('Validation')
+
+REPORT_DIR = 'results/data_quality'
+# Offending rows listed per (check, column); the counts in the summary are always exact
+MAX_RECORDS = 1000
+
+# Allowed values of present (non-missing) fields, compared after stripping whitespace
+CATEGORY_DOMAINS = {
+    'Province': ['Gauteng', 'Western Cape', 'KwaZulu-Natal', 'North West', 'Mpumalanga', 'Eastern Cape',
+                 'Limpopo', 'Free State', 'Northern Cape'],
+    'Country': ['South Africa'],
+    'Gender': ['Male', 'Female', 'Not specified'],
+    'MaritalStatus': ['Single', 'Married', 'Not specified'],
+    'VehicleType': ['Passenger Vehicle', 'Medium Commercial', 'Heavy Commercial', 'Light Commercial', 'Bus'],
+    'TermFrequency': ['Monthly', 'Annual'],
+    'IsVATRegistered': ['True', 'False'],
+    'NewVehicle': ['More than 6 months', 'Less than 6 months'],
+    'AlarmImmobiliser': ['Yes', 'No'],
+    'TrackingDevice': ['Yes', 'No'],
+    'WrittenOff': ['Yes', 'No'],
+    'Rebuilt': ['Yes', 'No'],
+    'Converted': ['Yes', 'No'],
+    'CrossBorder': ['Yes', 'No'],
+}
+
+# Inclusive (low, high) bounds; None is open. TotalPremium and TotalClaims are
+# not bounded: negative values are legitimate reversals and recoveries.
+VALUE_RANGES = {
+    'RegistrationYear': (1950, 2030),
+    'Cylinders': (0, 16),
+    'NumberOfDoors': (0, 8),
+    'cubiccapacity': (0, 15000),
+    'kilowatts': (0, 1500),
+    'CustomValueEstimate': (0, None),
+    'CapitalOutstanding': (0, None),
+    'NumberOfVehiclesInFleet': (0, None),
+    'SumInsured': (0, None),
+    'CalculatedPremiumPerTerm': (0, None),
+}
+# A high bound of None means "not in the future"
+DATE_RANGES = {'TransactionMonth': ('2000-01-01', None)}
+
+REPORT_COLUMNS = ['line', 'offset', 'check', 'column', 'value', 'action']
+
+
+def line_index(buf: np.ndarray, sep: str) -> tuple:
+    """(starts, ends, field counts) of every line in a byte buffer, without splitting it."""
+    newlines = np.flatnonzero(buf == ord('\n'))
+    ends = newlines if len(newlines) and newlines[-1] == len(buf) - 1 else np.append(newlines, len(buf))
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    # Separators per line: how many separator positions fall between consecutive line starts
+    separators = np.flatnonzero(buf == ord(sep))
+    fields = np.diff(np.searchsorted(separators, np.append(starts, len(buf)))) + 1
+    return starts, ends, fields
+
+
+def _failures(df: pd.DataFrame) -> list:
+    """(check, column, failed mask, raw values) for every value check on a _read_checked_columns frame."""
+    failures = []
+    for col in NUMERIC_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        if pd.api.types.is_numeric_dtype(raw):
+            values = raw
+        else:
+            values = pd.to_numeric(raw, errors='coerce')
+            failures.append(('numeric', col, (raw.notna() & values.isna()).to_numpy(), raw))
+        if col in VALUE_RANGES:
+            low, high = VALUE_RANGES[col]
+            out = np.zeros(len(df), dtype=bool)
+            if low is not None:
+                out |= (values < low).to_numpy()
+            if high is not None:
+                out |= (values > high).to_numpy()
+            failures.append(('range', col, out, raw))
+
+    for col in DATE_COLUMNS:
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        # Each distinct date string is parsed once
+        parsed = pd.to_datetime(raw.cat.categories, errors='coerce')
+        codes = raw.cat.codes.to_numpy()
+        values = pd.DatetimeIndex(parsed.take(codes, allow_fill=True, fill_value=pd.NaT))
+        failures.append(('date', col, (codes >= 0) & values.isna(), raw))
+        if col in DATE_RANGES:
+            low, high = DATE_RANGES[col]
+            high = pd.Timestamp.now() if high is None else pd.Timestamp(high)
+            failures.append(('range', col, ((values < pd.Timestamp(low)) | (values > high)), raw))
+
+    for col, allowed in CATEGORY_DOMAINS.items():
+        if col not in df.columns:
+            continue
+        raw = df[col]
+        if len(raw.cat.categories) == 0:
+            continue
+        # Checked per level, not per row
+        bad_levels = ~raw.cat.categories.str.strip().isin(allowed)
+        codes = raw.cat.codes.to_numpy()
+        failures.append(('domain', col, (codes >= 0) & bad_levels[np.maximum(codes, 0)], raw))
+    return failures
+
+
+def _read_checked_columns(text: bytes, sep: str) -> pd.DataFrame:
+    """
+    The checked columns of well-formed lines: dates and domain columns as
+    categories (each level is checked once), numerics as float64. Only when a
+    numeric value does not parse are the numerics re-read as text, so the
+    clean-data case costs about one typed parse.
+    """
+    raw_columns = pd.read_csv(io.BytesIO(text), sep=sep, nrows=0).columns
+    categorical = set(DATE_COLUMNS) | set(CATEGORY_DOMAINS)
+    dtypes = {raw: 'category' if raw.strip() in categorical else 'float64'
+              for raw in raw_columns if raw.strip() in categorical or raw.strip() in NUMERIC_COLUMNS}
+    options = dict(sep=sep, quoting=csv.QUOTE_NONE, usecols=list(dtypes), low_memory=False)
+    try:
+        df = pd.read_csv(io.BytesIO(text), dtype=dtypes, **options)
+    except ValueError:
+        df = pd.read_csv(io.BytesIO(text), dtype={raw: str if dtype == 'float64' else dtype
+                                                  for raw, dtype in dtypes.items()}, **options)
+    df.columns = df.columns.str.strip()
+    return df
+
+
+def validate_range(filepath: str, start: int, end: int, sep: str, max_records: int = MAX_RECORDS) -> dict:
+    """
+    Worker: checks the rows in [start, end).
+    Lines with the wrong number of fields are set aside from the byte buffer
+    itself; the rest are parsed as text and every value check runs column-wise.
+    Returns counts, the offending rows (at most max_records per check and
+    column) with their byte offsets, and the range's line count.
+    """
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        body = f.read(end - start)
+    n_fields = header.decode('utf-8', errors='replace').count(sep) + 1
+    buf = np.frombuffer(body, dtype=np.uint8)
+    starts, ends, fields = line_index(buf, sep)
+
+    lengths = ends - starts
+    blank = (lengths == 0) | ((lengths == 1) & (buf[np.minimum(starts, len(buf) - 1)] == ord('\r')))
+    bad_shape = ~blank & (fields != n_fields)
+    good = ~blank & ~bad_shape
+
+    counts = {}
+    records = []
+    rejected = np.zeros(len(starts), dtype=bool)
+
+    def record(check, col, lines, values, action):
+        counts.setdefault(check, {})[col] = counts.get(check, {}).get(col, 0) + len(lines)
+        keep = lines[:max_records]
+        records.append(pd.DataFrame({'line': keep, 'offset': start + starts[keep], 'check': check,
+                                     'column': col, 'value': values[:max_records], 'action': action}))
+
+    # Like the loader: extra fields drop the line, missing trailing fields are read as NaN
+    for action, mask in (('rejected', bad_shape & (fields > n_fields)), ('flagged', bad_shape & (fields < n_fields))):
+        if mask.any():
+            lines = np.flatnonzero(mask)
+            if action == 'rejected':
+                rejected[lines] = True
+            record('field_count', '*', lines,
+                   [f'{fields[i]} fields (expected {n_fields})' for i in lines[:max_records]], action)
+
+    if good.any():
+        # Only well-formed lines are parsed, so parsed row i is line good_lines[i]
+        good_lines = np.flatnonzero(good)
+        if good.all():
+            text = header + body
+        else:
+            spans = np.concatenate([starts[1:], [len(buf)]]) - starts
+            text = header + buf[np.repeat(good, spans)].tobytes()
+        df = _read_checked_columns(text, sep)
+
+        for check, col, failed, raw in _failures(df):
+            if not failed.any():
+                continue
+            rows = np.flatnonzero(failed)
+            # Same rule as the loader: strict columns reject the row, the rest become NaN
+            action = 'rejected' if col in STRICT_COLUMNS and check in ('numeric', 'date') else 'flagged'
+            if action == 'rejected':
+                rejected[good_lines[rows]] = True
+            record(check, col, good_lines[rows], raw.iloc[rows[:max_records]].astype(str).to_numpy(), action)
+
+    return {
+        'lines': int(len(starts)),
+        'rows': int(good.sum() + bad_shape.sum()),
+        'rejected_rows': int(rejected.sum()),
+        'counts': counts,
+        'records': pd.concat(records, ignore_index=True) if records else pd.DataFrame(columns=REPORT_COLUMNS),
+    }
+
+
+@instrument('validate', rows=lambda summary, *args, **kwargs: summary['rows'])
+def validate_file(filepath: str, workers: int = -1, chunk_bytes: int = CHUNK_BYTES, output_dir: str = REPORT_DIR,
+                  max_records: int = MAX_RECORDS) -> dict:
+    """
+    Validates every row of the file on `workers` processes (one byte range per
+    task) and writes output_dir/rejected_rows.csv (line, byte offset, check,
+    column, raw value, rejected or flagged) and output_dir/summary.json.
+    Returns the summary.
+    """
+    start_time = time.perf_counter()
+    workers = os.cpu_count() if workers == -1 else max(1, workers)
+    sep, _, _ = csv_options(filepath)
+    n_parts = max(workers * 2, -(-os.path.getsize(filepath) // chunk_bytes))
+    ranges = split_byte_ranges(filepath, n_parts)
+    logger.info(f"Validating {len(ranges)} byte ranges of {filepath} on {workers} workers...")
+
+    if workers > 1 and len(ranges) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(validate_range, [filepath] * len(ranges), [s for s, _ in ranges],
+                                  [e for _, e in ranges], [sep] * len(ranges), [max_records] * len(ranges)))
+    else:
+        parts = [validate_range(filepath, s, e, sep, max_records) for s, e in ranges]
+
+    counts, frames = {}, []
+    lines_before = 0
+    for part in parts:
+        for check, columns in part['counts'].items():
+            for col, count in columns.items():
+                counts.setdefault(check, {})[col] = counts.get(check, {}).get(col, 0) + count
+        # Range-local line index -> file line number (the header is line 1)
+        part['records']['line'] = part['records']['line'] + lines_before + 2
+        frames.append(part['records'])
+        lines_before += part['lines']
+
+    records = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=REPORT_COLUMNS)
+    records = records.groupby(['check', 'column'], sort=False).head(max_records).sort_values(['line', 'check'])
+    summary = {
+        'file': filepath,
+        'rows': sum(part['rows'] for part in parts),
+        'rejected_rows': sum(part['rejected_rows'] for part in parts),
+        'failures': counts,
+        'seconds': round(time.perf_counter() - start_time, 2),
+    }
+
+    os.makedirs(output_dir, exist_ok=True)
+    records[REPORT_COLUMNS].to_csv(os.path.join(output_dir, 'rejected_rows.csv'), index=False)
+    with open(os.path.join(output_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    total = sum(sum(columns.values()) for columns in counts.values())
+    if total:
+        logger.warning(f"⚠️ {summary['rejected_rows']:,} of {summary['rows']:,} rows rejected, "
+                       f"{total:,} failed checks in all; report in {output_dir}")
+    else:
+        logger.info(f"✅ All {summary['rows']:,} rows passed validation")
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Data-quality checks over every row, with a bad-row report.")
+    parser.add_argument('--data', default='data/insurance_claims.csv')
+    parser.add_argument('--workers', type=int, default=-1, help="processes to use (-1 = all cores)")
+    parser.add_argument('--output-dir', default=REPORT_DIR)
+    parser.add_argument('--max-records', type=int, default=MAX_RECORDS,
+                        help="offending rows listed per check and column")
+    args = parser.parse_args()
+
+    summary = validate_file(args.data, args.workers, output_dir=args.output_dir, max_records=args.max_records)
+    for check, columns in summary['failures'].items():
+        for col, count in sorted(columns.items(), key=lambda item: -item[1]):
+            print(f"{check:<12}{col:<28}{count:>12,}")
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def pytest_configure(config):
+    # Modules write logs/, results/ and caches relative to the working directory
+    os.chdir(tempfile.mkdtemp(prefix='alphacare-tests-'))
+
+
+@pytest.fixture(scope='session')
+def claims_file(tmp_path_factory):
+    """A small synthetic claims extract (same layout as data/insurance_claims.csv)."""
+    from benchmarks.generate_data import generate
+    return generate(str(tmp_path_factory.mktemp('data') / 'claims.txt'), rows=20_000, seed=7)
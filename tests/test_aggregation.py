@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from src.aggregation import group_stats, merge_stats
+
+
+def test_merge_stats_is_associative_and_matches_one_pass():
+    rng = np.random.default_rng(1)
+    df = pd.DataFrame({'Province': rng.choice(list('ABCDE'), 3_000),
+                       'TotalPremium': rng.gamma(2, 100, 3_000),
+                       'TotalClaims': np.where(rng.random(3_000) < 0.1, rng.gamma(2, 500, 3_000), 0.0)})
+    a, b, c = (group_stats(part, ['Province']) for part in (df[:700], df[700:1_900], df[1_900:]))
+    left = merge_stats(merge_stats(a, b), c)
+    right = merge_stats(a, merge_stats(b, c))
+    pd.testing.assert_frame_equal(left, right)
+    pd.testing.assert_frame_equal(left.sort_index(), group_stats(df, ['Province']).sort_index())
+    assert merge_stats(None, a) is a and merge_stats(a, None) is a
@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+
+from src.cleaning import StreamingImputer
+
+
+def test_exact_medians_are_not_rounded():
+    df = pd.DataFrame({'Cylinders': [4, 5, np.nan, 4, 5]})
+    assert StreamingImputer().fit(df).fill_values['Cylinders'] == 4.5
+
+    # Streamed chunks count the few distinct values exactly, so they agree with fit()
+    streamed = StreamingImputer().partial_fit(df.iloc[:2]).partial_fit(df.iloc[2:])
+    assert streamed.fill_values['Cylinders'] == 4.5
+
+
+def test_sketch_medians_of_whole_numbers_are_rounded():
+    values = np.arange(50_001, dtype='float64')
+    imputer = StreamingImputer().partial_fit(pd.DataFrame({'kilowatts': values}))
+    fill = imputer.fill_values['kilowatts']
+    assert fill == np.round(fill)
+    assert abs(fill - np.median(values)) <= 0.01 * np.median(values) + 1
@@ -0,0 +1,14 @@
+import os
+
+import pytest
+
+from src import cli
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('command', ['load', 'validate', 'test', 'score', 'reprice'])
+def test_commands_that_draw_nothing_skip_plotting_libraries(command, monkeypatch):
+    # The subprocess resolves `src` from the working directory
+    monkeypatch.chdir(ROOT)
+    assert not cli.command_imports(command) & set(cli.PLOTTING_MODULES)
@@ -0,0 +1,18 @@
+import numpy as np
+import pandas as pd
+from src.correlation import CovarianceAccumulator
+
+
+def test_merged_chunks_match_pairwise_pandas():
+    rng = np.random.default_rng(2)
+    x = rng.normal(1e6, 10, 2_000)
+    df = pd.DataFrame({'x': x, 'y': 3 * x + rng.normal(0, 5, 2_000), 'z': rng.gamma(2, 1, 2_000)})
+    for col, share in (('x', 0.1), ('y', 0.2), ('z', 0.05)):
+        df.loc[rng.random(len(df)) < share, col] = np.nan
+
+    accumulator = CovarianceAccumulator(df.columns)
+    for start in range(0, len(df), 333):
+        accumulator.merge(CovarianceAccumulator(df.columns).update(df.iloc[start:start + 333]))
+    np.testing.assert_allclose(accumulator.correlation(), df.corr(), rtol=1e-9)
+    np.testing.assert_allclose(accumulator.covariance(), df.cov(), rtol=1e-9)
+    np.testing.assert_array_equal(accumulator.counts(), df.notna().astype(int).T @ df.notna().astype(int))
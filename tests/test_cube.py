@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+from src.cube import SegmentCube
+from src.loader import DataLoader
+
+
+def test_rollup_matches_groupby(claims_file):
+    cube = SegmentCube.build(claims_file, workers=1)
+    df = DataLoader(claims_file, use_cache=False).load_data()
+    premium, claims = df['TotalPremium'].fillna(0), df['TotalClaims'].fillna(0)
+    expected = pd.DataFrame({'n': 1, 'claim_count': (claims > 0).astype(int), 'premium': premium,
+                             'claims': claims}).groupby(df['Province'].astype(str)).sum()
+
+    result = cube.rollup(['Province'])
+    assert list(result.index) == sorted(expected.index)
+    for col in ['n', 'claim_count', 'premium', 'claims']:
+        np.testing.assert_allclose(result[col], expected.loc[result.index, col])
+    np.testing.assert_allclose(result['loss_ratio'], expected.loc[result.index, 'claims']
+                               / expected.loc[result.index, 'premium'])
+    assert cube.rollup()['n'].iloc[0] == len(df)
+    assert cube.slice('Province', result.index[0]).rollup()['n'].iloc[0] == result['n'].iloc[0]
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import scipy.stats as stats
+from src.hypothesis_testing import anova_from_stats, chi2_from_stats, collect_test_stats, run_tests
+
+
+def synthetic_policies(n=5_000, seed=0):
+    rng = np.random.default_rng(seed)
+    province = rng.choice(['Gauteng', 'Western Cape', 'Limpopo', 'Free State'], n)
+    claims = np.where(rng.random(n) < np.where(province == 'Gauteng', 0.08, 0.04), rng.gamma(2, 5_000, n), 0.0)
+    return pd.DataFrame({'TotalPremium': rng.gamma(2, 100, n), 'TotalClaims': claims, 'Province': province,
+                         'PostalCode': rng.choice([str(z) for z in range(1, 30)], n),
+                         'Gender': rng.choice(['Male', 'Female'], n)})
+
+
+def test_chi2_matches_contingency_table():
+    df = synthetic_policies()
+    chi2, p = chi2_from_stats(collect_test_stats(df)['Province'])
+    expected = stats.chi2_contingency(pd.crosstab(df['Province'], df['TotalClaims'] > 0))
+    assert np.isclose(chi2, expected[0])
+    assert np.isclose(p, expected[1])
+
+
+def test_anova_matches_f_oneway():
+    df = synthetic_policies()
+    f_stat, p = anova_from_stats(collect_test_stats(df)['PostalCode'])
+    margin = df['TotalPremium'] - df['TotalClaims']
+    expected = stats.f_oneway(*[group.to_numpy() for _, group in margin.groupby(df['PostalCode'])])
+    assert np.isclose(f_stat, expected.statistic)
+    assert np.isclose(p, expected.pvalue)
+
+
+def test_claim_free_slice_has_p_one():
+    df = synthetic_policies(n=4)
+    df['TotalClaims'] = 0.0
+    chi2, p = chi2_from_stats(collect_test_stats(df)['Province'])
+    assert chi2 == 0 and p == 1
+
+
+def test_anova_without_variance_is_skipped(capsys):
+    df = synthetic_policies(n=40)
+    df['TotalPremium'], df['TotalClaims'] = 5.0, 0.0
+    assert np.isnan(anova_from_stats(collect_test_stats(df)['PostalCode'])[1])
+    run_tests(collect_test_stats(df))
+    assert 'ANOVA skipped' in capsys.readouterr().out
@@ -0,0 +1,58 @@
+import glob
+import os
+
+import pytest
+
+from src.ingest import SEGMENTS, MonthlyStore
+
+
+def _files_on_disk(root):
+    return sorted(os.path.relpath(path, root) for path in glob.glob(os.path.join(root, '*', '**', '*.*'),
+                                                                       recursive=True))
+
+
+def _files_in_manifest(store):
+    files = [path for entry in store.manifest['months'].values() for path in entry['files'] + [entry['sketch']]]
+    return sorted(files + list(store.manifest['aggregates'].values()))
+
+
+def test_append_then_replace_keeps_only_committed_files(claims_file, tmp_path):
+    store = MonthlyStore(str(tmp_path / 'store'))
+    months = store.ingest(claims_file)
+    rows = len(store.read())
+    counts = store.segment_stats('Province')['n']
+
+    store.ingest(claims_file)
+    assert len(store.read()) == 2 * rows
+    assert (store.segment_stats('Province')['n'] == 2 * counts).all()
+
+    assert store.ingest(claims_file, mode='replace') == months
+    reopened = MonthlyStore(store.root)
+    assert len(reopened.read()) == rows
+    assert (reopened.segment_stats('Province')['n'] == counts).all()
+    assert sum(entry['rows'] for entry in reopened.manifest['months'].values()) == rows
+    # Superseded partitions, aggregates and sketches are gone; nothing is left in staging
+    assert _files_on_disk(store.root) == _files_in_manifest(reopened)
+    assert sorted(reopened.manifest['aggregates']) == sorted(SEGMENTS)
+
+
+def test_failed_ingest_leaves_the_store_as_it_was(claims_file, tmp_path, monkeypatch):
+    store = MonthlyStore(str(tmp_path / 'store'))
+    store.ingest(claims_file)
+    before = store.read()
+    files = _files_on_disk(store.root)
+
+    write_file = store._write_file
+
+    def fail_on_manifest(path, *args, **kwargs):
+        if path == store.manifest_path:
+            raise OSError("disk full")
+        write_file(path, *args, **kwargs)
+
+    monkeypatch.setattr(store, '_write_file', fail_on_manifest)
+    with pytest.raises(OSError):
+        store.ingest(claims_file, mode='replace')
+
+    for current in (store, MonthlyStore(store.root)):
+        assert current.read().equals(before)
+    assert _files_on_disk(store.root) == files
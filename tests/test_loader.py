@@ -0,0 +1,17 @@
+import pandas as pd
+from src.loader import DataLoader, split_byte_ranges
+
+
+def test_byte_ranges_cover_the_file_on_line_boundaries(claims_file):
+    ranges = split_byte_ranges(claims_file, 7)
+    with open(claims_file, 'rb') as f:
+        data = f.read()
+    assert ranges[0][0] == data.index(b'\n') + 1 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[start - 1:start] == b'\n'
+
+
+def test_parallel_load_equals_serial_load(claims_file):
+    serial = DataLoader(claims_file, use_cache=False, workers=1).load_data()
+    parallel = DataLoader(claims_file, use_cache=False, workers=4).load_data()
+    pd.testing.assert_frame_equal(serial, parallel)
@@ -0,0 +1,41 @@
+import json
+import os
+import pytest
+from src.pipeline import PipelineRunner, Stage, reachable_modules
+
+
+def load_numbers(inputs, n=5):
+    return list(range(n))
+
+
+def write_total(inputs, path):
+    with open(path, 'w') as f:
+        json.dump({'total': sum(inputs['load']), 'pid': os.getpid()}, f)
+
+
+def build(tmp_path, n=5):
+    return [Stage('load', load_numbers, params={'n': n}, in_process=True),
+            Stage('total', write_total, inputs=['load'], params={'path': str(tmp_path / 'total.json')},
+                  outputs=[str(tmp_path / 'total.json')])]
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_stages_run_in_workers_then_cache(tmp_path, start_method):
+    state = str(tmp_path / 'state.json')
+    runner = PipelineRunner(build(tmp_path), 'data', state_path=state, workers=2, start_method=start_method)
+    assert runner.run() == {'total': 'ran'}
+    with open(tmp_path / 'total.json') as f:
+        result = json.load(f)
+    assert result['total'] == 10 and result['pid'] != os.getpid()
+
+    assert PipelineRunner(build(tmp_path), 'data', state_path=state).run() == {'total': 'cached'}
+    # A param change upstream invalidates the stage
+    assert PipelineRunner(build(tmp_path, n=6), 'data', state_path=state).run() == {'total': 'ran'}
+
+
+def test_code_hash_follows_every_reachable_helper():
+    import run_pipeline
+    # load_stage uses DataLoader from run_pipeline's own imports; reprice_stage imports lazily
+    assert {'src.loader', 'src.schema', 'src.cache'} <= set(reachable_modules(run_pipeline.load_stage))
+    assert {'src.repricing', 'src.out_of_core', 'src.scoring', 'src.loader', 'src.artifacts'} \
+        <= set(reachable_modules(run_pipeline.reprice_stage))
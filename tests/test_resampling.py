@@ -0,0 +1,40 @@
+import numpy as np
+from src.resampling import fdr_bh, holm, permutation_test
+
+P_VALUES = [0.01, 0.04, 0.03, 0.005]
+
+
+def test_holm_hand_worked():
+    # Sorted: 0.005*4 = 0.02, 0.01*3 = 0.03, 0.03*2 = 0.06, 0.04*1 = 0.04 -> running max 0.06
+    np.testing.assert_allclose(holm(P_VALUES), [0.03, 0.06, 0.06, 0.02])
+    np.testing.assert_allclose(holm([0.5, 0.6]), [1.0, 1.0])
+
+
+def test_fdr_bh_hand_worked():
+    # Sorted: 0.005*4/1 = 0.02, 0.01*4/2 = 0.02, 0.03*4/3 = 0.04, 0.04*4/4 = 0.04
+    np.testing.assert_allclose(fdr_bh(P_VALUES), [0.02, 0.04, 0.04, 0.02])
+
+
+def test_p_values_do_not_depend_on_workers():
+    rng = np.random.default_rng(4)
+    codes = rng.integers(0, 5, 600)
+    values = rng.normal(0, 1, 600) + (codes == 2) * 0.2
+    serial = permutation_test(codes, values, 1_000, workers=1, seed=11)
+    parallel = permutation_test(codes, values, 1_000, workers=4, seed=11)
+    assert serial['p_value'] == parallel['p_value']
+    np.testing.assert_array_equal(serial['group_p_values'], parallel['group_p_values'])
+
+
+def test_p_values_roughly_uniform_under_the_null():
+    rng = np.random.default_rng(5)
+    p_values = np.array([
+        permutation_test(rng.integers(0, 3, 120), rng.normal(0, 1, 120), 199, workers=1, seed=i)['p_value']
+        for i in range(200)])
+    assert 0.44 < p_values.mean() < 0.56
+    assert 0.02 < (p_values <= 0.1).mean() < 0.18
+
+
+def test_missing_codes_are_dropped():
+    result = permutation_test([0, 0, -1, 3, 3], [1.0, 2.0, 50.0, 1.0, 2.0], 99, workers=1)
+    np.testing.assert_array_equal(result['groups'], [0, 3])
+    assert result['p_value'] == 1.0
@@ -0,0 +1,16 @@
+import numpy as np
+from src.sketches import QuantileSketch
+
+
+def test_quantiles_within_relative_accuracy_after_merge():
+    rng = np.random.default_rng(3)
+    values = np.concatenate([rng.lognormal(5, 2, 20_000), -rng.lognormal(2, 1, 5_000), np.zeros(1_000)])
+    sketch = QuantileSketch(0.01)
+    for part in np.array_split(rng.permutation(values), 7):
+        sketch.merge(QuantileSketch(0.01).update(part))
+    assert sketch.count == len(values)
+    ordered = np.sort(values)
+    for q in (0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1):
+        exact = ordered[int(q * (len(values) - 1))]
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-12
+    assert sketch.min == values.min() and sketch.max == values.max()